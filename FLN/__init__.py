@@ -4,15 +4,24 @@ with automatic formula detection and step-by-step computation.
 """
 
 from .engine import MathEngine
-from .ast_nodes import ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode
-from .data_structures import EvaluationResult, ComputationStep, FormulaMatch, EvaluationType
+from .ast_nodes import ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode, NodeInterner, get_node_interner
+from .data_structures import EvaluationResult, ComputationStep, FormulaMatch, EvaluationType, StepLevel, CanonicalLevel
 from .tokenizer import Tokenizer, Token, TokenType
 from .parser import Parser
+from .canonical import canonical_form
 from .folex import Folex
+from .patterns import TreePattern, DiscriminationTree, RewriteSystem, parse_tree_pattern, parse_rewrite_template
+from .egraph import EGraph, SaturationReport
 from .natix import Natix
+from .compiler import CompiledExpression
+from .bytecode import BytecodeProgram, Opcode
+from .compact import CompactAST
+from .vectorized import VectorizedExpression, VectorizedResult, VectorError
 from .monitor import ComputationMonitor
 from .cache import ExpressionCache, LazyEvaluator, get_global_cache, get_cache_stats
-from .formula_database import FormulaDatabase, get_formula_database, get_formulas_by_grade, search_formulas, get_formula_count
+from .persistent import CacheBackend, SQLiteBackend
+from .search import SearchIndex
+from .formula_database import FormulaDatabase, FormulaIndex, get_formula_database, get_formulas_by_grade, search_formulas, get_formula_count
 
 __version__ = "1.0.0"
 __author__ = "KrythFoundation"
@@ -24,22 +33,45 @@ __all__ = [
     "VariableNode",
     "OperatorNode",
     "FunctionNode",
+    "NodeInterner",
+    "get_node_interner",
     "EvaluationResult",
     "ComputationStep",
     "FormulaMatch",
     "EvaluationType",
+    "StepLevel",
+    "CanonicalLevel",
     "Tokenizer",
     "Token",
     "TokenType",
     "Parser",
+    "canonical_form",
     "Folex",
+    "TreePattern",
+    "DiscriminationTree",
+    "parse_tree_pattern",
+    "RewriteSystem",
+    "parse_rewrite_template",
+    "EGraph",
+    "SaturationReport",
     "Natix",
+    "CompiledExpression",
+    "BytecodeProgram",
+    "Opcode",
+    "CompactAST",
+    "VectorizedExpression",
+    "VectorizedResult",
+    "VectorError",
     "ComputationMonitor",
     "ExpressionCache",
     "LazyEvaluator",
     "get_global_cache",
     "get_cache_stats",
+    "CacheBackend",
+    "SQLiteBackend",
+    "SearchIndex",
     "FormulaDatabase",
+    "FormulaIndex",
     "get_formula_database",
     "get_formulas_by_grade",
     "search_formulas",
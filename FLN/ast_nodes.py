@@ -1,10 +1,35 @@
-from dataclasses import dataclass
-from typing import List, Optional, Dict, Any, Union
+from dataclasses import dataclass, fields
+from operator import attrgetter
+from typing import List, Optional, Dict, Any, Union, Tuple
 import math
 import re
+import weakref
 
 
-@dataclass
+def _cached_hash(cls):
+    """Hash a frozen node once, as it is built, from its fields.
+    
+    Children are built first and already hold their hashes, so this is
+    O(1) per node and never recurses, however deep the tree.
+    """
+    init = cls.__init__
+    values = attrgetter(*(field.name for field in fields(cls)))
+    single = len(fields(cls)) == 1
+    
+    def __init__(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        # The same value the dataclass's field hash gives
+        object.__setattr__(self, '_hash', hash((values(self),) if single else values(self)))
+    
+    def __hash__(self):
+        return self._hash
+    
+    cls.__init__ = __init__
+    cls.__hash__ = __hash__
+    return cls
+
+
+@dataclass(frozen=True)
 class ASTNode:
     def evaluate(self, variables: Dict[str, float] = None) -> Union[float, str]:
         pass
@@ -14,9 +39,13 @@ class ASTNode:
     
     def clone(self) -> 'ASTNode':
         pass
+    
+    def children(self) -> Tuple['ASTNode', ...]:
+        return ()
 
 
-@dataclass
+@_cached_hash
+@dataclass(frozen=True)
 class NumberNode(ASTNode):
     value: Union[int, float]
     
@@ -30,7 +59,8 @@ class NumberNode(ASTNode):
         return NumberNode(self.value)
 
 
-@dataclass
+@_cached_hash
+@dataclass(frozen=True)
 class VariableNode(ASTNode):
     name: str
     
@@ -46,7 +76,8 @@ class VariableNode(ASTNode):
         return VariableNode(self.name)
 
 
-@dataclass
+@_cached_hash
+@dataclass(frozen=True)
 class OperatorNode(ASTNode):
     operator: str
     left: ASTNode
@@ -102,11 +133,15 @@ class OperatorNode(ASTNode):
     def to_string(self) -> str:
         return f"({self.left.to_string()} {self.operator} {self.right.to_string()})"
     
+    def children(self) -> Tuple[ASTNode, ...]:
+        return (self.left, self.right)
+    
     def clone(self) -> 'OperatorNode':
         return OperatorNode(self.operator, self.left.clone(), self.right.clone())
 
 
-@dataclass
+@_cached_hash
+@dataclass(frozen=True)
 class FunctionNode(ASTNode):
     function_name: str
     argument: ASTNode
@@ -187,11 +222,15 @@ class FunctionNode(ASTNode):
     def to_string(self) -> str:
         return f"{self.function_name}({self.argument.to_string()})"
     
+    def children(self) -> Tuple[ASTNode, ...]:
+        return (self.argument,)
+    
     def clone(self) -> 'FunctionNode':
         return FunctionNode(self.function_name, self.argument.clone())
 
 
-@dataclass
+@_cached_hash
+@dataclass(frozen=True)
 class ParenthesesNode(ASTNode):
     expression: ASTNode
     
@@ -201,11 +240,15 @@ class ParenthesesNode(ASTNode):
     def to_string(self) -> str:
         return f"({self.expression.to_string()})"
     
+    def children(self) -> Tuple[ASTNode, ...]:
+        return (self.expression,)
+    
     def clone(self) -> 'ParenthesesNode':
         return ParenthesesNode(self.expression.clone())
 
 
-@dataclass
+@_cached_hash
+@dataclass(frozen=True)
 class UnaryNode(ASTNode):
     operator: str
     operand: ASTNode
@@ -229,11 +272,15 @@ class UnaryNode(ASTNode):
     def to_string(self) -> str:
         return f"{self.operator}{self.operand.to_string()}"
     
+    def children(self) -> Tuple[ASTNode, ...]:
+        return (self.operand,)
+    
     def clone(self) -> 'UnaryNode':
         return UnaryNode(self.operator, self.operand.clone())
 
 
-@dataclass
+@_cached_hash
+@dataclass(frozen=True)
 class DerivativeNode(ASTNode):
     variable: str
     expression: ASTNode
@@ -393,11 +440,15 @@ class DerivativeNode(ASTNode):
     def to_string(self) -> str:
         return f"d/d{self.variable}({self.expression.to_string()})"
     
+    def children(self) -> Tuple[ASTNode, ...]:
+        return (self.expression,)
+    
     def clone(self) -> 'DerivativeNode':
         return DerivativeNode(self.variable, self.expression.clone())
 
 
-@dataclass
+@_cached_hash
+@dataclass(frozen=True)
 class IntegralNode(ASTNode):
     variable: str
     expression: ASTNode
@@ -522,6 +573,9 @@ class IntegralNode(ASTNode):
         else:
             return f"∫{self.expression.to_string()} d{self.variable}"
     
+    def children(self) -> Tuple[ASTNode, ...]:
+        return tuple(child for child in (self.expression, self.lower_bound, self.upper_bound) if child is not None)
+    
     def clone(self) -> 'IntegralNode':
         return IntegralNode(
             self.variable, 
@@ -529,3 +583,128 @@ class IntegralNode(ASTNode):
             self.lower_bound.clone() if self.lower_bound else None,
             self.upper_bound.clone() if self.upper_bound else None
         )
+
+
+class NodeInterner:
+    """Hash-consing factory: equal subexpressions come back as one shared node.
+    
+    Children passed to the factory methods must come from the same interner;
+    use intern() for an arbitrary tree. Nodes are held weakly, so the table
+    never keeps an expression alive on its own.
+    """
+    
+    def __init__(self):
+        # key -> weak reference to the node; dead entries are swept in bulk
+        self._nodes: Dict[tuple, weakref.ref] = {}
+        self._dead = 0
+    
+    def _collected(self, ref: weakref.ref) -> None:
+        self._dead += 1
+    
+    def _lookup(self, key: tuple) -> Optional[ASTNode]:
+        ref = self._nodes.get(key)
+        return ref() if ref is not None else None
+    
+    def _store(self, key: tuple, node: ASTNode) -> ASTNode:
+        # A racing thread may store an equal node first; both stay valid, the
+        # later one just is not shared
+        if self._dead > len(self._nodes) // 2:
+            self.sweep()
+        self._nodes[key] = weakref.ref(node, self._collected)
+        return node
+    
+    def sweep(self) -> None:
+        """Drop the entries of collected nodes"""
+        self._dead = 0
+        self._nodes = {key: ref for key, ref in list(self._nodes.items()) if ref() is not None}
+    
+    def number(self, value: Union[int, float]) -> NumberNode:
+        # repr keeps 2 / 2.0 and 0.0 / -0.0 apart, like to_string does
+        key = ('number', type(value), repr(value))
+        node = self._lookup(key)
+        return node if node is not None else self._store(key, NumberNode(value))
+    
+    def variable(self, name: str) -> VariableNode:
+        key = ('variable', name)
+        node = self._lookup(key)
+        return node if node is not None else self._store(key, VariableNode(name))
+    
+    def operator(self, operator: str, left: ASTNode, right: ASTNode) -> OperatorNode:
+        key = ('operator', operator, id(left), id(right))
+        node = self._lookup(key)
+        return node if node is not None else self._store(key, OperatorNode(operator, left, right))
+    
+    def function(self, function_name: str, argument: ASTNode) -> FunctionNode:
+        key = ('function', function_name, id(argument))
+        node = self._lookup(key)
+        return node if node is not None else self._store(key, FunctionNode(function_name, argument))
+    
+    def parentheses(self, expression: ASTNode) -> ParenthesesNode:
+        key = ('parentheses', id(expression))
+        node = self._lookup(key)
+        return node if node is not None else self._store(key, ParenthesesNode(expression))
+    
+    def unary(self, operator: str, operand: ASTNode) -> UnaryNode:
+        key = ('unary', operator, id(operand))
+        node = self._lookup(key)
+        return node if node is not None else self._store(key, UnaryNode(operator, operand))
+    
+    def derivative(self, variable: str, expression: ASTNode) -> DerivativeNode:
+        key = ('derivative', variable, id(expression))
+        node = self._lookup(key)
+        return node if node is not None else self._store(key, DerivativeNode(variable, expression))
+    
+    def integral(self, variable: str, expression: ASTNode, lower_bound: Optional[ASTNode] = None,
+                 upper_bound: Optional[ASTNode] = None) -> IntegralNode:
+        key = ('integral', variable, id(expression), id(lower_bound), id(upper_bound))
+        node = self._lookup(key)
+        if node is None:
+            node = self._store(key, IntegralNode(variable, expression, lower_bound, upper_bound))
+        return node
+    
+    def intern(self, node: ASTNode) -> ASTNode:
+        """Rebuild a tree bottom-up from shared nodes"""
+        shared: Dict[int, ASTNode] = {}
+        stack = [(node, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if id(current) in shared:
+                continue
+            if not expanded:
+                stack.append((current, True))
+                stack.extend((child, False) for child in current.children() if id(child) not in shared)
+                continue
+            shared[id(current)] = self._rebuild(current, shared)
+        return shared[id(node)]
+    
+    def _rebuild(self, node: ASTNode, shared: Dict[int, ASTNode]) -> ASTNode:
+        if isinstance(node, NumberNode):
+            return self.number(node.value)
+        elif isinstance(node, VariableNode):
+            return self.variable(node.name)
+        elif isinstance(node, OperatorNode):
+            return self.operator(node.operator, shared[id(node.left)], shared[id(node.right)])
+        elif isinstance(node, FunctionNode):
+            return self.function(node.function_name, shared[id(node.argument)])
+        elif isinstance(node, ParenthesesNode):
+            return self.parentheses(shared[id(node.expression)])
+        elif isinstance(node, UnaryNode):
+            return self.unary(node.operator, shared[id(node.operand)])
+        elif isinstance(node, DerivativeNode):
+            return self.derivative(node.variable, shared[id(node.expression)])
+        elif isinstance(node, IntegralNode):
+            lower_bound = shared[id(node.lower_bound)] if node.lower_bound is not None else None
+            upper_bound = shared[id(node.upper_bound)] if node.upper_bound is not None else None
+            return self.integral(node.variable, shared[id(node.expression)], lower_bound, upper_bound)
+        raise ValueError(f"Unknown node type: {type(node)}")
+    
+    def __len__(self) -> int:
+        """Number of live shared nodes"""
+        return sum(1 for ref in list(self._nodes.values()) if ref() is not None)
+
+
+_global_interner = NodeInterner()
+
+
+def get_node_interner() -> NodeInterner:
+    return _global_interner
@@ -0,0 +1,247 @@
+from enum import IntEnum
+from typing import Dict, List, Tuple, Union, FrozenSet, Any
+from .ast_nodes import (
+    ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode,
+    ParenthesesNode, UnaryNode, DerivativeNode, IntegralNode
+)
+from .compiler import BINARY_KERNELS, FUNCTION_KERNELS, _CAUGHT
+
+
+class Opcode(IntEnum):
+    PUSH_CONST = 0      # argument: the value
+    LOAD_VAR = 1        # argument: the name; pushes the name itself when unbound
+    EVAL_NODE = 2       # argument: a derivative or integral node, evaluated as is
+    NEGATE = 3
+    POSITIVE = 4
+    UNARY_UNKNOWN = 5   # argument: the operator symbol
+    BINARY_UNKNOWN = 6  # argument: the operator symbol
+    CALL_UNKNOWN = 7    # argument: the function name
+    
+    ADD = 16
+    SUBTRACT = 17
+    MULTIPLY = 18
+    DIVIDE = 19
+    POWER = 20
+    MODULO = 21
+    
+    CALL_SQRT = 32
+    CALL_SIN = 33
+    CALL_COS = 34
+    CALL_TAN = 35
+    CALL_LOG = 36
+    CALL_LN = 37
+    CALL_ABS = 38
+    CALL_EXP = 39
+    CALL_FACTORIAL = 40
+    CALL_ASIN = 41
+    CALL_ACOS = 42
+    CALL_ATAN = 43
+    CALL_SINH = 44
+    CALL_COSH = 45
+    CALL_TANH = 46
+    CALL_CBRT = 47
+    CALL_FLOOR = 48
+    CALL_CEIL = 49
+    CALL_ROUND = 50
+
+
+_BINARY_OPCODES = {
+    '+': Opcode.ADD,
+    '-': Opcode.SUBTRACT,
+    '*': Opcode.MULTIPLY,
+    '/': Opcode.DIVIDE,
+    '^': Opcode.POWER,
+    '%': Opcode.MODULO,
+}
+
+_CALL_OPCODES = {name: Opcode[f"CALL_{name.upper()}"] for name in FUNCTION_KERNELS}
+
+# Opcode -> (symbol or name, kernel), indexed by opcode for the VM loop
+_KERNELS: List[Any] = [None] * (max(Opcode) + 1)
+for _symbol, _opcode in _BINARY_OPCODES.items():
+    _KERNELS[_opcode] = (_symbol, BINARY_KERNELS[_symbol])
+for _name, _opcode in _CALL_OPCODES.items():
+    _KERNELS[_opcode] = (_name, FUNCTION_KERNELS[_name])
+
+_PUSH_CONST, _LOAD_VAR, _EVAL_NODE = int(Opcode.PUSH_CONST), int(Opcode.LOAD_VAR), int(Opcode.EVAL_NODE)
+_NEGATE, _POSITIVE, _UNARY_UNKNOWN = int(Opcode.NEGATE), int(Opcode.POSITIVE), int(Opcode.UNARY_UNKNOWN)
+_BINARY_UNKNOWN, _CALL_UNKNOWN = int(Opcode.BINARY_UNKNOWN), int(Opcode.CALL_UNKNOWN)
+_FIRST_BINARY, _LAST_BINARY = int(Opcode.ADD), int(Opcode.MODULO)
+_FIRST_CALL, _LAST_CALL = int(Opcode.CALL_SQRT), int(Opcode.CALL_ROUND)
+
+Instruction = Tuple[int, Any]
+
+
+def _execute(instructions: Tuple[Instruction, ...], variables: Dict[str, Any]) -> Union[float, str]:
+    """Run postfix code on a value stack; results match Natix.evaluate"""
+    stack: List[Any] = []
+    push = stack.append
+    pop = stack.pop
+    kernels = _KERNELS
+    
+    for opcode, argument in instructions:
+        if opcode == _PUSH_CONST:
+            push(argument)
+        elif opcode == _LOAD_VAR:
+            push(variables[argument] if argument in variables else argument)
+        elif _FIRST_BINARY <= opcode <= _LAST_BINARY:
+            right = pop()
+            left = pop()
+            symbol, kernel = kernels[opcode]
+            if isinstance(left, str) or isinstance(right, str):
+                push(f"{left} {symbol} {right}")
+                continue
+            try:
+                push(kernel(left, right))
+            except _CAUGHT as e:
+                push(f"Error in {symbol} operation: {str(e)}")
+        elif _FIRST_CALL <= opcode <= _LAST_CALL:
+            value = pop()
+            name, kernel = kernels[opcode]
+            if isinstance(value, str):
+                push(f"{name}({value})")
+                continue
+            try:
+                push(kernel(value))
+            except _CAUGHT as e:
+                push(f"Error in {name} function: {str(e)}")
+        elif opcode == _NEGATE:
+            value = pop()
+            push(f"-{value}" if isinstance(value, str) else -value)
+        elif opcode == _POSITIVE:
+            value = pop()
+            push(f"+{value}" if isinstance(value, str) else value)
+        elif opcode == _UNARY_UNKNOWN:
+            value = pop()
+            if isinstance(value, str):
+                push(f"{argument}{value}")
+            else:
+                push(f"Error in unary operation: Unknown unary operator: {argument}")
+        elif opcode == _BINARY_UNKNOWN:
+            right = pop()
+            left = pop()
+            if isinstance(left, str) or isinstance(right, str):
+                push(f"{left} {argument} {right}")
+            else:
+                push(f"Error: Unknown operator '{argument}'")
+        elif opcode == _CALL_UNKNOWN:
+            value = pop()
+            if isinstance(value, str):
+                push(f"{argument}({value})")
+            else:
+                push(f"Error: Unknown function '{argument}'")
+        elif opcode == _EVAL_NODE:
+            push(argument.evaluate(variables))
+        else:
+            raise ValueError(f"Unknown opcode: {opcode}")
+    
+    return stack[-1]
+
+
+def _emit(node: ASTNode, code: List[Instruction], names: set) -> None:
+    """Append the instruction for a node whose children are already on the stack"""
+    if isinstance(node, NumberNode):
+        code.append((Opcode.PUSH_CONST, node.value))
+    elif isinstance(node, VariableNode):
+        names.add(node.name)
+        code.append((Opcode.LOAD_VAR, node.name))
+    elif isinstance(node, OperatorNode):
+        opcode = _BINARY_OPCODES.get(node.operator)
+        code.append((opcode, None) if opcode is not None else (Opcode.BINARY_UNKNOWN, node.operator))
+    elif isinstance(node, FunctionNode):
+        opcode = _CALL_OPCODES.get(node.function_name)
+        code.append((opcode, None) if opcode is not None else (Opcode.CALL_UNKNOWN, node.function_name))
+    elif isinstance(node, UnaryNode):
+        if node.operator == '-':
+            code.append((Opcode.NEGATE, None))
+        elif node.operator == '+':
+            code.append((Opcode.POSITIVE, None))
+        else:
+            code.append((Opcode.UNARY_UNKNOWN, node.operator))
+    elif isinstance(node, (DerivativeNode, IntegralNode)):
+        code.append((Opcode.EVAL_NODE, node))
+    else:
+        raise ValueError(f"Unknown node type: {type(node)}")
+
+
+def assemble(ast: ASTNode) -> Tuple[Tuple[Instruction, ...], FrozenSet[str]]:
+    """Compile an AST to postfix code, folding subtrees that use no variables.
+    
+    Returns the instructions and the variable names they load.
+    """
+    code: List[Instruction] = []
+    names: set = set()
+    # (node, children already emitted, where its code starts)
+    stack: List[Tuple[ASTNode, bool, int]] = [(ast, False, 0)]
+    dynamic: List[bool] = []  # per finished node: does it depend on variables
+    
+    while stack:
+        node, expanded, start = stack.pop()
+        if isinstance(node, ParenthesesNode):
+            # Parentheses only group; they emit nothing
+            stack.append((node.expression, False, 0))
+            continue
+        if isinstance(node, (DerivativeNode, IntegralNode)):
+            children = ()  # evaluated as a whole by EVAL_NODE
+        else:
+            children = node.children()
+        if not expanded:
+            stack.append((node, True, len(code)))
+            stack.extend((child, False, 0) for child in reversed(children))
+            continue
+        
+        is_dynamic = isinstance(node, (VariableNode, DerivativeNode, IntegralNode))
+        for _ in children:
+            is_dynamic = dynamic.pop() or is_dynamic
+        _emit(node, code, names)
+        if not is_dynamic and children:
+            try:
+                value = _execute(tuple(code[start:]), {})
+            except Exception:
+                # Leave it to raise at run time, exactly like Natix would
+                pass
+            else:
+                del code[start:]
+                code.append((Opcode.PUSH_CONST, value))
+        dynamic.append(is_dynamic)
+    
+    # Plain ints rather than Opcode members keep the VM loop's comparisons cheap
+    return tuple((int(opcode), argument) for opcode, argument in code), frozenset(names)
+
+
+class BytecodeProgram:
+    """An expression compiled once to postfix opcodes for a stack VM.
+    
+    Calling it returns the same value Natix.evaluate would for the same
+    variables without recording any computation steps. Unlike the
+    recursive evaluators it has no depth limit. Programs are immutable,
+    so ExpressionCache can keep them next to the parsed AST.
+    """
+    
+    __slots__ = ('expression', 'instructions', 'variables')
+    
+    def __init__(self, expression: str, ast: ASTNode):
+        self.expression = expression
+        self.instructions, self.variables = assemble(ast)
+    
+    def __call__(self, **variables) -> Union[float, str]:
+        return _execute(self.instructions, variables)
+    
+    def evaluate(self, variables: Dict[str, float] = None) -> Union[float, str]:
+        return _execute(self.instructions, variables or {})
+    
+    def disassemble(self) -> str:
+        lines = []
+        for offset, (opcode, argument) in enumerate(self.instructions):
+            name = Opcode(opcode).name
+            if argument is None:
+                lines.append(f"{offset:4d} {name}")
+            else:
+                lines.append(f"{offset:4d} {name:<16}{argument!r}")
+        return "\n".join(lines)
+    
+    def __len__(self) -> int:
+        return len(self.instructions)
+    
+    def __repr__(self) -> str:
+        return f"BytecodeProgram({self.expression!r}, {len(self)} instructions, variables={sorted(self.variables)})"
@@ -1,9 +1,15 @@
+import sys
 import time
-import hashlib
+import heapq
 import json
-from typing import Dict, Any, Optional, Tuple, List
+import threading
+from enum import Enum
+from itertools import count
+from types import FunctionType, ModuleType
+from typing import Dict, Any, Hashable, Optional, Tuple, List
 from dataclasses import dataclass, field
-from collections import OrderedDict
+from operator import itemgetter
+from .persistent import CacheBackend, decode_result, encode_result
 
 
 @dataclass
@@ -12,111 +18,352 @@ class CacheEntry:
     timestamp: float
     access_count: int = 0
     size: int = 0
+    priority: float = 0.0  # GreedyDual-Size value; the lowest is evicted first
+    order: int = 0         # when the priority was set, to spot stale heap items
+
+
+# Shared by every value that mentions them, so never charged to one
+_UNCHARGED = (type, ModuleType, Enum)
+
+_LEAVES = frozenset({str, bytes, int, float, complex, bool, type(None)})
+_SEQUENCES = frozenset({list, tuple, set, frozenset})
+
+# Items sized out of a long sequence
+_SAMPLE = 8
+
+# Slot names per class, looked up once
+_slot_names: Dict[type, Tuple[str, ...]] = {}
+
+
+def _slots(klass: type) -> Tuple[str, ...]:
+    names = _slot_names.get(klass)
+    if names is None:
+        names = []
+        for base in klass.__mro__:
+            declared = base.__dict__.get('__slots__', ())
+            for name in (declared,) if isinstance(declared, str) else declared:
+                if name not in ('__dict__', '__weakref__'):
+                    names.append(name)
+        names = _slot_names[klass] = tuple(names)
+    return names
+
+
+def sizeof(value: Any) -> int:
+    """Bytes held by `value` and everything it references, each object once.
+    
+    Follows containers, instance attributes and slots, and the closures of
+    functions (compiled expressions are trees of closures). What belongs
+    to a class rather than to the value is not counted: classes, modules,
+    enum members, attribute names, and a function's code and globals.
+    
+    A long sequence, such as the steps of a trace, is sized from an evenly
+    spread sample of its items, so the cost stays well below that of
+    printing the value; everything else is walked in full.
+    """
+    return _walk([value], {id(value)})
+
+
+def _walk(stack: List[Any], seen: set) -> int:
+    getsize = sys.getsizeof
+    mark = seen.add
+    total = 0
+    pop, push = stack.pop, stack.append
+    while stack:
+        obj = pop()
+        total += getsize(obj)
+        kind = type(obj)
+        if kind in _SEQUENCES:
+            children = obj
+            if len(obj) > _SAMPLE:
+                items = obj if kind is list or kind is tuple else list(obj)
+                sample = [items[index * len(items) // _SAMPLE] for index in range(_SAMPLE)]
+                sample = [item for item in sample if id(item) not in seen]
+                # Items repeated within the sample are shared, not a sign of the rest
+                if len({id(item) for item in sample}) == _SAMPLE:
+                    seen.update(id(item) for item in sample)
+                    total += _walk(sample, seen) * len(items) // _SAMPLE
+                    continue
+        elif kind is dict:
+            children = [*obj.keys(), *obj.values()]
+        elif kind in _LEAVES:
+            continue
+        elif kind is FunctionType:
+            children = [cell.cell_contents for cell in obj.__closure__ or ()]
+            if obj.__defaults__:
+                children.append(obj.__defaults__)
+        elif isinstance(obj, _UNCHARGED):
+            total -= getsize(obj)
+            continue
+        else:
+            attributes = getattr(obj, '__dict__', None)
+            if attributes is None:
+                children = []
+            else:
+                total += getsize(attributes)
+                children = list(attributes.values())
+            names = _slots(kind)
+            if names:
+                children.extend(getattr(obj, name) for name in names if hasattr(obj, name))
+        # Leaves are settled here rather than through the stack
+        for child in children:
+            if id(child) not in seen:
+                mark(id(child))
+                if type(child) in _LEAVES:
+                    total += getsize(child)
+                else:
+                    push(child)
+    return total
+
+
+# Values that hash and compare by value as they are; 1, 1.0 and True are
+# still told apart by their type, since they print differently in steps
+_ATOMS = frozenset({str, int, float, complex, bool, type(None)})
+
+
+def _freeze(value: Any) -> Tuple[type, Hashable]:
+    """`value` as a hashable key part: containers become tuples, floats
+    their repr (-0.0 == 0.0, but the two print and evaluate differently),
+    and what cannot be hashed at all is keyed by its JSON"""
+    kind = type(value)
+    if kind is float or kind is complex:
+        return kind, repr(value)
+    if kind in _ATOMS:
+        return kind, value
+    if kind is list or kind is tuple:
+        return kind, tuple(map(_freeze, value))
+    if kind is dict:
+        return kind, tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return kind, json.dumps(value, sort_keys=True)
+    return kind, value
+
+
+def _variables_key(variables: Optional[Dict[str, Any]]) -> frozenset:
+    """Variable bindings as a set of (name, type, value), whatever their order"""
+    if not variables:
+        return frozenset()
+    values = variables.values()
+    # Signed zeros compare equal, so any zero takes the path that tells them apart
+    if 0.0 not in values:
+        try:
+            return frozenset(zip(variables, map(type, values), values))
+        except TypeError:
+            pass
+    return frozenset((name, *_freeze(value)) for name, value in variables.items())
+
+
+def _stored_key(key: Tuple[str, frozenset, str], formulas: str) -> str:
+    """An evaluation key as text that reads the same in every process, for
+    backends that outlive one; sets iterate in a different order in each
+    process, so the bindings are sorted by name. Stored results also name
+    the formula set they were detected with, which can change between runs"""
+    expression, variables, steps = key
+    return repr((expression, steps, sorted(variables, key=itemgetter(0)), formulas))
+
+
+def _default_shards(max_size: int) -> int:
+    """Enough shards to spread many threads, none so small that its own LRU
+    order stops saying much about which entries are old"""
+    shards = 1
+    while shards < 16 and max_size // (shards * 2) >= 32:
+        shards *= 2
+    return shards
+
+
+class _Shard:
+    __slots__ = ('lock', 'entries', 'heap', 'clock', 'orders', 'capacity', 'max_bytes', 'bytes',
+                 'hits', 'misses', 'evictions', 'expirations', 'rejections')
+
+    def __init__(self, capacity: int, max_bytes: Optional[int]):
+        self.lock = threading.Lock()
+        self.entries: Dict[Hashable, CacheEntry] = {}
+        # (priority, order, key) for every entry, plus stale items left by updates
+        self.heap: List[Tuple[float, int, Hashable]] = []
+        self.clock = 0.0  # priority of the last eviction; the GreedyDual "L"
+        self.orders = count()
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def touch(self, key: Hashable, entry: CacheEntry) -> None:
+        # GreedyDual-Size with unit cost: small entries earn more credit
+        # than big ones, and every eviction raises the floor a fresh touch
+        # starts from. With equal sizes this is exactly LRU.
+        entry.priority = self.clock + 1.0 / max(entry.size, 1)
+        entry.order = next(self.orders)
+        heapq.heappush(self.heap, (entry.priority, entry.order, key))
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            self.heap = [(e.priority, e.order, k) for k, e in self.entries.items()]
+            heapq.heapify(self.heap)
+
+    def remove(self, key: Hashable) -> CacheEntry:
+        entry = self.entries.pop(key)
+        self.bytes -= entry.size
+        return entry
+
+    def evict(self) -> None:
+        while len(self.entries) > self.capacity or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            priority, order, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is None or entry.order != order:
+                continue  # superseded by a later touch, or already gone
+            self.remove(key)
+            self.clock = priority
+            self.evictions += 1
 
 
 class LRUCache:
-    def __init__(self, max_size: int = 1000, ttl: int = 3600):
+    """Cache with expiry and size-aware LRU eviction, safe to share between threads.
+    
+    Bounded by entry count and, with `max_bytes`, by the bytes its values
+    hold (see sizeof), measured once per put. Eviction is GreedyDual-Size:
+    among entries of equal size the least recently used goes first, and a
+    large entry has to be used more recently than a small one to stay, so
+    a few big step traces cannot flush many small hot results. A value
+    bigger than a shard's whole byte budget is not stored at all.
+    
+    Keys are spread by hash over shards, each with its own share of the
+    budgets behind its own lock, so threads working on different keys
+    rarely wait for one another.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: int = 3600, shards: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
         self.max_size = max_size
         self.ttl = ttl
-        self.cache: OrderedDict[str, CacheEntry] = OrderedDict()
-        self.stats = {
-            "hits": 0,
-            "misses": 0,
-            "evictions": 0,
-            "expirations": 0
-        }
-
-    def _generate_key(self, *args, **kwargs) -> str:
-        key_parts = []
-        
-        for arg in args:
-            if isinstance(arg, (dict, list, tuple)):
-                key_parts.append(json.dumps(arg, sort_keys=True))
-            else:
-                key_parts.append(str(arg))
-        
-        if kwargs:
-            sorted_kwargs = sorted(kwargs.items())
-            for key, value in sorted_kwargs:
-                if isinstance(value, (dict, list, tuple)):
-                    key_parts.append(f"{key}:{json.dumps(value, sort_keys=True)}")
-                else:
-                    key_parts.append(f"{key}:{value}")
-        
-        key_string = "|".join(key_parts)
-        return hashlib.md5(key_string.encode()).hexdigest()
-
-    def get(self, key: str) -> Optional[Any]:
-        if key not in self.cache:
-            self.stats["misses"] += 1
-            return None
-        
-        entry = self.cache[key]
-        
-        if self.ttl > 0 and time.time() - entry.timestamp > self.ttl:
-            del self.cache[key]
-            self.stats["expirations"] += 1
-            self.stats["misses"] += 1
-            return None
-        
-        entry.access_count += 1
-        self.cache.move_to_end(key)
-        
-        self.stats["hits"] += 1
-        return entry.value
-
-    def put(self, key: str, value: Any) -> None:
-        if key in self.cache:
-            del self.cache[key]
-        
+        self.max_bytes = max_bytes
+        if shards is None:
+            shards = _default_shards(max_size)
+        shards = max(1, min(shards, max_size))
+        # The shard budgets add up to the cache's exactly
+        self._shards = [
+            _Shard(max_size // shards + (index < max_size % shards),
+                   None if max_bytes is None else max_bytes // shards + (index < max_bytes % shards))
+            for index in range(shards)
+        ]
+
+    def _shard(self, key: Hashable) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _generate_key(self, *args, **kwargs) -> Hashable:
+        return tuple(map(_freeze, args)), _variables_key(kwargs)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                shard.misses += 1
+                return None
+            
+            if self.ttl > 0 and time.time() - entry.timestamp > self.ttl:
+                shard.remove(key)
+                shard.expirations += 1
+                shard.misses += 1
+                return None
+            
+            entry.access_count += 1
+            shard.touch(key, entry)
+            shard.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any) -> None:
         entry = CacheEntry(
             value=value,
             timestamp=time.time(),
             access_count=1,
-            size=self._estimate_size(value)
+            size=sizeof(value)
         )
         
-        self.cache[key] = entry
-        
-        if len(self.cache) > self.max_size:
-            self._evict_oldest()
-
-    def _evict_oldest(self) -> None:
-        if self.cache:
-            oldest_key = next(iter(self.cache))
-            del self.cache[oldest_key]
-            self.stats["evictions"] += 1
-
-    def _estimate_size(self, value: Any) -> int:
-        try:
-            return len(str(value))
-        except:
-            return 100
+        shard = self._shard(key)
+        with shard.lock:
+            if key in shard.entries:
+                shard.remove(key)
+            if shard.max_bytes is not None and entry.size > shard.max_bytes:
+                shard.rejections += 1
+                return
+            shard.entries[key] = entry
+            shard.bytes += entry.size
+            shard.touch(key, entry)
+            shard.evict()
 
     def clear(self) -> None:
-        self.cache.clear()
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.heap.clear()
+                shard.bytes = 0
+                shard.clock = 0.0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        totals = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "rejections": 0}
+        for shard in self._shards:
+            with shard.lock:
+                for name in totals:
+                    totals[name] += getattr(shard, name)
+        return totals
 
     def get_stats(self) -> Dict[str, Any]:
-        total_requests = self.stats["hits"] + self.stats["misses"]
-        hit_rate = self.stats["hits"] / total_requests if total_requests > 0 else 0
+        stats = self.stats
+        total_requests = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / total_requests if total_requests > 0 else 0
         
         return {
-            **self.stats,
-            "size": len(self.cache),
+            **stats,
+            "size": len(self),
             "max_size": self.max_size,
+            "bytes": sum(shard.bytes for shard in self._shards),
+            "max_bytes": self.max_bytes,
+            "shards": len(self._shards),
             "hit_rate": hit_rate,
             "total_requests": total_requests
         }
 
     def __len__(self) -> int:
-        return len(self.cache)
+        return sum(len(shard.entries) for shard in self._shards)
 
 
 class ExpressionCache:
-    def __init__(self, max_size: int = 500):
-        self.ast_cache = LRUCache(max_size // 2, ttl=7200)
-        self.evaluation_cache = LRUCache(max_size // 2, ttl=3600)
-        self.formula_cache = LRUCache(max_size // 4, ttl=1800)
+    """The caches behind MathEngine; like LRUCache, safe to share between threads.
+    
+    `max_bytes` is shared out 2:2:2:1:1 between the AST, program,
+    evaluation, formula and canonical caches; None bounds them by count
+    alone. The canonical cache maps spellings to the canonical ones engines
+    with canonical keys use (see canonical_form).
+    
+    With a `backend` (e.g. persistent.SQLiteBackend) evaluations are also
+    written through to a second tier, and a miss in memory is looked up
+    there before it counts as one, so results outlive the process. Only
+    EvaluationResults are stored there, under their key and `formulas`, a
+    digest of the formula set (see Folex.formula_digest); the backend can
+    also be set later, as in `get_global_cache().backend = SQLiteBackend(path)`.
+    """
+
+    def __init__(self, max_size: int = 500, shards: Optional[int] = None,
+                 max_bytes: Optional[int] = 32 * 1024 * 1024, backend: Optional[CacheBackend] = None):
+        def budget(share: int) -> Optional[int]:
+            return None if max_bytes is None else max_bytes * share // 8
+        
+        self.ast_cache = LRUCache(max_size // 2, ttl=7200, shards=shards, max_bytes=budget(2))
+        self.program_cache = LRUCache(max_size // 2, ttl=7200, shards=shards, max_bytes=budget(2))
+        self.evaluation_cache = LRUCache(max_size // 2, ttl=3600, shards=shards, max_bytes=budget(2))
+        self.formula_cache = LRUCache(max_size // 4, ttl=1800, shards=shards, max_bytes=budget(1))
+        self.canonical_cache = LRUCache(max_size // 2, ttl=7200, shards=shards, max_bytes=budget(1))
+        # Keys alone, as an evaluation cache of the same entry count keyed by
+        # the given spellings would hold them; canonical keys are measured
+        # against what it hits (its byte budget is not simulated)
+        self._spelled_keys = LRUCache(max_size // 2, ttl=3600, shards=shards)
+        self._canonical_lock = threading.Lock()
+        self._canonical_counts = {"lookups": 0, "hits": 0, "spelled_hits": 0}
+        self.backend = backend
 
     def get_cached_ast(self, expression: str) -> Optional[Any]:
         return self.ast_cache.get(expression)
@@ -124,39 +371,94 @@ class ExpressionCache:
     def cache_ast(self, expression: str, ast: Any) -> None:
         self.ast_cache.put(expression, ast)
 
-    def get_cached_evaluation(self, expression: str, variables: Dict[str, float] = None) -> Optional[Any]:
-        key = self._make_evaluation_key(expression, variables)
-        return self.evaluation_cache.get(key)
-
-    def cache_evaluation(self, expression: str, variables: Dict[str, float], result: Any) -> None:
-        key = self._make_evaluation_key(expression, variables)
+    def get_cached_program(self, expression: str) -> Optional[Any]:
+        return self.program_cache.get(expression)
+
+    def cache_program(self, expression: str, program: Any) -> None:
+        self.program_cache.put(expression, program)
+
+    def get_cached_evaluation(self, expression: str, variables: Dict[str, float] = None,
+                              steps: str = "full", formulas: str = "") -> Optional[Any]:
+        key = self._make_evaluation_key(expression, variables, steps)
+        result = self.evaluation_cache.get(key)
+        backend = self.backend
+        if result is None and backend is not None:
+            data = backend.get(_stored_key(key, formulas))
+            if data is None:
+                return None
+            try:
+                result = decode_result(data)
+            except ValueError:
+                return None
+            self.evaluation_cache.put(key, result)
+        return result
+
+    def cache_evaluation(self, expression: str, variables: Dict[str, float], result: Any,
+                         steps: str = "full", formulas: str = "") -> None:
+        key = self._make_evaluation_key(expression, variables, steps)
         self.evaluation_cache.put(key, result)
-
-    def get_cached_formulas(self, expression: str) -> Optional[List[Any]]:
-        return self.formula_cache.get(expression)
-
-    def cache_formulas(self, expression: str, formulas: List[Any]) -> None:
-        self.formula_cache.put(expression, formulas)
-
-    def _make_evaluation_key(self, expression: str, variables: Dict[str, float] = None) -> str:
-        if variables is None:
-            variables = {}
-        
-        sorted_vars = sorted(variables.items())
-        var_str = json.dumps(sorted_vars, sort_keys=True)
-        
-        return f"{expression}|{var_str}"
+        backend = self.backend
+        if backend is not None:
+            try:
+                data = encode_result(result)
+            except TypeError:
+                return
+            backend.put(_stored_key(key, formulas), data)
+
+    def get_cached_canonical(self, expression: str, level: str) -> Optional[str]:
+        return self.canonical_cache.get((expression, level))
+
+    def cache_canonical(self, expression: str, level: str, canonical: str) -> None:
+        self.canonical_cache.put((expression, level), canonical)
+
+    def record_canonical_lookup(self, expression: str, variables: Dict[str, float], steps: str,
+                                hit: bool) -> None:
+        """Count an evaluation lookup made under a canonical key, and whether
+        the same lookup under `expression` as given would have hit"""
+        key = self._make_evaluation_key(expression, variables, steps)
+        spelled_hit = self._spelled_keys.get(key) is not None
+        if not spelled_hit:
+            self._spelled_keys.put(key, True)
+        with self._canonical_lock:
+            counts = self._canonical_counts
+            counts["lookups"] += 1
+            counts["hits"] += hit
+            counts["spelled_hits"] += spelled_hit
+
+    def get_cached_formulas(self, key: Hashable) -> Optional[List[Any]]:
+        return self.formula_cache.get(key)
+
+    def cache_formulas(self, key: Hashable, formulas: List[Any]) -> None:
+        self.formula_cache.put(key, formulas)
+
+    def _make_evaluation_key(self, expression: str, variables: Dict[str, float] = None,
+                             steps: str = "full") -> Hashable:
+        # Results recorded at a lower step level must not answer a "full" request
+        return expression, _variables_key(variables), steps
 
     def clear_all(self) -> None:
         self.ast_cache.clear()
+        self.program_cache.clear()
         self.evaluation_cache.clear()
         self.formula_cache.clear()
+        self.canonical_cache.clear()
+        self._spelled_keys.clear()
+        if self.backend is not None:
+            self.backend.clear()
 
     def get_stats(self) -> Dict[str, Any]:
+        with self._canonical_lock:
+            canonical = dict(self._canonical_counts)
+        lookups = canonical["lookups"]
+        canonical["hit_rate_gain"] = (canonical["hits"] - canonical["spelled_hits"]) / lookups if lookups else 0
         return {
             "ast_cache": self.ast_cache.get_stats(),
+            "program_cache": self.program_cache.get_stats(),
             "evaluation_cache": self.evaluation_cache.get_stats(),
-            "formula_cache": self.formula_cache.get_stats()
+            "formula_cache": self.formula_cache.get_stats(),
+            "canonical_cache": self.canonical_cache.get_stats(),
+            "canonical": canonical,
+            "backend": None if self.backend is None else self.backend.get_stats()
         }
 
 
@@ -165,9 +467,15 @@ class LazyEvaluator:
         self.cache = cache
         self.evaluation_queue: List[Tuple[str, Dict[str, float], Any]] = []
         self.partial_results: Dict[str, Any] = {}
+        # The same request queued twice gets the same id
+        self._queue_ids: Dict[Hashable, str] = {}
+        self._next_id = count()
 
     def add_to_queue(self, expression: str, variables: Dict[str, float] = None, priority: int = 0) -> str:
-        queue_id = hashlib.md5(f"{expression}{variables}{priority}".encode()).hexdigest()
+        key = (expression, _variables_key(variables), priority)
+        queue_id = self._queue_ids.get(key)
+        if queue_id is None:
+            queue_id = self._queue_ids[key] = f"q{next(self._next_id)}"
         
         self.evaluation_queue.append((queue_id, expression, variables or {}, priority))
         self.evaluation_queue.sort(key=lambda x: x[3], reverse=True)
@@ -180,13 +488,8 @@ class LazyEvaluator:
         
         queue_id, expression, variables, priority = self.evaluation_queue.pop(0)
         
-        cached_result = self.cache.get_cached_evaluation(expression, variables)
-        if cached_result is not None:
-            self.partial_results[queue_id] = cached_result
-            return queue_id, cached_result
-        
+        # The evaluator caches under its own step level and formula set
         result = evaluator_func(expression, variables)
-        self.cache.cache_evaluation(expression, variables, result)
         self.partial_results[queue_id] = result
         
         return queue_id, result
@@ -197,6 +500,7 @@ class LazyEvaluator:
     def clear_queue(self) -> None:
         self.evaluation_queue.clear()
         self.partial_results.clear()
+        self._queue_ids.clear()
 
     def get_queue_status(self) -> Dict[str, Any]:
         return {
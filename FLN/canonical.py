@@ -0,0 +1,86 @@
+import re
+from typing import Tuple, Union
+from .ast_nodes import ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode, ParenthesesNode, UnaryNode
+from .data_structures import CanonicalLevel
+from .parser import Parser, _BINARY_PRECEDENCE, _UNARY_PRECEDENCE
+
+
+# The symbols Folex._clean_expression maps, and two more that look the same
+_SPELLINGS = str.maketrans({'×': '*', '·': '*', '÷': '/', '−': '-', '²': '^2', '³': '^3'})
+
+# Whitespace next to a one-character token never changes the tokens; anywhere
+# else ("2 3", "sin x") it separates two of them and is kept
+_AROUND_SYMBOLS = re.compile(r'\s*([-+*/^=(),_∫])\s*')
+_SPACES = re.compile(r'\s+')
+
+# Numbers the tokenizer reads back as they print; others keep their spelling
+_NUMBER = re.compile(r'\d+(\.\d*)?')
+
+# Binding power of numbers, names, function calls and anything in parentheses
+_PRIMARY = 5
+
+_COMMUTATIVE = frozenset({'+', '*'})
+
+_PARSER = Parser()
+
+
+def normalize_text(expression: str) -> str:
+    """The same tokens in one spelling: ASCII operators, no whitespace around symbols"""
+    text = _AROUND_SYMBOLS.sub(r'\1', expression.translate(_SPELLINGS))
+    return _SPACES.sub(' ', text).strip()
+
+
+def canonical_form(expression: str, level: Union[CanonicalLevel, str] = CanonicalLevel.STRUCTURE) -> str:
+    """The spelling an expression is cached under at `level`.
+    
+    From STRUCTURE on, the expression is parsed and printed again with only
+    the parentheses the parser needs, so "(x+1)", "x + 1" and "((x)+1)" all
+    become "x+1"; COMMUTATIVE also puts the operands of each + and * in
+    order, so "y*x" becomes "x*y". Both are exact in floating point, and
+    the canonical spelling parses back to the same tree. What cannot be
+    respelled exactly (calculus, input the parser would only partly read,
+    numbers that print in exponent form) keeps its normalized text.
+    """
+    level = CanonicalLevel(level)
+    if level is CanonicalLevel.NONE:
+        return expression
+    text = normalize_text(expression)
+    if level is CanonicalLevel.TEXT:
+        return text
+    try:
+        return _print(_PARSER.parse_complete(text), level is CanonicalLevel.COMMUTATIVE)[0]
+    except (ValueError, RecursionError):
+        return text
+
+
+def _print(node: ASTNode, commutative: bool) -> Tuple[str, int]:
+    """`node` with the fewest parentheses, and how tightly the result binds"""
+    kind = type(node)
+    if kind is ParenthesesNode:
+        return _print(node.expression, commutative)
+    if kind is NumberNode:
+        text = str(node.value)
+        if not _NUMBER.fullmatch(text):
+            raise ValueError(f"{text} does not read back as a number")
+        return text, _PRIMARY
+    if kind is VariableNode:
+        return node.name, _PRIMARY
+    if kind is FunctionNode:
+        return f"{node.function_name}({_print(node.argument, commutative)[0]})", _PRIMARY
+    if kind is UnaryNode:
+        text, binding = _print(node.operand, commutative)
+        # A sign is followed by ^ or a primary, never by another sign
+        if binding <= _UNARY_PRECEDENCE:
+            text = f"({text})"
+        return node.operator + text, _UNARY_PRECEDENCE
+    if kind is OperatorNode and node.operator in _BINARY_PRECEDENCE:
+        precedence = _BINARY_PRECEDENCE[node.operator]
+        left = _print(node.left, commutative)
+        right = _print(node.right, commutative)
+        if commutative and node.operator in _COMMUTATIVE and right[0] < left[0]:
+            left, right = right, left
+        # Everything associates to the left, and no sign may follow ^
+        left_text = left[0] if left[1] >= precedence else f"({left[0]})"
+        right_text = right[0] if right[1] > precedence else f"({right[0]})"
+        return f"{left_text}{node.operator}{right_text}", precedence
+    raise ValueError(f"No canonical form for {kind.__name__}")
@@ -0,0 +1,139 @@
+from array import array
+from typing import Dict, List, Optional, Tuple, Any
+from .ast_nodes import (
+    ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode,
+    ParenthesesNode, UnaryNode, DerivativeNode, IntegralNode,
+    NodeInterner, get_node_interner
+)
+
+
+# Node kinds, stored in the low bits of each node's code
+_NUMBER = 0
+_VARIABLE = 1
+_OPERATOR = 2
+_FUNCTION = 3
+_PARENTHESES = 4
+_UNARY = 5
+_DERIVATIVE = 6
+_INTEGRAL = 7
+
+_KIND_BITS = 3
+_KIND_MASK = (1 << _KIND_BITS) - 1
+
+# Each node takes four ints: code (kind | symbol index << _KIND_BITS) and up
+# to three child indices, -1 where absent
+_STRIDE = 4
+_NO_CHILD = -1
+
+
+def _describe(node: ASTNode) -> Tuple[int, Any, Tuple[Optional[ASTNode], ...]]:
+    """Kind, symbol and children of a node"""
+    if isinstance(node, NumberNode):
+        return _NUMBER, node.value, ()
+    elif isinstance(node, VariableNode):
+        return _VARIABLE, node.name, ()
+    elif isinstance(node, OperatorNode):
+        return _OPERATOR, node.operator, (node.left, node.right)
+    elif isinstance(node, FunctionNode):
+        return _FUNCTION, node.function_name, (node.argument,)
+    elif isinstance(node, ParenthesesNode):
+        return _PARENTHESES, None, (node.expression,)
+    elif isinstance(node, UnaryNode):
+        return _UNARY, node.operator, (node.operand,)
+    elif isinstance(node, DerivativeNode):
+        return _DERIVATIVE, node.variable, (node.expression,)
+    elif isinstance(node, IntegralNode):
+        return _INTEGRAL, node.variable, (node.expression, node.lower_bound, node.upper_bound)
+    raise ValueError(f"Unknown node type: {type(node)}")
+
+
+class CompactAST:
+    """An AST flattened into one `array` of ints plus a symbol table.
+    
+    Nodes are stored in post-order, so children always precede their parent
+    and the root is the last node. Shared subtrees (see NodeInterner) are
+    stored once. Meant for holding many parsed expressions; convert back
+    with to_ast() to evaluate.
+    """
+    
+    __slots__ = ('nodes', 'symbols')
+    
+    def __init__(self, nodes: array, symbols: Tuple[Any, ...]):
+        self.nodes = nodes
+        self.symbols = symbols
+    
+    @classmethod
+    def from_ast(cls, ast: ASTNode) -> 'CompactAST':
+        nodes = array('i')
+        symbols: List[Any] = []
+        symbol_index: Dict[Tuple[type, str], int] = {}
+        index: Dict[int, int] = {}  # id(node) -> position
+        
+        stack: List[Tuple[ASTNode, bool]] = [(ast, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in index:
+                continue
+            kind, symbol, children = _describe(node)
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children)
+                             if child is not None and id(child) not in index)
+                continue
+            
+            code = kind
+            if symbol is not None:
+                # repr keeps 2 / 2.0 apart, which a plain dict key would not
+                key = (type(symbol), repr(symbol))
+                position = symbol_index.get(key)
+                if position is None:
+                    position = symbol_index[key] = len(symbols)
+                    symbols.append(symbol)
+                code |= position << _KIND_BITS
+            child_positions = [index[id(child)] if child is not None else _NO_CHILD for child in children]
+            child_positions += [_NO_CHILD] * (_STRIDE - 1 - len(child_positions))
+            index[id(node)] = len(nodes) // _STRIDE
+            nodes.append(code)
+            nodes.extend(child_positions)
+        
+        return cls(nodes, tuple(symbols))
+    
+    def to_ast(self, interner: Optional[NodeInterner] = None) -> ASTNode:
+        """Rebuild the nodes through `interner` (the shared one by default)"""
+        if interner is None:
+            interner = get_node_interner()
+        nodes, symbols = self.nodes, self.symbols
+        built: List[ASTNode] = []
+        for offset in range(0, len(nodes), _STRIDE):
+            code, first, second, third = nodes[offset:offset + _STRIDE]
+            kind = code & _KIND_MASK
+            symbol = symbols[code >> _KIND_BITS] if kind != _PARENTHESES else None
+            if kind == _NUMBER:
+                node = interner.number(symbol)
+            elif kind == _VARIABLE:
+                node = interner.variable(symbol)
+            elif kind == _OPERATOR:
+                node = interner.operator(symbol, built[first], built[second])
+            elif kind == _FUNCTION:
+                node = interner.function(symbol, built[first])
+            elif kind == _PARENTHESES:
+                node = interner.parentheses(built[first])
+            elif kind == _UNARY:
+                node = interner.unary(symbol, built[first])
+            elif kind == _DERIVATIVE:
+                node = interner.derivative(symbol, built[first])
+            else:
+                lower_bound = built[second] if second != _NO_CHILD else None
+                upper_bound = built[third] if third != _NO_CHILD else None
+                node = interner.integral(symbol, built[first], lower_bound, upper_bound)
+            built.append(node)
+        return built[-1]
+    
+    def to_string(self) -> str:
+        return self.to_ast().to_string()
+    
+    def __len__(self) -> int:
+        return len(self.nodes) // _STRIDE
+    
+    def __repr__(self) -> str:
+        return f"CompactAST({len(self)} nodes, symbols={self.symbols!r})"
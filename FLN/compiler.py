@@ -0,0 +1,256 @@
+from typing import Dict, Union, Callable, FrozenSet, Any, Tuple
+import math
+import operator
+from .ast_nodes import (
+    ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode,
+    ParenthesesNode, UnaryNode, DerivativeNode, IntegralNode
+)
+
+
+# A lowered node: takes the variables dict, returns what Natix would return
+Evaluator = Callable[[Dict[str, Any]], Union[float, str]]
+
+# Exceptions Natix turns into "Error in ..." results instead of raising
+_CAUGHT = (ValueError, OverflowError, ZeroDivisionError)
+
+
+def _divide(left, right):
+    if right == 0:
+        return f"Error: Division by zero ({left} / {right})"
+    return left / right
+
+
+def _power(left, right):
+    if right == 0:
+        return 1
+    if right == 1:
+        return left
+    if right < 0 and left == 0:
+        return f"Error: Cannot raise 0 to negative power {right}"
+    if right < 0 and abs(left) < 1e-10:
+        return f"Error: Cannot raise very small number {left} to negative power {right}"
+    try:
+        result = left ** right
+        if math.isinf(result):
+            return f"Error: Power overflow: {left}^{right}"
+    except OverflowError:
+        return f"Error: Power overflow: {left}^{right}"
+    return result
+
+
+def _modulo(left, right):
+    if right == 0:
+        return f"Error: Modulo by zero ({left} % {right})"
+    return left % right
+
+
+BINARY_KERNELS: Dict[str, Callable[[Any, Any], Union[float, str]]] = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': _divide,
+    '^': _power,
+    '%': _modulo,
+}
+
+
+def _sqrt(arg):
+    if arg < 0:
+        return f"Error: Cannot take square root of negative number {arg}"
+    return math.sqrt(arg)
+
+
+def _tan(arg):
+    # Check for undefined values (π/2 + kπ)
+    if abs(math.cos(arg)) < 1e-10:
+        return f"Error: Tangent is undefined at {arg} (cos({arg}) = 0)"
+    return math.tan(arg)
+
+
+def _log(arg):
+    if arg <= 0:
+        return f"Error: Cannot take logarithm of non-positive number {arg}"
+    return math.log10(arg)
+
+
+def _ln(arg):
+    if arg <= 0:
+        return f"Error: Cannot take natural logarithm of non-positive number {arg}"
+    return math.log(arg)
+
+
+def _exp(arg):
+    try:
+        result = math.exp(arg)
+        if math.isinf(result):
+            return f"Error: Exponential overflow for {arg}"
+    except OverflowError:
+        return f"Error: Exponential overflow for {arg}"
+    return result
+
+
+def _factorial(arg):
+    if arg < 0 or arg != int(arg):
+        return f"Error: Cannot take factorial of {arg} (must be non-negative integer)"
+    if arg > 170:  # Python's limit for factorial
+        return f"Error: Factorial overflow for {arg} (max: 170)"
+    return math.factorial(int(arg))
+
+
+def _asin(arg):
+    if arg < -1 or arg > 1:
+        return f"Error: Arcsin domain error: {arg} not in [-1, 1]"
+    return math.asin(arg)
+
+
+def _acos(arg):
+    if arg < -1 or arg > 1:
+        return f"Error: Arccos domain error: {arg} not in [-1, 1]"
+    return math.acos(arg)
+
+
+FUNCTION_KERNELS: Dict[str, Callable[[Any], Union[float, str]]] = {
+    'sqrt': _sqrt,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': _tan,
+    'log': _log,
+    'ln': _ln,
+    'abs': abs,
+    'exp': _exp,
+    'factorial': _factorial,
+    'asin': _asin,
+    'acos': _acos,
+    'atan': math.atan,
+    'sinh': math.sinh,
+    'cosh': math.cosh,
+    'tanh': math.tanh,
+    'cbrt': lambda arg: arg ** (1/3),
+    'floor': math.floor,
+    'ceil': math.ceil,
+    'round': round,
+}
+
+
+def _lower_binary(operator_symbol: str, left: Evaluator, right: Evaluator) -> Evaluator:
+    kernel = BINARY_KERNELS.get(operator_symbol)
+    if kernel is None:
+        def kernel(left_value, right_value):
+            return f"Error: Unknown operator '{operator_symbol}'"
+    
+    def evaluate(variables):
+        left_value = left(variables)
+        right_value = right(variables)
+        if isinstance(left_value, str) or isinstance(right_value, str):
+            return f"{left_value} {operator_symbol} {right_value}"
+        try:
+            return kernel(left_value, right_value)
+        except _CAUGHT as e:
+            return f"Error in {operator_symbol} operation: {str(e)}"
+    
+    return evaluate
+
+
+def _lower_function(function_name: str, argument: Evaluator) -> Evaluator:
+    kernel = FUNCTION_KERNELS.get(function_name)
+    if kernel is None:
+        def kernel(arg_value):
+            return f"Error: Unknown function '{function_name}'"
+    
+    def evaluate(variables):
+        arg_value = argument(variables)
+        if isinstance(arg_value, str):
+            return f"{function_name}({arg_value})"
+        try:
+            return kernel(arg_value)
+        except _CAUGHT as e:
+            return f"Error in {function_name} function: {str(e)}"
+    
+    return evaluate
+
+
+def _lower_unary(operator_symbol: str, operand: Evaluator) -> Evaluator:
+    def evaluate(variables):
+        operand_value = operand(variables)
+        if isinstance(operand_value, str):
+            return f"{operator_symbol}{operand_value}"
+        if operator_symbol == "-":
+            return -operand_value
+        if operator_symbol == "+":
+            return operand_value
+        return f"Error in unary operation: Unknown unary operator: {operator_symbol}"
+    
+    return evaluate
+
+
+def _constant(value: Union[float, str]) -> Evaluator:
+    return lambda variables: value
+
+
+def _lower(node: ASTNode, names: set) -> Tuple[Evaluator, bool]:
+    """Lower a node to a closure, folding subtrees that use no variables.
+    
+    Returns the closure and whether it depends on variables.
+    """
+    if isinstance(node, NumberNode):
+        return _constant(node.value), False
+    elif isinstance(node, VariableNode):
+        name = node.name
+        names.add(name)
+        return (lambda variables: variables[name] if name in variables else name), True
+    elif isinstance(node, ParenthesesNode):
+        return _lower(node.expression, names)
+    elif isinstance(node, (DerivativeNode, IntegralNode)):
+        return node.evaluate, True
+    elif isinstance(node, OperatorNode):
+        left, left_dynamic = _lower(node.left, names)
+        right, right_dynamic = _lower(node.right, names)
+        evaluate = _lower_binary(node.operator, left, right)
+        dynamic = left_dynamic or right_dynamic
+    elif isinstance(node, FunctionNode):
+        argument, dynamic = _lower(node.argument, names)
+        evaluate = _lower_function(node.function_name, argument)
+    elif isinstance(node, UnaryNode):
+        operand, dynamic = _lower(node.operand, names)
+        evaluate = _lower_unary(node.operator, operand)
+    else:
+        raise ValueError(f"Unknown node type: {type(node)}")
+    
+    if not dynamic:
+        try:
+            return _constant(evaluate({})), False
+        except Exception:
+            # Leave it to raise at call time, exactly like Natix would
+            pass
+    return evaluate, dynamic
+
+
+def evaluate_ast(ast: ASTNode, variables: Dict[str, Any] = None) -> Union[float, str]:
+    """Evaluate an AST once, returning what Natix.evaluate would without the steps"""
+    evaluate, _ = _lower(ast, set())
+    return evaluate(variables or {})
+
+
+class CompiledExpression:
+    """An expression lowered once into closures for repeated evaluation.
+    
+    Calling it returns the same value Natix.evaluate would for the same
+    variables (numbers, symbolic strings or "Error: ..." strings) without
+    recording any computation steps.
+    """
+    
+    def __init__(self, expression: str, ast: ASTNode):
+        self.expression = expression
+        self.ast = ast
+        names: set = set()
+        self._evaluate, _ = _lower(ast, names)
+        self.variables: FrozenSet[str] = frozenset(names)
+    
+    def __call__(self, **variables) -> Union[float, str]:
+        return self._evaluate(variables)
+    
+    def evaluate(self, variables: Dict[str, float] = None) -> Union[float, str]:
+        return self._evaluate(variables or {})
+    
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.expression!r}, variables={sorted(self.variables)})"
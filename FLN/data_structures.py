@@ -9,6 +9,19 @@ class EvaluationType(Enum):
     MIXED = "mixed"
 
 
+class StepLevel(Enum):
+    NONE = "none"          # final result only, no steps are built
+    SUMMARY = "summary"    # the top-level operation and its direct operands
+    FULL = "full"          # every node
+
+
+class CanonicalLevel(Enum):
+    NONE = "none"                # the expression as given
+    TEXT = "text"                # whitespace and operator symbols normalized
+    STRUCTURE = "structure"      # respelled from the parse, without redundant parentheses
+    COMMUTATIVE = "commutative"  # and the operands of + and * in a fixed order
+
+
 @dataclass
 class FormulaMatch:
     formula_name: str
@@ -16,6 +29,7 @@ class FormulaMatch:
     matched_expression: str
     variables: Dict[str, str]
     confidence: float = 1.0
+    bindings: Dict[str, Any] = field(default_factory=dict)  # variable -> ASTNode, structural matches only
 
 
 @dataclass
@@ -38,6 +52,7 @@ class EvaluationResult:
     computation_steps: List[ComputationStep] = field(default_factory=list)
     is_exact: bool = True
     error_message: Optional[str] = None
+    detection_stats: Dict[str, int] = field(default_factory=dict)  # see folex.DetectionContext
 
 
 @dataclass
@@ -49,6 +64,7 @@ class FormulaDefinition:
     category: str = "General"
     description: str = ""
     topic: str = ""
+    tree_pattern: str = ""  # structural form of `pattern`, e.g. "(?a + ?b)^2" (see patterns.py)
 
 
 @dataclass
@@ -0,0 +1,430 @@
+import itertools
+import math
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from .ast_nodes import ASTNode, ParenthesesNode, VariableNode
+from .patterns import RewriteSystem, _WILDCARD, _flatten, _from_head, _head
+
+
+# An e-node is a node key (see patterns._head) with the e-classes of its children
+ENode = Tuple[Any, Tuple[int, ...]]
+
+# cost(node key, costs of the chosen children) -> cost of the node
+CostFunction = Callable[[Any, List[float]], float]
+
+
+def ast_size(key: Any, child_costs: List[float]) -> float:
+    """Number of nodes; the default extraction cost"""
+    return 1 + sum(child_costs)
+
+
+def ast_depth(key: Any, child_costs: List[float]) -> float:
+    """Height of the tree"""
+    return 1 + max(child_costs, default=0)
+
+
+class EClass:
+    __slots__ = ('nodes', 'parents')
+    
+    def __init__(self):
+        self.nodes: List[ENode] = []
+        self.parents: List[Tuple[ENode, int]] = []  # (e-node using this class, its class)
+
+
+@dataclass
+class SaturationReport:
+    iterations: int = 0
+    stop_reason: str = ""       # "saturated", "iteration_limit" or "node_limit"
+    merges: int = 0             # rule matches that merged two classes
+    classes_searched: int = 0   # (rule, root class) pairs e-matched
+
+
+def _depth(pattern: ASTNode) -> int:
+    """Height of a pattern, not counting parentheses"""
+    depths: Dict[int, int] = {}
+    stack: List[Tuple[ASTNode, bool]] = [(pattern, False)]
+    while stack:
+        node, expanded = stack.pop()
+        children = node.children()
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+            continue
+        below = max((depths[id(child)] for child in children), default=0)
+        depths[id(node)] = below if isinstance(node, ParenthesesNode) else below + 1
+    return depths[id(pattern)]
+
+
+def _compile_pattern(pattern: ASTNode) -> tuple:
+    """(key, compiled children) per node, (_WILDCARD, name) per pattern variable"""
+    while isinstance(pattern, ParenthesesNode):
+        pattern = pattern.expression
+    if isinstance(pattern, VariableNode) and pattern.name.startswith('?'):
+        return _WILDCARD, pattern.name[1:]
+    key, children = _head(pattern)
+    return key, tuple(_compile_pattern(child) for child in children)
+
+
+class EGraph:
+    """Expressions grouped into classes of equal value.
+    
+    Every e-node is stored once (hash-consing) and points at the classes of
+    its children, so one class stands for all the expressions built from
+    any combination of its members. Merging two classes is deferred
+    congruence closure, as in egg: rebuild() re-canonicalizes the parents
+    of merged classes and merges parents that became identical.
+    
+    saturate() applies rewrite rules as equalities until nothing new is
+    learnt, and extract() picks the cheapest expression of a class.
+    """
+    
+    def __init__(self):
+        self._parent: List[int] = []
+        self._classes: Dict[int, EClass] = {}
+        self._hashcons: Dict[ENode, int] = {}
+        self._by_head: Dict[Any, Set[int]] = {}  # node key -> classes holding such an e-node
+        self._pending: List[int] = []            # merged classes whose parents need repair
+        self._touched: Set[int] = set()          # classes changed since the last search
+        self._node_count = 0
+    
+    def find(self, class_id: int) -> int:
+        parent = self._parent
+        root = class_id
+        while parent[root] != root:
+            root = parent[root]
+        while parent[class_id] != root:
+            parent[class_id], class_id = root, parent[class_id]
+        return root
+    
+    def _canonical(self, enode: ENode) -> ENode:
+        key, children = enode
+        return key, tuple(self.find(child) for child in children)
+    
+    def add(self, enode: ENode) -> int:
+        """Class of an e-node, creating it when the e-node is new"""
+        enode = self._canonical(enode)
+        class_id = self._hashcons.get(enode)
+        if class_id is not None:
+            return self.find(class_id)
+        class_id = len(self._parent)
+        self._parent.append(class_id)
+        eclass = self._classes[class_id] = EClass()
+        eclass.nodes.append(enode)
+        for child in enode[1]:
+            self._classes[child].parents.append((enode, class_id))
+        self._hashcons[enode] = class_id
+        self._by_head.setdefault(enode[0], set()).add(class_id)
+        self._touched.add(class_id)
+        self._node_count += 1
+        return class_id
+    
+    def add_ast(self, ast: ASTNode) -> int:
+        """Insert an expression and return its class; parentheses only group"""
+        classes: Dict[int, int] = {}
+        stack: List[Tuple[ASTNode, bool]] = [(ast, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in classes:
+                continue
+            children = node.children()
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+                continue
+            if isinstance(node, ParenthesesNode):
+                classes[id(node)] = classes[id(children[0])]
+            else:
+                classes[id(node)] = self.add((_head(node)[0], tuple(classes[id(child)] for child in children)))
+        return classes[id(ast)]
+    
+    def _add_template(self, template: ASTNode, bindings: Dict[str, int]) -> int:
+        classes: Dict[int, int] = {}
+        stack: List[Tuple[ASTNode, bool]] = [(template, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in classes:
+                continue
+            if isinstance(node, VariableNode) and node.name.startswith('?'):
+                classes[id(node)] = bindings[node.name[1:]]
+                continue
+            children = node.children()
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+                continue
+            classes[id(node)] = self.add((_head(node)[0], tuple(classes[id(child)] for child in children)))
+        return classes[id(template)]
+    
+    def union(self, first: int, second: int) -> bool:
+        """Merge two classes; False when they already were one"""
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return False
+        if len(self._classes[first].parents) < len(self._classes[second].parents):
+            first, second = second, first
+        self._parent[second] = first
+        merged = self._classes.pop(second)
+        eclass = self._classes[first]
+        eclass.nodes.extend(merged.nodes)
+        eclass.parents.extend(merged.parents)
+        self._pending.append(first)
+        self._touched.add(first)
+        return True
+    
+    def rebuild(self) -> None:
+        """Restore congruence after merges: equal children make equal parents"""
+        while self._pending:
+            todo = {self.find(class_id) for class_id in self._pending}
+            self._pending = []
+            for class_id in todo:
+                self._repair(self.find(class_id))
+    
+    def _repair(self, class_id: int) -> None:
+        eclass = self._classes[class_id]
+        for enode, _ in eclass.parents:
+            self._hashcons.pop(enode, None)
+        parents: Dict[ENode, int] = {}
+        for enode, parent in eclass.parents:
+            enode = self._canonical(enode)
+            other = parents.get(enode)
+            if other is not None:
+                self.union(other, parent)
+            parents[enode] = self._hashcons[enode] = self.find(parent)
+        if self.find(class_id) == class_id:
+            # Otherwise the class was merged away and its survivor is pending
+            eclass.parents = list(parents.items())
+            eclass.nodes = list(dict.fromkeys(self._canonical(enode) for enode in eclass.nodes))
+    
+    def _ematch(self, pattern: tuple, class_id: int, bindings: Dict[str, int]) -> Iterator[Dict[str, int]]:
+        """Bindings (pattern variable -> class) under which a compiled pattern occurs in a class"""
+        key, rest = pattern
+        if key is _WILDCARD:
+            bound = bindings.get(rest)
+            if bound is None:
+                yield {**bindings, rest: class_id}
+            elif self.find(bound) == class_id:
+                yield bindings
+            return
+        for enode_key, children in self._classes[class_id].nodes:
+            if enode_key != key:
+                continue
+            partial = [bindings]
+            for pattern_child, child in zip(rest, children):
+                partial = [found for earlier in partial
+                           for found in self._ematch(pattern_child, self.find(child), earlier)]
+                if not partial:
+                    break
+            yield from partial
+    
+    def _dirty_classes(self, depth: int) -> Set[int]:
+        """Classes a pattern of this height may newly match at: the ones
+        changed since the last search and their ancestors up to depth - 1"""
+        dirty = {self.find(class_id) for class_id in self._touched}
+        frontier = dirty
+        for _ in range(depth - 1):
+            frontier = {self.find(parent) for class_id in frontier
+                        for _, parent in self._classes[class_id].parents} - dirty
+            if not frontier:
+                break
+            dirty |= frontier
+        return dirty
+    
+    def saturate(self, rules: RewriteSystem, max_iterations: int = 8, max_nodes: int = 5000,
+                 match_limit: int = 500) -> SaturationReport:
+        """Apply every rule as an equality until nothing changes or a budget runs out.
+        
+        Each iteration only e-matches rules at classes that changed since
+        the previous one (or whose descendants within the pattern's height
+        did), so a quiet part of the graph is never searched twice. A rule
+        applies at most `match_limit` matches per iteration; the classes it
+        did not get to are searched again in the next one, so commutativity
+        and the like cannot starve the other rules.
+        """
+        compiled = [(_compile_pattern(pattern.ast), template.ast, pattern.head)
+                    for _, pattern, template, _ in rules.rules()]
+        depth = max((_depth(pattern.ast) for _, pattern, _, _ in rules.rules()), default=1)
+        report = SaturationReport()
+        self.rebuild()
+        
+        while True:
+            if report.iterations >= max_iterations:
+                report.stop_reason = "iteration_limit"
+                break
+            if self._node_count >= max_nodes:
+                report.stop_reason = "node_limit"
+                break
+            dirty = self._dirty_classes(depth)
+            self._touched = set()
+            
+            matches = []
+            for pattern, template, head in compiled:
+                if head is _WILDCARD:
+                    roots = dirty
+                else:
+                    roots = dirty & {self.find(class_id) for class_id in self._by_head.get(head, ())}
+                found = 0
+                for root in sorted(roots):
+                    if found >= match_limit:
+                        self._touched.add(root)
+                        continue
+                    report.classes_searched += 1
+                    for bindings in self._ematch(pattern, root, {}):
+                        if found >= match_limit:
+                            self._touched.add(root)
+                            break
+                        matches.append((template, root, bindings))
+                        found += 1
+            
+            for template, root, bindings in matches:
+                if self._node_count >= max_nodes:
+                    break
+                if self.union(root, self._add_template(template, bindings)):
+                    report.merges += 1
+            self.rebuild()
+            report.iterations += 1
+            
+            if not self._touched:
+                report.stop_reason = "saturated"
+                break
+        return report
+    
+    def extract(self, class_id: int, cost: CostFunction = ast_size) -> ASTNode:
+        """The cheapest expression in a class under `cost`.
+        
+        `cost` must not make a node cheaper than its children, otherwise
+        the cheapest choice could be a cycle and ValueError is raised.
+        """
+        self.rebuild()
+        best: Dict[int, Tuple[float, ENode]] = {}
+        for _ in range(len(self._classes) + 1):
+            changed = False
+            for eclass_id, eclass in self._classes.items():
+                for enode in eclass.nodes:
+                    key, children = enode
+                    child_costs = []
+                    for child in children:
+                        found = best.get(self.find(child))
+                        if found is None:
+                            break
+                        child_costs.append(found[0])
+                    else:
+                        value = cost(key, child_costs)
+                        current = best.get(eclass_id)
+                        if current is None or value < current[0]:
+                            best[eclass_id] = (value, enode)
+                            changed = True
+            if not changed:
+                break
+        
+        built: Dict[int, ASTNode] = {}
+        open_classes: Set[int] = set()
+        stack: List[Tuple[int, bool]] = [(self.find(class_id), False)]
+        while stack:
+            current, expanded = stack.pop()
+            if current in built:
+                continue
+            key, children = best[current][1]
+            children = tuple(self.find(child) for child in children)
+            if not expanded:
+                if current in open_classes:
+                    raise ValueError("Cost function chose a cyclic expression")
+                open_classes.add(current)
+                stack.append((current, True))
+                stack.extend((child, False) for child in children)
+                continue
+            built[current] = _from_head(key, [built[child] for child in children])
+        return built[self.find(class_id)]
+    
+    def equivalent(self, first: ASTNode, second: ASTNode) -> bool:
+        """Whether two expressions ended up in the same class"""
+        return self.find(self.add_ast(first)) == self.find(self.add_ast(second))
+    
+    @property
+    def class_count(self) -> int:
+        return len(self._classes)
+    
+    @property
+    def node_count(self) -> int:
+        return self._node_count
+
+
+# Names a rule may use that stand for constants rather than inputs
+_CONSTANTS = {'e': math.e, 'pi': math.pi}
+
+# Every input is tried negative, zero and positive
+_SIGNS = (-1.0, 0.0, 1.0)
+
+
+def _sample_inputs(names: Set[str], rng: random.Random, samples: int) -> Iterator[Dict[str, float]]:
+    """`samples` assignments to `names`, covering every combination of signs
+    when there are few enough inputs, and random signs otherwise"""
+    inputs = sorted(names - _CONSTANTS.keys())
+    combinations = len(_SIGNS) ** len(inputs)
+    if combinations <= samples:
+        signs = list(itertools.product(_SIGNS, repeat=len(inputs))) * (samples // combinations)
+    else:
+        signs = [tuple(rng.choice(_SIGNS) for _ in inputs) for _ in range(samples)]
+    for row in signs:
+        variables = {name: sign * rng.uniform(0.25, 2.5) for name, sign in zip(inputs, row)}
+        variables.update((name, _CONSTANTS[name]) for name in names & _CONSTANTS.keys())
+        yield variables
+
+
+def _value(side: ASTNode, variables: Dict[str, float]) -> Optional[float]:
+    """The number `side` evaluates to, or None where it is undefined"""
+    try:
+        value = side.evaluate(variables)
+    except Exception:
+        return None
+    if not isinstance(value, (int, float)) or math.isnan(value):
+        return None
+    return value
+
+
+def _holds_numerically(pattern: ASTNode, template: ASTNode, rng: random.Random,
+                       samples: int = 27, required: int = 3) -> bool:
+    """Whether both sides are defined at the same sampled inputs and agree there"""
+    names = {key[1] for side in (pattern, template) for key in _flatten(side)[0] if key[0] == 'variable'}
+    agreed = 0
+    for variables in _sample_inputs(names, rng, samples):
+        left = _value(pattern, variables)
+        right = _value(template, variables)
+        if left is None and right is None:
+            continue
+        # Defined on one side only: the rule holds on a narrower domain
+        if left is None or right is None:
+            return False
+        if not math.isclose(left, right, rel_tol=1e-9, abs_tol=1e-9):
+            return False
+        agreed += 1
+    return agreed >= required
+
+
+def sound_rules(rules: RewriteSystem) -> RewriteSystem:
+    """The rules whose two sides agree numerically.
+    
+    Formula replacements are written as one-way rewrites, some for narrower
+    inputs than their tree pattern accepts. Saturation uses every rule as an
+    equality between any subexpressions, so a single false rule would make
+    unequal expressions interchangeable. Rules that cannot be evaluated,
+    such as the derivative rules, are left out too. Inputs are sampled
+    negative, zero and positive, and a rule must be defined wherever its
+    other side is: sqrt(a*b) = sqrt(a)*sqrt(b) fails at negative a and b,
+    and log(a^b) = b*log(a) at negative a.
+    """
+    rng = random.Random(0)
+    checked = RewriteSystem()
+    for _, pattern, template, value in rules.rules():
+        if _holds_numerically(pattern.ast, template.ast, rng):
+            checked.add(pattern, template, value)
+    return checked
+
+
+def simplify(ast: ASTNode, rules: RewriteSystem, cost: CostFunction = ast_size,
+             max_iterations: int = 8, max_nodes: int = 5000) -> Tuple[ASTNode, SaturationReport]:
+    """Saturate an e-graph holding `ast` with `rules` and extract the cheapest equivalent"""
+    graph = EGraph()
+    root = graph.add_ast(ast)
+    report = graph.saturate(rules, max_iterations, max_nodes)
+    return graph.extract(root, cost), report
@@ -1,68 +1,87 @@
 from typing import List, Dict, Optional, Union, Tuple, Any
 from .parser import Parser
-from .folex import Folex
+from .folex import Folex, DetectionContext
 from .natix import Natix
+from .compiler import CompiledExpression
+from .bytecode import BytecodeProgram
+from .egraph import CostFunction, ast_size, simplify
+from .vectorized import VectorizedExpression
 from .monitor import ComputationMonitor
 from .ast_nodes import ASTNode
-from .data_structures import EvaluationResult, ComputationStep, FormulaMatch, FormulaDefinition
+from .data_structures import EvaluationResult, ComputationStep, FormulaMatch, FormulaDefinition, StepLevel, CanonicalLevel
 from .cache import ExpressionCache, LazyEvaluator, get_global_cache
+from .canonical import canonical_form
 from .formula_database import FormulaDatabase, get_formula_database
 
 
 class MathEngine:
-    def __init__(self, enable_caching: bool = True, enable_lazy_evaluation: bool = True):
-        self.parser = Parser()
-        self.folex = Folex()
-        self.natix = Natix()
-        self.monitor = ComputationMonitor()
-        
-        self.enable_caching = enable_caching
+    def __init__(self, enable_caching: bool = True, enable_lazy_evaluation: bool = True,
+                 steps: Union[StepLevel, str] = StepLevel.FULL,
+                 canonical: Union[CanonicalLevel, str] = CanonicalLevel.NONE):
+        self.caching_enabled = enable_caching
         self.enable_lazy_evaluation = enable_lazy_evaluation
+        self.steps = StepLevel(steps)
+        # Spellings that canonicalize alike share one evaluation, see evaluate()
+        self.canonical = CanonicalLevel(canonical)
         
         if enable_caching:
             self.cache = get_global_cache()
         else:
             self.cache = None
-            
+        
+        self.parser = Parser()
+        self.folex = Folex(cache=self.cache)
+        self.natix = Natix()
+        self.monitor = ComputationMonitor()
+        
         if enable_lazy_evaluation:
             self.lazy_evaluator = LazyEvaluator(self.cache) if self.cache else None
         else:
             self.lazy_evaluator = None
         
+        # Folex and the monitor fetch the database's formulas on first use
         self.formula_database = get_formula_database()
-        self._load_all_formulas()
     
-    def evaluate(self, expression: str, variables: Dict[str, float] = None) -> EvaluationResult:
+    def evaluate(self, expression: str, variables: Dict[str, float] = None,
+                 steps: Union[StepLevel, str] = None) -> EvaluationResult:
+        """Evaluate an expression; `steps` overrides the engine's step level for this call.
+        
+        With a canonical level other than NONE the engine evaluates the
+        expression's canonical spelling (see canonical_form) instead, so
+        every spelling of it shares one result: the one the canonical
+        spelling itself gets.
+        """
+        steps = self.steps if steps is None else StepLevel(steps)
         try:
-            if self.enable_caching and self.cache:
-                cached_result = self.cache.get_cached_evaluation(expression, variables)
+            key = self._canonical_key(expression)
+            if self.caching_enabled and self.cache:
+                formulas = self._formula_digest()
+                cached_result = self.cache.get_cached_evaluation(key, variables, steps.value, formulas)
+                if self.canonical is not CanonicalLevel.NONE:
+                    self.cache.record_canonical_lookup(expression, variables, steps.value, cached_result is not None)
                 if cached_result is not None:
                     return cached_result
             
-            # Detect formulas first
-            detected_formulas = self.detect_formulas(expression)
+            # Every detection below goes through one context, so each distinct
+            # string is only run against the formula patterns once
+            context = DetectionContext(self.folex)
+            ast = self._parse_with_cache(key)
+            detected_formulas = context.detect_formulas(key)
             
-            ast = self._parse_with_cache(expression)
-            result = self.monitor.monitor_evaluation(ast, variables)
+            result = self.monitor.monitor_evaluation(ast, variables, steps, context)
             
-            # Apply detected formulas to the result
+            # Report detected formulas; the value itself is not rewritten,
+            # apply_formula() and rewrite() do that on request
             if detected_formulas:
                 result.applied_formulas = detected_formulas
-                # Try to apply the highest confidence formula
-                best_formula = max(detected_formulas, key=lambda f: f.confidence)
-                if best_formula.confidence > 0.7:  # Only apply high-confidence formulas
-                    try:
-                        applied_result = self.apply_formula(expression, best_formula.formula_name)
-                        if applied_result != expression:
-                            result.final_result = applied_result
-                    except:
-                        pass  # If formula application fails, keep original result
             
-            if self.enable_caching and self.cache:
-                self.cache.cache_evaluation(expression, variables, result)
+            result.detection_stats = dict(context.stats)
             
-            return result
+            if self.caching_enabled and self.cache:
+                self.cache.cache_evaluation(key, variables, result, steps.value, formulas)
             
+            return result
+        
         except Exception as e:
             return EvaluationResult(
                 original_expression=expression,
@@ -74,43 +93,99 @@ class MathEngine:
                 error_message=str(e)
             )
     
+    def _formula_digest(self) -> str:
+        # Only results kept by a backend can outlive the formula set they
+        # were detected with; in memory the key stays as cheap as it was
+        return self.folex.formula_digest if self.cache.backend is not None else ""
+    
     def evaluate_with_steps(self, expression: str, variables: Dict[str, float] = None) -> List[ComputationStep]:
-        result = self.evaluate(expression, variables)
+        result = self.evaluate(expression, variables, StepLevel.FULL)
         return result.computation_steps
     
     def parse_expression(self, expression: str) -> ASTNode:
         return self._parse_with_cache(expression)
     
+    def compile(self, expression: str) -> CompiledExpression:
+        """Parse once and return a callable for repeated numeric evaluation"""
+        return CompiledExpression(expression, self._parse_with_cache(expression))
+    
+    def compile_bytecode(self, expression: str) -> BytecodeProgram:
+        """Parse once and return a stack-VM program, cached next to the AST"""
+        if self.caching_enabled and self.cache:
+            cached_program = self.cache.get_cached_program(expression)
+            if cached_program is not None:
+                return cached_program
+        
+        program = BytecodeProgram(expression, self._parse_with_cache(expression))
+        
+        if self.caching_enabled and self.cache:
+            self.cache.cache_program(expression, program)
+        
+        return program
+    
+    def vectorize(self, expression: str) -> VectorizedExpression:
+        """Parse once and return a callable evaluating over NumPy arrays (requires NumPy)"""
+        return VectorizedExpression(expression, self._parse_with_cache(expression))
+    
     def detect_formulas(self, expression: str) -> List[FormulaMatch]:
         ast = self.parse_expression(expression)
         return self.folex.detect_formulas(expression)
     
+    def match_formulas(self, expression: str) -> List[FormulaMatch]:
+        """Formulas whose tree pattern matches the expression or any of its subexpressions"""
+        return self.folex.match_ast(self.parse_expression(expression))
+    
     def apply_formula(self, expression: str, formula_name: str) -> str:
-        ast = self.parse_expression(expression)
+        """Replace each occurrence of the named formula's pattern by its replacement"""
         formula = self.folex.get_formula_by_name(formula_name)
-        
         if formula:
-            formula_matches = self.folex.detect_formulas(expression)
-            if formula_matches:
-                new_ast = self.folex.apply_formula_to_ast(ast, formula_matches[0])
+            ast = self.parse_expression(expression)
+            new_ast = self.folex.rewrite(ast, [formula.name], max_iterations=1)
+            if new_ast is not ast:
                 return new_ast.to_string()
-        
         return expression
     
+    def rewrite(self, expression: str, formula_names: List[str] = None, max_iterations: int = 16) -> str:
+        """Apply formula replacements until the expression stops changing (see Folex.rewrite)"""
+        ast = self.parse_expression(expression)
+        return self.folex.rewrite(ast, formula_names, max_iterations).to_string()
+    
+    def simplify(self, expression: str, cost: CostFunction = ast_size,
+                 max_iterations: int = 8, max_nodes: int = 5000) -> str:
+        """Cheapest expression equal to `expression` under the formulas that are identities.
+        
+        Saturates an e-graph instead of rewriting greedily, so the result
+        does not depend on the order rules fire in (see egraph.EGraph).
+        """
+        ast = self.parse_expression(expression)
+        simplified, _ = simplify(ast, self.folex.equality_rules(), cost, max_iterations, max_nodes)
+        return simplified.to_string()
+    
     def _load_all_formulas(self):
         all_formulas = self.formula_database.formulas
         self.folex.reload_formulas(all_formulas)
         self.monitor.reload_formulas(all_formulas)
     
+    def _canonical_key(self, expression: str) -> str:
+        if self.canonical is CanonicalLevel.NONE:
+            return expression
+        if not (self.caching_enabled and self.cache):
+            return canonical_form(expression, self.canonical)
+        key = self.cache.get_cached_canonical(expression, self.canonical.value)
+        if key is None:
+            key = canonical_form(expression, self.canonical)
+            self.cache.cache_canonical(expression, self.canonical.value, key)
+        return key
+    
     def _parse_with_cache(self, expression: str) -> ASTNode:
-        if self.enable_caching and self.cache:
+        if self.caching_enabled and self.cache:
             cached_ast = self.cache.get_cached_ast(expression)
             if cached_ast is not None:
                 return cached_ast
         
         ast = self.parser.parse(expression)
         
-        if self.enable_caching and self.cache:
+        if self.caching_enabled and self.cache:
             self.cache.cache_ast(expression, ast)
         
         return ast
@@ -125,11 +200,12 @@ class MathEngine:
             self.cache.clear_all()
     
     def enable_caching(self, enabled: bool = True):
-        self.enable_caching = enabled
+        self.caching_enabled = enabled
         if enabled and not self.cache:
             self.cache = get_global_cache()
         elif not enabled:
             self.cache = None
+        self.folex.cache = self.cache
     
     def add_to_lazy_queue(self, expression: str, variables: Dict[str, float] = None, priority: int = 0) -> str:
         if self.lazy_evaluator:
@@ -163,8 +239,11 @@ class MathEngine:
     def get_formulas_by_category(self, category: str) -> List[FormulaDefinition]:
         return self.formula_database.get_formulas_by_category(category)
     
-    def search_formulas(self, query: str) -> List[FormulaDefinition]:
-        return self.formula_database.search_formulas(query)
+    def search_formulas(self, query: str, limit: Optional[int] = None) -> List[FormulaDefinition]:
+        return self.formula_database.search_formulas(query, limit)
+    
+    def complete_search(self, prefix: str, limit: int = 10) -> List[str]:
+        return self.formula_database.complete(prefix, limit)
     
     def get_formula_count(self) -> int:
         return self.formula_database.get_formula_count()
@@ -181,13 +260,20 @@ class MathEngine:
     
     def get_performance_stats(self) -> Dict[str, Any]:
         stats = {
-            "caching_enabled": self.enable_caching,
+            "caching_enabled": self.caching_enabled,
             "lazy_evaluation_enabled": self.enable_lazy_evaluation,
             "formula_count": self.get_formula_count(),
         }
         
         if self.cache:
             stats["cache_stats"] = self.get_cache_stats()
+            formula_cache = stats["cache_stats"]["formula_cache"]
+            stats["formula_detection_cache"] = {
+                "hits": formula_cache["hits"],
+                "misses": formula_cache["misses"],
+                "hit_rate": formula_cache["hit_rate"],
+                "formula_set_version": self.formula_database.version
+            }
         
         if self.lazy_evaluator:
             stats["lazy_queue_stats"] = self.get_lazy_queue_status()
@@ -195,4 +281,5 @@ class MathEngine:
         return stats
     
     def __repr__(self) -> str:
-        return f"MathEngine(caching={self.enable_caching}, lazy_eval={self.enable_lazy_evaluation})"
+        return (f"MathEngine(caching={self.caching_enabled}, lazy_eval={self.enable_lazy_evaluation}, "
+                f"steps={self.steps.value}, canonical={self.canonical.value})")
@@ -1,31 +1,297 @@
 import re
-from typing import List, Optional, Dict, Any
+from itertools import count
+from typing import List, Optional, Dict, Any, Tuple, Pattern, Iterable
 from .data_structures import FormulaDefinition, FormulaMatch
 from .ast_nodes import ASTNode
+from .patterns import DiscriminationTree, RewriteSystem, parse_tree_pattern, parse_rewrite_template
 
+try:
+    from re import _parser as _sre_parse, _constants as _sre_constants  # Python 3.11+
+except ImportError:
+    import sre_parse as _sre_parse, sre_constants as _sre_constants
 
-class Folex:
+_REPEATS = (_sre_constants.MAX_REPEAT, _sre_constants.MIN_REPEAT,
+            getattr(_sre_constants, 'POSSESSIVE_REPEAT', _sre_constants.MAX_REPEAT))
+
+
+def _required_literals(pattern: str) -> List[str]:
+    """Literal runs every match of `pattern` must contain, casefolded.
+    
+    Only ASCII pieces are kept: with IGNORECASE, non-ASCII characters can
+    match ASCII ones (e.g. 'ı' matches 'i'), so those runs could not be
+    checked against a lowercased expression.
+    """
+    runs: List[str] = []
+    current: List[str] = []
+    
+    def cut():
+        if current:
+            runs.append(''.join(current))
+            current.clear()
+    
+    def walk(items):
+        for op, av in items:
+            if op is _sre_constants.LITERAL:
+                current.append(chr(av))
+            elif op is _sre_constants.SUBPATTERN:
+                walk(av[-1])
+            elif op in _REPEATS and av[0] >= 1:
+                # The body occurs at least once, but not necessarily next to its neighbours
+                cut()
+                walk(av[2])
+                cut()
+            else:
+                cut()
+    
+    walk(_sre_parse.parse(pattern))
+    cut()
+    
+    pieces = []
+    for run in runs:
+        pieces.extend(piece for piece in re.split(r'[^\x00-\x7f]+', run.casefold()) if piece)
+    return pieces
+
+
+class _LiteralIndex:
+    """Aho-Corasick automaton over one literal key per formula.
+    
+    scan() finds every key occurring in a text in a single pass, so the
+    cost depends on the text and the number of hits, not on how many
+    formulas are indexed.
+    """
+    
     def __init__(self):
-        self.formulas: List[FormulaDefinition] = []
-        self._initialize_default_formulas()
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+    
+    def add(self, key: str, value: int) -> None:
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(value)
+    
+    def build(self) -> None:
+        """Compute failure links; call after the last add()"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        for state in queue:  # breadth-first; the list grows as we go
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+    
+    def scan(self, text: str) -> set:
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+# Versions for formula lists that are not the database's own (see Folex._compile_formulas)
+_LOCAL_VERSIONS = count(1)
+
+# Marks a formula pattern that has not been compiled yet (see Folex._regex)
+_UNCOMPILED = object()
+
+
+class Folex:
+    def __init__(self, cache=None):
+        # The database's formulas until another list is set; fetched on first use
+        self._formulas: Optional[List[FormulaDefinition]] = None
+        self.cache = cache  # an ExpressionCache; detections are kept in its formula_cache
+        self._version = ""
+        self._sources: List[Optional[str]] = []
+        self._compiled: List[Any] = []  # a Pattern, None if invalid, or _UNCOMPILED
+        self._literal_index = _LiteralIndex()
+        self._unfiltered: List[int] = []
+        # Only structural matching and rewriting need these; built on first use
+        self._tree_index: Optional[DiscriminationTree] = None
+        self._rewrites: Optional[RewriteSystem] = None
+        self._lookup_index = None  # a FormulaIndex for formula lists that are not the database's
+        self._equalities: Optional[RewriteSystem] = None
+        self._digest: Tuple[str, str] = ("", "")  # the version it was computed for, and the digest
+        # The list compiled last, its length, and the database when it is the database's list
+        self._indexed: Tuple[Optional[list], int, Any] = (None, 0, None)
+    
+    @property
+    def formulas(self) -> List[FormulaDefinition]:
+        if self._formulas is None:
+            self._initialize_default_formulas()
+        return self._formulas
+    
+    @formulas.setter
+    def formulas(self, formulas: List[FormulaDefinition]):
+        self._formulas = formulas
     
     def _initialize_default_formulas(self):
         from .formula_database import get_formula_database
         db = get_formula_database()
         # Access the formulas directly since there's no get_all_formulas method
-        self.formulas = db.formulas
+        self._formulas = db.formulas
+    
+    def _compile_formulas(self):
+        """Index every pattern by its longest required literal.
+        
+        Patterns are only compiled once an expression containing that
+        literal comes along (see _regex); most never are in a short run.
+        The database's literals come precomputed with its snapshot.
+        """
+        from .formula_database import get_formula_database
+        db = get_formula_database()
+        known = db.pattern_literals if self.formulas is db.formulas else {}
+        self._sources = []
+        self._compiled = []
+        self._literal_index = _LiteralIndex()
+        self._unfiltered = []
+        self._tree_index = None
+        self._rewrites = None
+        self._equalities = None
+        self._lookup_index = None
+        for position, formula in enumerate(self.formulas):
+            try:
+                pattern = self._convert_to_regex_pattern(formula.pattern)
+                literals = known[pattern] if pattern in known else _required_literals(pattern)
+                if literals is None:
+                    raise re.error("invalid pattern", pattern)
+            except Exception:
+                # An invalid pattern never matches
+                self._sources.append(None)
+                self._compiled.append(None)
+                continue
+            self._sources.append(pattern)
+            self._compiled.append(_UNCOMPILED)
+            if literals:
+                self._literal_index.add(max(literals, key=len), position)
+            else:
+                self._unfiltered.append(position)
+        self._literal_index.build()
+        
+        # Cached detections are keyed on the formula set they were made with
+        if self.formulas is db.formulas:
+            self._version = f"db{db.version}"
+            self._indexed = (self.formulas, len(self.formulas), db)
+        else:
+            self._version = f"local{next(_LOCAL_VERSIONS)}"
+            self._indexed = (self.formulas, len(self.formulas), None)
+    
+    def _compile_trees(self):
+        """Index every tree pattern and compile the replacements that are templates"""
+        self._tree_index = DiscriminationTree()
+        self._rewrites = RewriteSystem()
+        for position, formula in enumerate(self.formulas):
+            if not formula.tree_pattern:
+                continue
+            try:
+                tree_pattern = parse_tree_pattern(formula.tree_pattern)
+            except ValueError:
+                continue
+            self._tree_index.insert(tree_pattern, position)
+            try:
+                # Prose replacements ("FOIL method") simply have no template
+                self._rewrites.add(tree_pattern, parse_rewrite_template(formula.replacement, tree_pattern), position)
+            except ValueError:
+                pass
+    
+    def _ensure_compiled(self, trees: bool = False):
+        indexed_list, indexed_length, db = self._indexed
+        if (self.formulas is not indexed_list or len(self.formulas) != indexed_length
+                or (db is not None and self._version != f"db{db.version}")):
+            # The list was replaced or changed behind our back
+            self._compile_formulas()
+        if trees and self._tree_index is None:
+            self._compile_trees()
+    
+    @property
+    def formula_digest(self) -> str:
+        """Identifies the formulas detections are made with, in any process
+        (see FormulaDatabase.digest)"""
+        self._ensure_compiled()
+        _, _, db = self._indexed
+        if db is not None:
+            return db.digest
+        if self._digest[0] != self._version:
+            from .formula_database import formula_digest
+            self._digest = (self._version, formula_digest(self.formulas))
+        return self._digest[1]
+    
+    def _lookups(self):
+        """Name, topic, grade and category lookups: the database's own index
+        when these are its formulas, otherwise one over this list"""
+        self._ensure_compiled()
+        _, _, db = self._indexed
+        if db is not None:
+            return db.index
+        if self._lookup_index is None:
+            from .formula_database import FormulaIndex
+            self._lookup_index = FormulaIndex(self.formulas)
+        return self._lookup_index
+    
+    def _regex(self, position: int) -> Optional[Pattern]:
+        """The compiled pattern of a formula, or None when it is invalid"""
+        regex = self._compiled[position]
+        if regex is _UNCOMPILED:
+            try:
+                regex = re.compile(self._sources[position], re.IGNORECASE)
+            except Exception:
+                regex = None
+            self._compiled[position] = regex
+        return regex
+    
+    def _candidates(self, expression: str) -> Iterable[int]:
+        """Positions of the formulas whose required literal occurs in the expression"""
+        self._ensure_compiled()
+        if not expression.isascii():
+            return range(len(self.formulas))
+        found = self._literal_index.scan(expression.lower())
+        found.update(self._unfiltered)
+        return sorted(found)
     
     def detect_formulas(self, expression: str) -> List[FormulaMatch]:
         """Actually detect formulas in the expression using pattern matching"""
+        # Clean the expression for better matching
+        matches, _ = self._detect_clean(self._clean_expression(expression))
+        # The list may be the cached one; callers are free to change theirs
+        return list(matches)
+    
+    def _detect_clean(self, clean_expr: str) -> Tuple[List[FormulaMatch], int]:
+        """Matches for an already cleaned expression, and how many regex searches they took"""
+        self._ensure_compiled()
+        if self.cache is not None:
+            key = (self._version, clean_expr)
+            cached = self.cache.get_cached_formulas(key)
+            if cached is not None:
+                return cached, 0
+        
         matches = []
+        searches = 0
         
-        for formula in self.formulas:
+        for position in self._candidates(clean_expr):
+            regex = self._regex(position)
+            if regex is None:
+                continue
+            searches += 1
             try:
-                # Clean the expression for better matching
-                clean_expr = self._clean_expression(expression)
-                
                 # Try to match the pattern
-                match = self._match_formula_pattern(clean_expr, formula)
+                match = self._match_formula_pattern(clean_expr, self.formulas[position], regex)
                 if match:
                     matches.append(match)
             except Exception as e:
@@ -33,7 +299,36 @@ class Folex:
         
         # Sort by confidence (higher first)
         matches.sort(key=lambda x: x.confidence, reverse=True)
-        return matches
+        
+        if self.cache is not None:
+            self.cache.cache_formulas(key, matches)
+        return matches, searches
+    
+    def match_ast(self, ast: ASTNode) -> List[FormulaMatch]:
+        """Structurally match formulas against every subtree of a parsed expression.
+        
+        Uses each formula's tree_pattern, so unlike detect_formulas it does
+        not depend on how the tree prints. Bindings map pattern variables
+        to the matched subtrees.
+        """
+        self._ensure_compiled(trees=True)
+        
+        matches = []
+        for tree_match in self._tree_index.match(ast):
+            formula = self.formulas[tree_match.value]
+            matches.append((tree_match.value, FormulaMatch(
+                formula_name=formula.name,
+                pattern=formula.tree_pattern,
+                matched_expression=tree_match.node.to_string(),
+                variables={name: node.to_string() for name, node in tree_match.bindings.items()},
+                # The whole expression is the best match; subtrees rank below it
+                confidence=1.0 if tree_match.node is ast else 0.9,
+                bindings=tree_match.bindings
+            )))
+        
+        # Highest confidence first, database order among equals
+        matches.sort(key=lambda item: (-item[1].confidence, item[0]))
+        return [match for _, match in matches]
     
     def _clean_expression(self, expression: str) -> str:
         """Clean expression for better pattern matching"""
@@ -45,14 +340,12 @@ class Folex:
         cleaned = cleaned.replace('²', '^2').replace('³', '^3')
         return cleaned
     
-    def _match_formula_pattern(self, expression: str, formula: FormulaDefinition) -> Optional[FormulaMatch]:
+    def _match_formula_pattern(self, expression: str, formula: FormulaDefinition,
+                               regex: Pattern) -> Optional[FormulaMatch]:
         """Actually match a formula pattern against an expression"""
         try:
-            # Convert formula pattern to a proper regex pattern
-            pattern = self._convert_to_regex_pattern(formula.pattern)
-            
             # Try to match
-            match = re.search(pattern, expression, re.IGNORECASE)
+            match = regex.search(expression)
             if match:
                 # Extract variables
                 variables = {}
@@ -104,17 +397,52 @@ class Folex:
         return min(base_confidence, 1.0)
     
     def apply_formula_to_ast(self, ast: ASTNode, formula_match: FormulaMatch) -> ASTNode:
-        """Apply a detected formula to transform the AST"""
-        try:
-            # For now, return the original AST
-            # In a full implementation, this would transform the AST based on the formula
-            return ast
-        except Exception:
+        """Apply a detected formula to transform the AST.
+        
+        Every occurrence of the formula's tree pattern is replaced once by
+        its compiled replacement; the result shares unchanged subtrees with
+        `ast`. Returns `ast` itself when the formula has no usable template
+        or does not occur.
+        """
+        return self.rewrite(ast, [formula_match.formula_name], max_iterations=1)
+    
+    def rewrite_rules(self, formula_names: Optional[Iterable[str]] = None) -> RewriteSystem:
+        """Rules from every formula with a tree pattern and a compilable
+        replacement, or only those named in `formula_names`, in database order"""
+        self._ensure_compiled(trees=True)
+        if formula_names is None:
+            return self._rewrites
+        wanted = {name.lower() for name in formula_names}
+        rewrites = RewriteSystem()
+        for _, pattern, template, position in self._rewrites.rules():
+            if self.formulas[position].name.lower() in wanted:
+                rewrites.add(pattern, template, position)
+        return rewrites
+    
+    def equality_rules(self) -> RewriteSystem:
+        """The rewrite rules that are also equalities, for e-graph saturation (see egraph.sound_rules)"""
+        self._ensure_compiled(trees=True)
+        if self._equalities is None:
+            from .egraph import sound_rules
+            self._equalities = sound_rules(self._rewrites)
+        return self._equalities
+    
+    def rewrite(self, ast: ASTNode, formula_names: Optional[Iterable[str]] = None,
+                max_iterations: int = 16, max_nodes: int = 10000) -> ASTNode:
+        """Apply formula replacements to a fixpoint, see RewriteSystem.rewrite"""
+        rewrites = self.rewrite_rules(formula_names)
+        if not len(rewrites):
             return ast
+        return rewrites.rewrite(ast, max_iterations, max_nodes)
+    
+    def get_formula_by_name(self, name: str) -> Optional[FormulaDefinition]:
+        """First formula with this name, ignoring case"""
+        return self._lookups().by_name(name)
     
     def add_formula(self, formula: FormulaDefinition):
         """Add a new formula to the database"""
         self.formulas.append(formula)
+        self._indexed = (None, 0, None)  # compiled again on next use
     
     def get_formula_count(self) -> int:
         """Get the total number of formulas"""
@@ -123,39 +451,63 @@ class Folex:
     def reload_formulas(self, formulas: List[FormulaDefinition]):
         """Reload the formula database"""
         self.formulas = formulas
+        self._indexed = (None, 0, None)  # compiled again on next use
     
-    def search_formulas(self, query: str) -> List[FormulaDefinition]:
-        """Search formulas by name, description, or topic"""
-        query = query.lower()
-        results = []
-        
-        for formula in self.formulas:
-            if (query in formula.name.lower() or 
-                query in formula.description.lower() or 
-                query in formula.topic.lower() or
-                query in formula.category.lower()):
-                results.append(formula)
-        
-        return results
+    def search_formulas(self, query: str, limit: Optional[int] = None) -> List[FormulaDefinition]:
+        """Search formulas by name, description, topic or category, best match first"""
+        return self._lookups().search(query, limit)
     
     def get_formulas_by_topic(self, topic: str) -> List[FormulaDefinition]:
         """Get formulas by specific topic"""
-        return [f for f in self.formulas if f.topic.lower() == topic.lower()]
+        return self._lookups().by_topic(topic)
     
     def get_formulas_by_grade(self, grade: int) -> List[FormulaDefinition]:
         """Get formulas by grade level"""
-        return [f for f in self.formulas if f.grade == grade]
+        return self._lookups().by_grade(grade)
     
     def get_formulas_by_category(self, category: str) -> List[FormulaDefinition]:
         """Get formulas by category"""
-        return [f for f in self.formulas if f.category.lower() == category.lower()]
+        return self._lookups().by_category(category)
     
     def suggest_formula(self, expression: str) -> Optional[FormulaDefinition]:
         """Suggest the most relevant formula for an expression"""
         matches = self.detect_formulas(expression)
         if matches:
             # Find the formula definition for the best match
-            for formula in self.formulas:
-                if formula.name == matches[0].formula_name:
-                    return formula
+            return self._lookups().by_name(matches[0].formula_name)
         return None
+
+
+class DetectionContext:
+    """Formula detection shared by everything one request does.
+    
+    An evaluation detects formulas in the expression, in its printed AST and
+    in every step result, and many of those strings coincide once cleaned.
+    Each distinct cleaned string is detected once; later lookups reuse the
+    result. `stats` counts the regex searches run and the ones saved.
+    """
+    
+    def __init__(self, folex: Folex):
+        self.folex = folex
+        self._results: Dict[str, Tuple[List[FormulaMatch], int]] = {}
+        self.stats = {
+            "detections": 0,
+            "distinct": 0,
+            "regex_searches": 0,
+            "regex_searches_saved": 0
+        }
+    
+    def detect_formulas(self, expression: str) -> List[FormulaMatch]:
+        """Same as Folex.detect_formulas, computed at most once per cleaned string"""
+        self.stats["detections"] += 1
+        clean_expr = self.folex._clean_expression(expression)
+        cached = self._results.get(clean_expr)
+        if cached is None:
+            cached = self._results[clean_expr] = self.folex._detect_clean(clean_expr)
+            self.stats["distinct"] += 1
+            self.stats["regex_searches"] += cached[1]
+        else:
+            self.stats["regex_searches_saved"] += cached[1]
+        matches, _ = cached
+        # Callers keep and extend these lists, so each gets its own
+        return list(matches)
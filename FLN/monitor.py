@@ -1,7 +1,7 @@
 from typing import List, Dict, Optional, Union, Tuple, Any
 from .ast_nodes import ASTNode
-from .data_structures import ComputationStep, EvaluationResult, EvaluationType, FormulaMatch, FormulaDefinition
-from .folex import Folex
+from .data_structures import ComputationStep, EvaluationResult, EvaluationType, FormulaMatch, FormulaDefinition, StepLevel
+from .folex import Folex, DetectionContext
 from .natix import Natix
 
 
@@ -12,22 +12,24 @@ class ComputationMonitor:
         self.error_log: List[str] = []
         self.warning_log: List[str] = []
     
-    def monitor_evaluation(self, ast: ASTNode, variables: Dict[str, float] = None) -> EvaluationResult:
+    def monitor_evaluation(self, ast: ASTNode, variables: Dict[str, float] = None,
+                           steps: Union[StepLevel, str] = StepLevel.FULL,
+                           context: Optional[DetectionContext] = None) -> EvaluationResult:
+        """Evaluate with formula detection; pass the request's `context` to share detections"""
+        if context is None:
+            context = DetectionContext(self.folex)
         try:
-            formula_matches = self.folex.detect_formulas(ast.to_string())
+            formula_matches = context.detect_formulas(ast.to_string())
             
-            if formula_matches:
-                rewritten_ast = self.folex.apply_formula_to_ast(ast, formula_matches[0])
-                applied_formulas = formula_matches
-            else:
-                rewritten_ast = ast
-                applied_formulas = []
+            # The expression is evaluated as written; detected formulas are
+            # reported with it, not substituted into it
+            applied_formulas = formula_matches
             
-            result, steps = self.natix.evaluate_with_formulas(
-                rewritten_ast, variables, applied_formulas
+            result, computation_steps = self.natix.evaluate_with_formulas(
+                ast, variables, applied_formulas, steps
             )
             
-            enhanced_steps = self._enhance_steps_with_formulas(steps)
+            enhanced_steps = self._enhance_steps_with_formulas(computation_steps, context)
             
             evaluation_type = self._get_evaluation_type(result)
             
@@ -38,11 +40,12 @@ class ComputationMonitor:
                 applied_formulas=applied_formulas,
                 computation_steps=enhanced_steps,
                 is_exact=True,
-                error_message=None
+                error_message=None,
+                detection_stats=context.stats
             )
             
             return eval_result
-            
+        
         except Exception as e:
             self.error_log.append(f"Evaluation error: {e}")
             return EvaluationResult(
@@ -55,12 +58,14 @@ class ComputationMonitor:
                 error_message=str(e)
             )
     
-    def _enhance_steps_with_formulas(self, steps: List[ComputationStep]) -> List[ComputationStep]:
+    def _enhance_steps_with_formulas(self, steps: List[ComputationStep],
+                                     context: Optional[DetectionContext] = None) -> List[ComputationStep]:
+        detect_formulas = context.detect_formulas if context else self.folex.detect_formulas
         enhanced_steps = []
         
         for step in steps:
             try:
-                step_formulas = self.folex.detect_formulas(step.result)
+                step_formulas = detect_formulas(step.result)
                 
                 if step_formulas:
                     enhanced_step = ComputationStep(
@@ -75,7 +80,7 @@ class ComputationMonitor:
                     enhanced_steps.append(enhanced_step)
                 else:
                     enhanced_steps.append(step)
-                    
+            
             except Exception:
                 enhanced_steps.append(step)
         
@@ -106,7 +111,7 @@ class ComputationMonitor:
                 return False, errors
             
             return True, errors
-            
+        
         except Exception as e:
             errors.append(f"Validation error: {e}")
             return False, errors
@@ -127,7 +132,7 @@ class ComputationMonitor:
                 warnings.append("Logarithm of non-positive number")
             
             return len(warnings) == 0, warnings
-            
+        
         except Exception as e:
             warnings.append(f"Correctness check error: {e}")
             return False, warnings
@@ -5,16 +5,48 @@ from .ast_nodes import (
     ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode, 
     ParenthesesNode, UnaryNode, DerivativeNode, IntegralNode
 )
-from .data_structures import ComputationStep, EvaluationType, FormulaMatch
+from .data_structures import ComputationStep, EvaluationType, FormulaMatch, StepLevel
+from .compiler import evaluate_ast
+
+
+# Deepest node depth recorded at StepLevel.SUMMARY (the root is depth 0)
+_SUMMARY_DEPTH = 1
+
+
+def _node_label(node: ASTNode) -> tuple:
+    """Everything that identifies a node apart from its children"""
+    if isinstance(node, NumberNode):
+        return ('number', str(node.value))
+    elif isinstance(node, VariableNode):
+        return ('variable', node.name)
+    elif isinstance(node, OperatorNode):
+        return ('operator', node.operator)
+    elif isinstance(node, FunctionNode):
+        return ('function', node.function_name)
+    elif isinstance(node, ParenthesesNode):
+        return ('parentheses',)
+    elif isinstance(node, UnaryNode):
+        return ('unary', node.operator)
+    elif isinstance(node, DerivativeNode):
+        return ('derivative', node.variable)
+    elif isinstance(node, IntegralNode):
+        return ('integral', node.variable, node.lower_bound is not None, node.upper_bound is not None)
+    return (type(node).__name__, id(node))
+
 
 
 class EvaluationContext:
-    def __init__(self, variables: Dict[str, float] = None):
+    def __init__(self, variables: Dict[str, float] = None,
+                 step_level: Union[StepLevel, str] = StepLevel.FULL):
         self.variables = variables or {}
+        self.step_level = StepLevel(step_level)
+        self.depth = 0
         self.steps: List[ComputationStep] = []
         self.step_number = 0
         self.applied_formulas: List[FormulaMatch] = []
-        self.cache: Dict[str, Union[float, str]] = {}  # Add caching
+        self.cache: Dict[int, Union[float, str]] = {}  # Keyed by node_key
+        self._node_keys: Dict[int, int] = {}  # id(node) -> structural key
+        self._interned: Dict[tuple, int] = {}
     
     def add_step(self, expression: str, result: str, operation: str, 
                  is_numeric: bool = False, explanation: str = None,
@@ -34,13 +66,38 @@ class EvaluationContext:
     def add_formula_match(self, formula_match: FormulaMatch) -> None:
         self.applied_formulas.append(formula_match)
     
-    def get_cached_result(self, expression: str) -> Optional[Union[float, str]]:
-        """Get cached result for an expression"""
-        return self.cache.get(expression)
+    def node_key(self, node: ASTNode) -> int:
+        """Structural key of a node: equal subtrees share a key.
+        
+        Keys are interned bottom-up and remembered per node, so every node is
+        visited once per evaluation however often its ancestors ask for keys.
+        """
+        node_keys = self._node_keys
+        key = node_keys.get(id(node))
+        if key is not None:
+            return key
+        
+        stack = [(node, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if id(current) in node_keys:
+                continue
+            children = current.children()
+            if not expanded:
+                stack.append((current, True))
+                stack.extend((child, False) for child in children if id(child) not in node_keys)
+                continue
+            signature = (_node_label(current),) + tuple(node_keys[id(child)] for child in children)
+            node_keys[id(current)] = self._interned.setdefault(signature, len(self._interned))
+        return node_keys[id(node)]
+    
+    def get_cached_result(self, key: int) -> Optional[Union[float, str]]:
+        """Get cached result for a node key"""
+        return self.cache.get(key)
     
-    def cache_result(self, expression: str, result: Union[float, str]) -> None:
-        """Cache a result for an expression"""
-        self.cache[expression] = result
+    def cache_result(self, key: int, result: Union[float, str]) -> None:
+        """Cache a result for a node key"""
+        self.cache[key] = result
 
 
 class Natix:
@@ -48,14 +105,16 @@ class Natix:
         self.context: Optional[EvaluationContext] = None
         self._function_cache: Dict[str, Any] = {}
     
-    def evaluate(self, ast: ASTNode, variables: Dict[str, float] = None) -> Tuple[Union[float, str], List[ComputationStep]]:
-        self.context = EvaluationContext(variables)
+    def evaluate(self, ast: ASTNode, variables: Dict[str, float] = None,
+                 steps: Union[StepLevel, str] = StepLevel.FULL) -> Tuple[Union[float, str], List[ComputationStep]]:
+        self.context = EvaluationContext(variables, steps)
         result = self._evaluate_node(ast)
         return result, self.context.steps
     
     def evaluate_with_formulas(self, ast: ASTNode, variables: Dict[str, float] = None,
-                             formula_matches: List[FormulaMatch] = None) -> Tuple[Union[float, str], List[ComputationStep]]:
-        self.context = EvaluationContext(variables)
+                             formula_matches: List[FormulaMatch] = None,
+                             steps: Union[StepLevel, str] = StepLevel.FULL) -> Tuple[Union[float, str], List[ComputationStep]]:
+        self.context = EvaluationContext(variables, steps)
         if formula_matches:
             self.context.applied_formulas.extend(formula_matches)
         
@@ -63,12 +122,17 @@ class Natix:
         return result, self.context.steps
     
     def _evaluate_node(self, node: ASTNode) -> Union[float, str]:
+        # Unrecorded subtrees skip the step bookkeeping (and its string formatting) entirely
+        level = self.context.step_level
+        if level is not StepLevel.FULL and (level is StepLevel.NONE or self.context.depth > _SUMMARY_DEPTH):
+            return evaluate_ast(node, self.context.variables)
+        
         # Check cache first
-        node_str = node.to_string()
-        cached_result = self.context.get_cached_result(node_str)
+        node_key = self.context.node_key(node)
+        cached_result = self.context.get_cached_result(node_key)
         if cached_result is not None:
             self.context.add_step(
-                expression=node_str,
+                expression=node.to_string(),
                 result=str(cached_result),
                 operation="cached_result",
                 is_numeric=isinstance(cached_result, (int, float)),
@@ -76,7 +140,9 @@ class Natix:
             )
             return cached_result
         
-        # Evaluate the node
+        # Evaluate the node; parentheses do not count as a level
+        depth_step = 0 if isinstance(node, ParenthesesNode) else 1
+        self.context.depth += depth_step
         if isinstance(node, NumberNode):
             result = self._evaluate_number(node)
         elif isinstance(node, VariableNode):
@@ -95,9 +161,10 @@ class Natix:
             result = self._evaluate_integral(node)
         else:
             raise ValueError(f"Unknown node type: {type(node)}")
+        self.context.depth -= depth_step
         
         # Cache the result
-        self.context.cache_result(node_str, result)
+        self.context.cache_result(node_key, result)
         return result
     
     def _evaluate_number(self, node: NumberNode) -> float:
@@ -267,7 +334,7 @@ class Natix:
             )
             
             return result
-            
+        
         except (ValueError, OverflowError, ZeroDivisionError) as e:
             error_msg = f"Error in {node.operator} operation: {str(e)}"
             self.context.add_step(
@@ -495,7 +562,7 @@ class Natix:
             )
             
             return result
-            
+        
         except (ValueError, OverflowError, ZeroDivisionError) as e:
             error_msg = f"Error in {node.function_name} function: {str(e)}"
             self.context.add_step(
@@ -553,7 +620,7 @@ class Natix:
             )
             
             return result
-            
+        
         except (ValueError, OverflowError) as e:
             error_msg = f"Error in unary operation: {str(e)}"
             self.context.add_step(
@@ -1,21 +1,65 @@
-from typing import List, Optional
-from .tokenizer import Token, TokenType
-from .ast_nodes import (
-    ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode, 
-    ParenthesesNode, UnaryNode, DerivativeNode, IntegralNode
-)
+from dataclasses import dataclass
+from typing import Any, List, Tuple
+from .tokenizer import Token, TokenType, Tokenizer
+from .ast_nodes import ASTNode, NumberNode, DerivativeNode, IntegralNode, get_node_interner
+
+
+# The tokenizer only reads the module-level token tables, so one instance is
+# shared by every parser and every thread
+_TOKENIZER = Tokenizer()
+
+# Every node is built through the shared interner, so a parsed expression is a
+# DAG in which equal subexpressions (across expressions, too) are one object
+_NODES = get_node_interner()
+
+
+@dataclass
+class _ParseCursor:
+    """Per-parse state, kept off the Parser so one instance can be shared"""
+    tokens: List[Token]
+    position: int = 0
+
+
+# Binding power of each binary operator; all of them associate to the left
+_BINARY_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '%': 2, '^': 4}
+
+# A leading sign binds tighter than * and / but looser than ^, so -2^2 is
+# -(2^2). Operators binding tighter than a sign take a bare primary on their
+# right, i.e. no sign is allowed after ^.
+_UNARY_OPERATORS = frozenset({'+', '-'})
+_UNARY_PRECEDENCE = 3
+
+_CLOSING_ERRORS = {
+    'function': "Expected ')' after function argument",
+    'parentheses': "Expected ')'",
+    'derivative': "Expected ')' after derivative expression",
+    'integral_body': "Expected ')' after integral expression",
+}
+
+
+def _reduce(operators: List[Tuple[int, str, bool]], operands: List[ASTNode]) -> None:
+    """Pop the top operator and combine it with its operands"""
+    _, operator, is_unary = operators.pop()
+    if is_unary:
+        operands.append(_NODES.unary(operator, operands.pop()))
+    else:
+        right = operands.pop()
+        operands[-1] = _NODES.operator(operator, operands[-1], right)
+
+
+def _make_number(value: str) -> NumberNode:
+    try:
+        if '.' in value:
+            return _NODES.number(float(value))
+        else:
+            return _NODES.number(int(value))
+    except ValueError:
+        return _NODES.number(float(value))
 
 
 class Parser:
-    def __init__(self):
-        self.tokens: List[Token] = []
-        self.current_position: int = 0
-    
     def parse(self, expression: str) -> ASTNode:
-        from .tokenizer import Tokenizer
-        tokenizer = Tokenizer()
-        self.tokens = tokenizer.tokenize(expression)
-        self.current_position = 0
+        cursor = _ParseCursor(_TOKENIZER.tokenize(expression))
         
         # Check for special calculus expressions first
         if expression.startswith('d/d'):
@@ -24,241 +68,187 @@ class Parser:
         elif expression.startswith('∫'):
             return self._parse_integral_from_string(expression)
         else:
-            return self._parse_expression()
+            return self._parse_expression(cursor)
     
-    def _parse_expression(self) -> ASTNode:
-        left = self._parse_term()
-        
-        while (self.current_position < len(self.tokens) and 
-               self.tokens[self.current_position].token_type == TokenType.OPERATOR and
-               self.tokens[self.current_position].value in ['+', '-']):
-            
-            operator = self.tokens[self.current_position].value
-            self.current_position += 1
-            right = self._parse_term()
-            
-            left = OperatorNode(operator, left, right)
-        
-        return left
+    def parse_complete(self, expression: str) -> ASTNode:
+        """Parse an expression and fail on tokens after it, which parse() ignores"""
+        cursor = _ParseCursor(_TOKENIZER.tokenize(expression))
+        node = self._parse_expression(cursor)
+        if cursor.position < len(cursor.tokens):
+            token = cursor.tokens[cursor.position]
+            raise ValueError(f"Unexpected token '{token.value}' at position {token.position}")
+        return node
     
-    def _parse_term(self) -> ASTNode:
-        left = self._parse_factor()
-        
-        while (self.current_position < len(self.tokens) and 
-               self.tokens[self.current_position].token_type == TokenType.OPERATOR and
-               self.tokens[self.current_position].value in ['*', '/', '%']):
-            
-            operator = self.tokens[self.current_position].value
-            self.current_position += 1
-            right = self._parse_factor()
-            
-            left = OperatorNode(operator, left, right)
-        
-        return left
+    def _parse_expression(self, cursor: _ParseCursor) -> ASTNode:
+        return self._parse_operators(cursor)
     
-    def _parse_factor(self) -> ASTNode:
-        # Check for unary operators first
-        if (self.current_position < len(self.tokens) and 
-            self.tokens[self.current_position].token_type == TokenType.OPERATOR and
-            self.tokens[self.current_position].value in ['+', '-']):
-            
-            operator = self.tokens[self.current_position].value
-            self.current_position += 1
-            operand = self._parse_power()
-            return UnaryNode(operator, operand)
-        
-        return self._parse_power()
-    
-    def _parse_power(self) -> ASTNode:
-        left = self._parse_primary()
-        
-        while (self.current_position < len(self.tokens) and 
-               self.tokens[self.current_position].token_type == TokenType.OPERATOR and
-               self.tokens[self.current_position].value == '^'):
-            
-            operator = self.tokens[self.current_position].value
-            self.current_position += 1
-            right = self._parse_primary()
-            
-            left = OperatorNode(operator, left, right)
+    def _parse_derivative(self, cursor: _ParseCursor) -> DerivativeNode:
+        # Parse d/dx(expression) format
+        if (cursor.position >= len(cursor.tokens) or
+            cursor.tokens[cursor.position].token_type != TokenType.DERIVATIVE):
+            raise ValueError("Expected derivative format")
         
-        return left
+        return self._parse_operators(cursor, single_operand=True)
     
-    def _parse_primary(self) -> ASTNode:
-        if self.current_position >= len(self.tokens):
+    def _parse_integral(self, cursor: _ParseCursor) -> IntegralNode:
+        # Parse ∫_a^b(expression) dx format
+        if cursor.position >= len(cursor.tokens):
             raise ValueError("Unexpected end of expression")
         
-        token = self.tokens[self.current_position]
-        
-        if token.token_type == TokenType.NUMBER:
-            self.current_position += 1
-            try:
-                if '.' in token.value:
-                    return NumberNode(float(token.value))
-                else:
-                    return NumberNode(int(token.value))
-            except ValueError:
-                return NumberNode(float(token.value))
-        
-        elif token.token_type == TokenType.VARIABLE:
-            self.current_position += 1
-            return VariableNode(token.value)
-        
-        elif token.token_type == TokenType.FUNCTION:
-            return self._parse_function()
-        
-        elif token.token_type == TokenType.PARENTHESIS_LEFT:
-            return self._parse_parentheses()
-        
-        elif token.token_type == TokenType.INTEGRAL:
-            return self._parse_integral()
-        
-        elif token.token_type == TokenType.DERIVATIVE:
-            return self._parse_derivative()
-        
-        elif token.token_type == TokenType.DIFFERENTIAL:
-            return self._parse_differential()
-        
-        else:
-            raise ValueError(f"Unexpected token type: {token.token_type} at position {token.position}")
-    
-    def _parse_function(self) -> FunctionNode:
-        if (self.current_position >= len(self.tokens) or 
-            self.tokens[self.current_position].token_type != TokenType.FUNCTION):
-            raise ValueError("Expected function")
-        
-        function_name = self.tokens[self.current_position].value
-        self.current_position += 1
-        
-        if (self.current_position >= len(self.tokens) or 
-            self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_LEFT):
-            raise ValueError("Expected '(' after function name")
-        
-        self.current_position += 1  # Skip '('
-        argument = self._parse_expression()
-        
-        if (self.current_position >= len(self.tokens) or 
-            self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_RIGHT):
-            raise ValueError("Expected ')' after function argument")
-        
-        self.current_position += 1  # Skip ')'
-        return FunctionNode(function_name, argument)
-    
-    def _parse_parentheses(self) -> ParenthesesNode:
-        if (self.current_position >= len(self.tokens) or 
-            self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_LEFT):
-            raise ValueError("Expected '('")
-        
-        self.current_position += 1  # Skip '('
-        expression = self._parse_expression()
-        
-        if (self.current_position >= len(self.tokens) or 
-            self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_RIGHT):
-            raise ValueError("Expected ')'")
-        
-        self.current_position += 1  # Skip ')'
-        return ParenthesesNode(expression)
+        return self._parse_operators(cursor, single_operand=True)
     
-    def _parse_integral(self) -> IntegralNode:
-        # Parse ∫expression dx format
-        if self.current_position >= len(self.tokens):
-            raise ValueError("Unexpected end of expression")
-        
-        # Check for definite integral ∫_a^b expression dx
-        if (self.current_position + 1 < len(self.tokens) and
-            self.tokens[self.current_position + 1].value == '_'):
-            # Definite integral
-            self.current_position += 2  # Skip '∫_'
-            lower_bound = self._parse_expression()
-            
-            if (self.current_position >= len(self.tokens) or
-                self.tokens[self.current_position].value != '^'):
-                raise ValueError("Expected '^' in definite integral")
+    def _parse_operators(self, cursor: _ParseCursor, single_operand: bool = False) -> ASTNode:
+        """Operator-precedence parser driven by explicit stacks.
+        
+        Nested constructs (parentheses, function calls, derivatives and
+        integrals) push a frame instead of recursing, so nesting depth is
+        limited only by memory and every token is handled once. With
+        single_operand the parse stops after the first complete operand.
+        """
+        tokens = cursor.tokens
+        count = len(tokens)
+        position = cursor.position
+        
+        operands: List[ASTNode] = []
+        # (precedence, operator, is_unary)
+        operators: List[Tuple[int, str, bool]] = []
+        # (kind, payload, number of operators below the frame)
+        frames: List[Tuple[str, Any, int]] = []
+        
+        expect_operand = True
+        allow_unary = True
+        
+        while True:
+            if expect_operand:
+                if position >= count:
+                    raise ValueError("Unexpected end of expression")
+                
+                token = tokens[position]
+                token_type = token.token_type
+                
+                if (allow_unary and token_type == TokenType.OPERATOR and
+                    token.value in _UNARY_OPERATORS):
+                    operators.append((_UNARY_PRECEDENCE, token.value, True))
+                    position += 1
+                    allow_unary = False
+                    continue
+                
+                if token_type == TokenType.NUMBER:
+                    operands.append(_make_number(token.value))
+                    position += 1
+                    expect_operand = False
+                    continue
+                
+                if token_type == TokenType.VARIABLE:
+                    operands.append(_NODES.variable(token.value))
+                    position += 1
+                    expect_operand = False
+                    continue
+                
+                if token_type == TokenType.DIFFERENTIAL:
+                    # dx, dy, etc.
+                    operands.append(_NODES.variable(token.value[1:]))
+                    position += 1
+                    expect_operand = False
+                    continue
+                
+                # Everything else opens a nested expression
+                if token_type == TokenType.FUNCTION:
+                    if (position + 1 >= count or
+                        tokens[position + 1].token_type != TokenType.PARENTHESIS_LEFT):
+                        raise ValueError("Expected '(' after function name")
+                    frames.append(('function', token.value, len(operators)))
+                    position += 2
+                elif token_type == TokenType.PARENTHESIS_LEFT:
+                    frames.append(('parentheses', None, len(operators)))
+                    position += 1
+                elif token_type == TokenType.DERIVATIVE:
+                    if (position + 1 >= count or
+                        tokens[position + 1].token_type != TokenType.PARENTHESIS_LEFT):
+                        raise ValueError("Expected '(' after derivative")
+                    # Extract variable from d/dx
+                    frames.append(('derivative', token.value[3:], len(operators)))
+                    position += 2
+                elif token_type == TokenType.INTEGRAL:
+                    # Only the definite form ∫_a^b(expression) dx is accepted here
+                    if not (position + 1 < count and tokens[position + 1].value == '_'):
+                        raise ValueError("Expected '(' after integral symbol")
+                    frames.append(('integral_lower', (), len(operators)))
+                    position += 2
+                else:
+                    raise ValueError(f"Unexpected token type: {token_type} at position {token.position}")
+                
+                allow_unary = True
+                continue
             
-            self.current_position += 1
-            upper_bound = self._parse_expression()
+            token = tokens[position] if position < count else None
+            base = frames[-1][2] if frames else 0
             
-            if (self.current_position >= len(self.tokens) or
-                self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_LEFT):
-                raise ValueError("Expected '(' after integral bounds")
+            precedence = None
+            if token is not None and token.token_type == TokenType.OPERATOR:
+                precedence = _BINARY_PRECEDENCE.get(token.value)
             
-            self.current_position += 1
-            expression = self._parse_expression()
+            if precedence is not None:
+                while len(operators) > base and operators[-1][0] >= precedence:
+                    _reduce(operators, operands)
+                operators.append((precedence, token.value, False))
+                position += 1
+                expect_operand = True
+                allow_unary = precedence < _UNARY_PRECEDENCE
+                continue
             
-            if (self.current_position >= len(self.tokens) or
-                self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_RIGHT):
-                raise ValueError("Expected ')' after integral expression")
+            # No operator follows, so the innermost open expression ends here
+            while len(operators) > base:
+                _reduce(operators, operands)
             
-            self.current_position += 1
+            if not frames:
+                cursor.position = position
+                return operands.pop()
             
-            # Parse dx
-            if (self.current_position >= len(self.tokens) or
-                self.tokens[self.current_position].value != 'dx'):
-                raise ValueError("Expected 'dx' after integral expression")
+            kind, payload, _ = frames.pop()
+            inner = operands.pop()
             
-            self.current_position += 1
-            return IntegralNode("x", expression, lower_bound, upper_bound)
-        else:
-            # Indefinite integral
-            if (self.current_position >= len(self.tokens) or
-                self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_LEFT):
-                raise ValueError("Expected '(' after integral symbol")
+            if kind == 'integral_lower':
+                if token is None or token.value != '^':
+                    raise ValueError("Expected '^' in definite integral")
+                frames.append(('integral_upper', (inner,), len(operators)))
+                position += 1
+                expect_operand = True
+                allow_unary = True
+                continue
             
-            self.current_position += 1
-            expression = self._parse_expression()
+            if kind == 'integral_upper':
+                if token is None or token.token_type != TokenType.PARENTHESIS_LEFT:
+                    raise ValueError("Expected '(' after integral bounds")
+                frames.append(('integral_body', payload + (inner,), len(operators)))
+                position += 1
+                expect_operand = True
+                allow_unary = True
+                continue
             
-            if (self.current_position >= len(self.tokens) or
-                self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_RIGHT):
-                raise ValueError("Expected ')' after integral expression")
+            if token is None or token.token_type != TokenType.PARENTHESIS_RIGHT:
+                raise ValueError(_CLOSING_ERRORS[kind])
+            position += 1
             
-            self.current_position += 1
+            if kind == 'function':
+                node = _NODES.function(payload, inner)
+            elif kind == 'parentheses':
+                node = _NODES.parentheses(inner)
+            elif kind == 'derivative':
+                node = _NODES.derivative(payload, inner)
+            else:
+                # Parse dx
+                if position >= count or tokens[position].value != 'dx':
+                    raise ValueError("Expected 'dx' after integral expression")
+                position += 1
+                lower_bound, upper_bound = payload
+                node = _NODES.integral("x", inner, lower_bound, upper_bound)
             
-            # Parse dx
-            if (self.current_position >= len(self.tokens) or
-                self.tokens[self.current_position].value != 'dx'):
-                raise ValueError("Expected 'dx' after integral expression")
+            if single_operand and not frames:
+                cursor.position = position
+                return node
             
-            self.current_position += 1
-            return IntegralNode("x", expression)
-    
-    def _parse_derivative(self) -> DerivativeNode:
-        # Parse d/dx(expression) format
-        if (self.current_position >= len(self.tokens) or
-            self.tokens[self.current_position].token_type != TokenType.DERIVATIVE):
-            raise ValueError("Expected derivative format")
-        
-        derivative_token = self.tokens[self.current_position]
-        self.current_position += 1
-        
-        # Extract variable from d/dx
-        variable = derivative_token.value[3:]  # Skip 'd/d'
-        
-        if (self.current_position >= len(self.tokens) or
-            self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_LEFT):
-            raise ValueError("Expected '(' after derivative")
-        
-        self.current_position += 1  # Skip '('
-        expression = self._parse_expression()
-        
-        if (self.current_position >= len(self.tokens) or
-            self.tokens[self.current_position].token_type != TokenType.PARENTHESIS_RIGHT):
-            raise ValueError("Expected ')' after derivative expression")
-        
-        self.current_position += 1  # Skip ')'
-        return DerivativeNode(variable, expression)
-    
-    def _parse_differential(self) -> VariableNode:
-        # Parse dx, dy, etc.
-        if (self.current_position >= len(self.tokens) or
-            self.tokens[self.current_position].token_type != TokenType.DIFFERENTIAL):
-            raise ValueError("Expected differential")
-        
-        differential_token = self.tokens[self.current_position]
-        self.current_position += 1
-        
-        # Extract variable from dx
-        variable = differential_token.value[1:]  # Skip 'd'
-        return VariableNode(variable)
+            operands.append(node)
     
     def _parse_derivative_from_string(self, expression: str) -> DerivativeNode:
         """Parse derivative directly from string to avoid tokenization issues"""
@@ -286,20 +276,10 @@ class Parser:
         
         inner_expression = expression[expr_start:expr_end]
         
-        # Create a new parser instance to parse the inner expression
-        from .tokenizer import Tokenizer
-        inner_tokenizer = Tokenizer()
-        inner_tokens = inner_tokenizer.tokenize(inner_expression)
-        
-        # Create a new parser for the inner expression
-        inner_parser = Parser()
-        inner_parser.tokens = inner_tokens
-        inner_parser.current_position = 0
-        
         # Use the full expression parsing to handle operators like ^
-        inner_ast = inner_parser._parse_expression()
+        inner_ast = self._parse_expression(_ParseCursor(_TOKENIZER.tokenize(inner_expression)))
         
-        return DerivativeNode(variable, inner_ast)
+        return _NODES.derivative(variable, inner_ast)
     
     def _parse_integral_from_string(self, expression: str) -> IntegralNode:
         """Parse integral directly from string to avoid tokenization issues"""
@@ -316,27 +296,17 @@ class Parser:
         
         inner_expression = expression[expr_start:expr_end]
         
-        # Create a new parser instance to parse the inner expression
-        from .tokenizer import Tokenizer
-        inner_tokenizer = Tokenizer()
-        inner_tokens = inner_tokenizer.tokenize(inner_expression)
-        
-        # Create a new parser for the inner expression
-        inner_parser = Parser()
-        inner_parser.tokens = inner_tokens
-        inner_parser.current_position = 0
-        
         # Use the full expression parsing to handle operators like ^
-        inner_ast = inner_parser._parse_expression()
+        inner_ast = self._parse_expression(_ParseCursor(_TOKENIZER.tokenize(inner_expression)))
         
-        return IntegralNode("x", inner_ast)
+        return _NODES.integral("x", inner_ast)
     
     def parse_advanced_expression(self, expression: str) -> ASTNode:
         """Parse advanced mathematical expressions including derivatives and integrals"""
         # Handle special cases
         if expression.startswith('d/d'):
-            return self._parse_derivative()
+            return self._parse_derivative(_ParseCursor(_TOKENIZER.tokenize(expression)))
         elif expression.startswith('∫'):
-            return self._parse_integral()
+            return self._parse_integral(_ParseCursor(_TOKENIZER.tokenize(expression)))
         else:
             return self.parse(expression)
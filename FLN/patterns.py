@@ -0,0 +1,476 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from .ast_nodes import (
+    ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode,
+    ParenthesesNode, UnaryNode, DerivativeNode, IntegralNode, get_node_interner
+)
+from .parser import Parser, _ParseCursor, _TOKENIZER
+
+
+# Pattern variables are written ?name; the tokenizer has no '?', so they are
+# parsed as plain identifiers carrying this prefix and renamed afterwards
+_PLACEHOLDER = "_pattern_var_"
+_PATTERN_VARIABLE = re.compile(r"\?([A-Za-z_]\w*)")
+
+# Marks a pattern variable in a flattened pattern
+_WILDCARD = None
+
+
+def _head(node: ASTNode) -> Tuple[Any, Tuple[ASTNode, ...]]:
+    """Key and children of a node; the key fixes the number of children"""
+    if isinstance(node, NumberNode):
+        return ('number', node.value), ()
+    elif isinstance(node, VariableNode):
+        return ('variable', node.name), ()
+    elif isinstance(node, OperatorNode):
+        return ('operator', node.operator), (node.left, node.right)
+    elif isinstance(node, FunctionNode):
+        return ('function', node.function_name), (node.argument,)
+    elif isinstance(node, UnaryNode):
+        return ('unary', node.operator), (node.operand,)
+    elif isinstance(node, DerivativeNode):
+        return ('derivative', node.variable), (node.expression,)
+    elif isinstance(node, IntegralNode):
+        children = tuple(child for child in (node.expression, node.lower_bound, node.upper_bound)
+                         if child is not None)
+        return ('integral', node.variable, node.lower_bound is not None, node.upper_bound is not None), children
+    raise ValueError(f"Unknown node type: {type(node)}")
+
+
+def _from_head(key: Any, children: List[ASTNode]) -> ASTNode:
+    """Inverse of _head: the interned node with this key and these children"""
+    interner = get_node_interner()
+    kind = key[0]
+    if kind == 'number':
+        return interner.number(key[1])
+    elif kind == 'variable':
+        return interner.variable(key[1])
+    elif kind == 'operator':
+        return interner.operator(key[1], *children)
+    elif kind == 'function':
+        return interner.function(key[1], *children)
+    elif kind == 'unary':
+        return interner.unary(key[1], *children)
+    elif kind == 'derivative':
+        return interner.derivative(key[1], *children)
+    elif kind == 'integral':
+        remaining = iter(children[1:])
+        lower_bound = next(remaining) if key[2] else None
+        upper_bound = next(remaining) if key[3] else None
+        return interner.integral(key[1], children[0], lower_bound, upper_bound)
+    raise ValueError(f"Unknown node key: {key!r}")
+
+
+def _flatten(ast: ASTNode) -> Tuple[List[Any], List[int], List[ASTNode]]:
+    """Pre-order keys of a tree, ignoring parentheses.
+    
+    Returns the keys, for each position the position just past its subtree,
+    and the node at each position.
+    """
+    keys: List[Any] = []
+    ends: List[int] = []
+    nodes: List[ASTNode] = []
+    stack: List[Tuple[ASTNode, int]] = [(ast, -1)]
+    while stack:
+        node, start = stack.pop()
+        if start >= 0:
+            ends[start] = len(keys)
+            continue
+        while isinstance(node, ParenthesesNode):
+            node = node.expression
+        key, children = _head(node)
+        position = len(keys)
+        keys.append(key)
+        ends.append(0)
+        nodes.append(node)
+        stack.append((node, position))
+        stack.extend((child, -1) for child in reversed(children))
+    return keys, ends, nodes
+
+
+def _bind(names: Tuple[str, ...], positions: Tuple[int, ...], keys: List[Any],
+          ends: List[int], nodes: List[ASTNode]) -> Optional[Dict[str, ASTNode]]:
+    """Bindings for the wildcards matched at `positions`, or None when a
+    repeated variable was matched against different subtrees"""
+    bindings: Dict[str, ASTNode] = {}
+    bound: Dict[str, int] = {}
+    for name, position in zip(names, positions):
+        previous = bound.get(name)
+        if previous is None:
+            bound[name] = position
+            bindings[name] = nodes[position]
+        elif keys[previous:ends[previous]] != keys[position:ends[position]]:
+            return None
+    return bindings
+
+
+def _unify(pattern: ASTNode, ast: ASTNode) -> Optional[Dict[str, ASTNode]]:
+    """Bindings if `pattern` matches `ast` itself; walks both trees in step,
+    so a mismatch costs no more than the pattern's size"""
+    bindings: Dict[str, ASTNode] = {}
+    stack: List[Tuple[ASTNode, ASTNode]] = [(pattern, ast)]
+    while stack:
+        pattern_node, node = stack.pop()
+        while isinstance(pattern_node, ParenthesesNode):
+            pattern_node = pattern_node.expression
+        while isinstance(node, ParenthesesNode):
+            node = node.expression
+        if isinstance(pattern_node, VariableNode) and pattern_node.name.startswith('?'):
+            name = pattern_node.name[1:]
+            bound = bindings.get(name)
+            if bound is None:
+                bindings[name] = node
+            elif bound is not node and _flatten(bound)[0] != _flatten(node)[0]:
+                return None
+            continue
+        pattern_key, pattern_children = _head(pattern_node)
+        key, children = _head(node)
+        if pattern_key != key:
+            return None
+        stack.extend(zip(pattern_children, children))
+    return bindings
+
+
+@dataclass(frozen=True)
+class TreePattern:
+    """A formula shape such as `(?a + ?b)^2`, written in expression syntax.
+    
+    `?name` matches any subtree; a name used twice must match equal
+    subtrees. Everything else, numbers and plain variables included, must
+    match exactly. Parentheses only group and are ignored on both sides.
+    """
+    text: str
+    ast: ASTNode  # pattern variables are VariableNodes named "?name"
+    
+    @property
+    def variables(self) -> Tuple[str, ...]:
+        """Pattern variable names in pre-order, repeated where they repeat"""
+        return tuple(key[1][1:] for key in _flatten(self.ast)[0]
+                     if key[0] == 'variable' and key[1].startswith('?'))
+    
+    def flatten(self) -> Tuple[List[Any], Tuple[str, ...]]:
+        """Pre-order keys with wildcards as None, and the wildcard names"""
+        keys = []
+        names = []
+        for key in _flatten(self.ast)[0]:
+            if key[0] == 'variable' and key[1].startswith('?'):
+                keys.append(_WILDCARD)
+                names.append(key[1][1:])
+            else:
+                keys.append(key)
+        return keys, tuple(names)
+    
+    def match(self, ast: ASTNode) -> Optional[Dict[str, ASTNode]]:
+        """Bindings if the pattern matches `ast` itself (not a subtree), else None"""
+        return _unify(self.ast, ast)
+    
+    @property
+    def head(self) -> Any:
+        """Key of the pattern's root node, None when the root is a pattern variable"""
+        root = self.ast
+        while isinstance(root, ParenthesesNode):
+            root = root.expression
+        if isinstance(root, VariableNode) and root.name.startswith('?'):
+            return _WILDCARD
+        return _head(root)[0]
+    
+    def __str__(self) -> str:
+        return self.text
+
+
+def parse_tree_pattern(text: str) -> TreePattern:
+    """Parse a tree pattern, e.g. `sin(?x)^2 + cos(?x)^2`"""
+    tokens = _TOKENIZER.tokenize(_PATTERN_VARIABLE.sub(_PLACEHOLDER + r"\1", text))
+    cursor = _ParseCursor(tokens)
+    ast = Parser()._parse_expression(cursor)
+    if cursor.position != len(tokens):
+        raise ValueError(f"Unexpected input in pattern {text!r} at token {cursor.position}")
+    return TreePattern(text, _rename_placeholders(ast))
+
+
+def _rebuild(node: ASTNode, children: List[ASTNode]) -> ASTNode:
+    """`node` with its children replaced, built through the node interner"""
+    interner = get_node_interner()
+    if isinstance(node, (NumberNode, VariableNode)):
+        return node
+    elif isinstance(node, OperatorNode):
+        return interner.operator(node.operator, *children)
+    elif isinstance(node, FunctionNode):
+        return interner.function(node.function_name, *children)
+    elif isinstance(node, ParenthesesNode):
+        return interner.parentheses(*children)
+    elif isinstance(node, UnaryNode):
+        return interner.unary(node.operator, *children)
+    elif isinstance(node, DerivativeNode):
+        return interner.derivative(node.variable, *children)
+    elif isinstance(node, IntegralNode):
+        remaining = iter(children[1:])
+        lower_bound = next(remaining) if node.lower_bound is not None else None
+        upper_bound = next(remaining) if node.upper_bound is not None else None
+        return interner.integral(node.variable, children[0], lower_bound, upper_bound)
+    raise ValueError(f"Unknown node type: {type(node)}")
+
+
+def _transform(ast: ASTNode, leaf, drop_parentheses: bool = False) -> ASTNode:
+    """Rebuild `ast` bottom-up; `leaf(node)` returns a replacement or None"""
+    built: Dict[int, ASTNode] = {}
+    stack: List[Tuple[ASTNode, bool]] = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in built:
+            continue
+        replacement = leaf(node)
+        if replacement is not None:
+            built[id(node)] = replacement
+            continue
+        children = node.children()
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+            continue
+        new = [built[id(child)] for child in children]
+        if drop_parentheses and isinstance(node, ParenthesesNode):
+            built[id(node)] = new[0]
+        elif all(rebuilt is child for rebuilt, child in zip(new, children)):
+            built[id(node)] = node
+        else:
+            built[id(node)] = _rebuild(node, new)
+    return built[id(ast)]
+
+
+def _rename_placeholders(ast: ASTNode) -> ASTNode:
+    """Rebuild `ast` with placeholder identifiers turned into ?name variables"""
+    interner = get_node_interner()
+    
+    def leaf(node):
+        if isinstance(node, VariableNode) and node.name.startswith(_PLACEHOLDER):
+            return interner.variable('?' + node.name[len(_PLACEHOLDER):])
+        return None
+    
+    return _transform(ast, leaf)
+
+
+# A formula's regex groups are numbered where its tree pattern names them
+# ?a, ?b, ... in the same left-to-right order, so \1 in a replacement is ?a
+_BACKREFERENCE = re.compile(r"\\([1-9])")
+
+# Plain names a replacement may introduce without taking them from the match
+_CONSTANT_NAMES = frozenset({'e', 'pi'})
+
+
+def parse_rewrite_template(text: str, pattern: Optional[TreePattern] = None) -> TreePattern:
+    """Parse a formula replacement such as `(\\1)^2 + 2*(\\1)*(\\2) + (\\2)^2` into a template.
+    
+    Backreferences \\1, \\2, ... and ?name both become pattern variables.
+    Grouping parentheses are dropped. With `pattern`, the template may only
+    use its pattern variables and the plain names occurring in it, so
+    prose and placeholder letters ("sqrt(a*b)") are rejected rather than
+    copied into the rewritten expression.
+    """
+    template = parse_tree_pattern(_BACKREFERENCE.sub(lambda m: '?' + 'abcdefghi'[int(m.group(1)) - 1], text))
+    template = TreePattern(template.text, _transform(template.ast, lambda node: None, drop_parentheses=True))
+    if pattern is not None:
+        names = set()
+        for key in _flatten(pattern.ast)[0]:
+            if key[0] == 'variable':
+                names.add(key[1])
+        for key in _flatten(template.ast)[0]:
+            if key[0] == 'variable' and key[1] not in names and key[1] not in _CONSTANT_NAMES:
+                raise ValueError(f"Template {text!r} uses {key[1]!r}, which {pattern.text!r} does not bind")
+    return template
+
+
+def instantiate(template: TreePattern, bindings: Dict[str, ASTNode]) -> ASTNode:
+    """Build the template's expression with each ?name replaced by its binding.
+    
+    Bound subtrees are shared, not copied; a variable used twice in the
+    template refers to the same node both times.
+    """
+    def leaf(node):
+        if isinstance(node, VariableNode) and node.name.startswith('?'):
+            return bindings[node.name[1:]]
+        return None
+    
+    return _transform(template.ast, leaf)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'wildcard', 'entries')
+    
+    def __init__(self):
+        self.children: Dict[Any, '_TrieNode'] = {}
+        self.wildcard: Optional['_TrieNode'] = None
+        self.entries: List[Tuple[Tuple[str, ...], Any]] = []
+
+
+@dataclass
+class TreeMatch:
+    value: Any                    # what the pattern was inserted with
+    node: ASTNode                 # the matched subtree
+    bindings: Dict[str, ASTNode]  # pattern variable -> subtree
+
+
+class DiscriminationTree:
+    """Index of tree patterns keyed on their pre-order heads.
+    
+    Patterns sharing a prefix of operator/function heads share a path, and a
+    pattern variable is a wildcard edge that skips a whole subtree. match()
+    flattens an AST once and looks up every subtree against the index, so
+    only patterns whose heads agree with the subtree are ever considered.
+    """
+    
+    def __init__(self):
+        self._root = _TrieNode()
+        self._size = 0
+    
+    def insert(self, pattern: TreePattern, value: Any) -> None:
+        keys, names = pattern.flatten()
+        node = self._root
+        for key in keys:
+            if key is _WILDCARD:
+                if node.wildcard is None:
+                    node.wildcard = _TrieNode()
+                node = node.wildcard
+            else:
+                child = node.children.get(key)
+                if child is None:
+                    child = node.children[key] = _TrieNode()
+                node = child
+        node.entries.append((names, value))
+        self._size += 1
+    
+    def match(self, ast: ASTNode) -> List[TreeMatch]:
+        """Every (pattern, subtree) match in `ast`, outermost subtrees first.
+        
+        A subtree shared by several parents (see NodeInterner) is reported once.
+        """
+        keys, ends, nodes = _flatten(ast)
+        matches: List[TreeMatch] = []
+        seen = set()
+        for start in range(len(keys)):
+            if id(nodes[start]) in seen:
+                continue
+            seen.add(id(nodes[start]))
+            end = ends[start]
+            # (trie node, term position, positions consumed by wildcards)
+            stack = [(self._root, start, ())]
+            while stack:
+                trie_node, position, positions = stack.pop()
+                if position == end:
+                    for names, value in trie_node.entries:
+                        bindings = _bind(names, positions, keys, ends, nodes)
+                        if bindings is not None:
+                            matches.append(TreeMatch(value, nodes[start], bindings))
+                    continue
+                if trie_node.wildcard is not None:
+                    stack.append((trie_node.wildcard, ends[position], positions + (position,)))
+                child = trie_node.children.get(keys[position])
+                if child is not None:
+                    stack.append((child, position + 1, positions))
+        return matches
+    
+    def __len__(self) -> int:
+        return self._size
+
+
+def _tree_size(ast: ASTNode, sizes: Dict[int, int]) -> int:
+    """Node count of `ast` with shared subtrees counted every time they occur"""
+    stack: List[Tuple[ASTNode, bool]] = [(ast, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if id(node) in sizes:
+            continue
+        children = node.children()
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+            continue
+        sizes[id(node)] = 1 + sum(sizes[id(child)] for child in children)
+    return sizes[id(ast)]
+
+
+class RewriteSystem:
+    """Rewrite rules `pattern -> template`, applied bottom-up to a fixpoint.
+    
+    A pass visits each distinct subtree once, children first. A node whose
+    children all stayed the same is replaced by the first rule, in insertion
+    order, that matches it and changes it into something not rewritten
+    before, so rules that undo each other (commutativity) fire once; a node
+    whose children changed is only rebuilt and gets its turn in the next
+    pass. rewrite() repeats passes until one changes nothing, and stops
+    early after `max_iterations` passes, before a result larger than
+    `max_nodes` nodes, or when a pass brings back an expression seen before.
+    """
+    
+    def __init__(self):
+        # Rules keyed on the head of their pattern's root
+        self._rules: Dict[Any, List[Tuple[int, TreePattern, TreePattern, Any]]] = {}
+        self._size = 0
+    
+    def add(self, pattern: TreePattern, template: TreePattern, value: Any = None) -> None:
+        self._rules.setdefault(pattern.head, []).append((self._size, pattern, template, value))
+        self._size += 1
+    
+    def rules(self) -> List[Tuple[int, TreePattern, TreePattern, Any]]:
+        """(order, pattern, template, value) for every rule, in insertion order"""
+        return sorted((rule for rules in self._rules.values() for rule in rules), key=lambda rule: rule[0])
+    
+    def _apply_at(self, node: ASTNode, memo: Dict[int, Tuple[ASTNode, ASTNode]]) -> ASTNode:
+        if isinstance(node, ParenthesesNode):
+            return node
+        rules = self._rules.get(_head(node)[0], [])
+        wildcard_rules = self._rules.get(_WILDCARD)
+        if wildcard_rules:
+            rules = sorted(rules + wildcard_rules, key=lambda rule: rule[0])
+        for _, pattern, template, _ in rules:
+            bindings = _unify(pattern.ast, node)
+            if bindings is not None:
+                result = instantiate(template, bindings)
+                previous = memo.get(id(result))
+                # Never go back to an expression that was itself rewritten:
+                # x + y -> y + x is applied once, not undone by the next pass
+                if result is not node and (previous is None or previous[1] is previous[0]):
+                    return result
+        return node
+    
+    def rewrite_once(self, ast: ASTNode, memo: Optional[Dict[int, Tuple[ASTNode, ASTNode]]] = None) -> ASTNode:
+        """One pass. `memo` maps id(subtree) to (subtree, its result) and may be
+        shared between passes; a subtree that is its own result is in normal
+        form, so later passes skip it"""
+        if memo is None:
+            memo = {}
+        stack: List[Tuple[ASTNode, bool]] = [(ast, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in memo:
+                continue
+            children = node.children()
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+                continue
+            new = [memo[id(child)][1] for child in children]
+            if all(rebuilt is child for rebuilt, child in zip(new, children)):
+                result = self._apply_at(node, memo)
+            else:
+                result = _rebuild(node, new)
+            memo[id(node)] = (node, result)
+        return memo[id(ast)][1]
+    
+    def rewrite(self, ast: ASTNode, max_iterations: int = 16, max_nodes: int = 10000) -> ASTNode:
+        """Rewrite until nothing changes or a guard trips; returns the last
+        expression within the guards"""
+        memo: Dict[int, Tuple[ASTNode, ASTNode]] = {}
+        sizes: Dict[int, int] = {}
+        seen = {ast}
+        for _ in range(max_iterations):
+            rewritten = self.rewrite_once(ast, memo)
+            if rewritten is ast or rewritten in seen or _tree_size(rewritten, sizes) > max_nodes:
+                break
+            seen.add(rewritten)
+            ast = rewritten
+        return ast
+    
+    def __len__(self) -> int:
+        return self._size
@@ -0,0 +1,320 @@
+import logging
+import marshal
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from hashlib import blake2b
+from typing import Any, Dict, Optional
+
+from .data_structures import ComputationStep, EvaluationResult, EvaluationType, FormulaMatch
+
+logger = logging.getLogger(__name__)
+
+# First byte of every stored result; bump when the layout below changes, and
+# results stored the old way are read as misses and overwritten
+_FORMAT = b"\x01"
+
+# Words nearly every result holds (the operations and explanations Natix
+# records), so zlib can refer back to them even in a result too short to
+# repeat them itself; results come out about 15% smaller than without
+_PRESET = "".join((
+    "cached_result", "Cached result: ", "variable_substitution", "Substituted ", "number", "Number value: ",
+    "addition", "Added ", " and ", "subtraction", "Subtracted ", " from ", "multiplication", "Multiplied ",
+    " by ", "division", "Divided ", "power", "Raised ", " to power ", "Square root of ", "Sine of ",
+    "Cosine of ", "Log base 10 of ", "Absolute value of ", "Exponential of ", "symbolic_operation",
+    "Symbolic operation: ", "numeric", "detections", "distinct", "regex_searches", "regex_searches_saved",
+    "exact", "symbolic",
+)).encode()
+
+# How stale a row's read time may get before a read refreshes it; eviction
+# only needs it roughly, and refreshing it every time would make each read a write
+_TOUCH_INTERVAL = 60.0
+
+# Compaction evicts down to this share of max_bytes, so it is not due again right away
+_LOW_WATER = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_access ON results (accessed);
+"""
+
+
+def _match_fields(match: FormulaMatch) -> tuple:
+    if type(match) is not FormulaMatch:
+        raise TypeError(f"Cannot store {type(match).__name__} as a formula match")
+    if match.bindings:
+        raise TypeError("Structural bindings hold AST nodes and are not stored")
+    return match.formula_name, match.pattern, match.matched_expression, match.variables, match.confidence
+
+
+def encode_result(result: EvaluationResult) -> bytes:
+    """`result` in the stored format: its fields as marshalled tuples, compressed.
+    
+    Raises TypeError for anything but an EvaluationResult, and for results
+    holding what marshal cannot store, such as the AST nodes bound by
+    structural matches.
+    """
+    if type(result) is not EvaluationResult:
+        raise TypeError(f"Cannot store {type(result).__name__}, only EvaluationResult")
+    steps = [(step.step_number, step.expression, step.result, step.operation,
+              [_match_fields(match) for match in step.applied_formulas], step.is_numeric, step.explanation)
+             for step in result.computation_steps]
+    fields = (result.original_expression, result.final_result,
+              None if result.evaluation_type is None else result.evaluation_type.value,
+              [_match_fields(match) for match in result.applied_formulas], steps,
+              result.is_exact, result.error_message, result.detection_stats)
+    try:
+        data = marshal.dumps(fields)
+    except ValueError as error:
+        raise TypeError(f"Cannot store this result: {error}") from error
+    compressor = zlib.compressobj(6, zdict=_PRESET)
+    return _FORMAT + compressor.compress(data) + compressor.flush()
+
+
+def decode_result(data: bytes) -> EvaluationResult:
+    """The result `data` was encoded from; ValueError if it was stored in
+    another format or is damaged"""
+    if data[:1] != _FORMAT:
+        raise ValueError("Not a stored result, or one stored in another format")
+    try:
+        decompressor = zlib.decompressobj(zdict=_PRESET)
+        raw = decompressor.decompress(data[1:])
+        if not decompressor.eof:
+            raise ValueError("truncated")
+        expression, final, kind, formulas, steps, exact, error, stats = marshal.loads(raw)
+        return EvaluationResult(
+            expression, final, None if kind is None else EvaluationType(kind),
+            [FormulaMatch(*match) for match in formulas],
+            [ComputationStep(number, text, value, operation, [FormulaMatch(*match) for match in matches],
+                             numeric, explanation)
+             for number, text, value, operation, matches, numeric, explanation in steps],
+            exact, error, stats
+        )
+    except (zlib.error, EOFError, TypeError, ValueError) as error:
+        raise ValueError(f"Damaged stored result: {error}") from error
+
+
+class CacheBackend:
+    """Second tier below ExpressionCache's in-memory evaluation cache.
+    
+    Holds encoded results (see encode_result) under keys that read the same
+    in every process, so it can outlive the process that filled it. A
+    backend is shared between threads and must not raise for storage
+    failures: a result that cannot be read is a miss.
+    """
+    
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+    
+    def put(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+    
+    def clear(self) -> None:
+        raise NotImplementedError
+    
+    def close(self) -> None:
+        pass
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class SQLiteBackend(CacheBackend):
+    """Evaluation results in an SQLite file, kept across restarts and shared between processes.
+    
+    Reads honour `ttl`, counted from when a result was stored. A background
+    thread compacts every `compact_interval` seconds, and sooner once what
+    was written may have passed `max_bytes`: it deletes expired results,
+    then the least recently read ones until the rest fit in 90% of
+    `max_bytes`, and gives the freed pages back to the file system. The cap
+    counts stored results, not SQLite's own overhead, and between
+    compactions it can be passed by what was written since.
+    
+    Keys are stored as 16-byte BLAKE2 digests of `namespace` and the key.
+    Results outlive the code that computed them: the key names the formula
+    set (see ExpressionCache), but not the code, so give the namespace
+    something that changes with it, such as the release, or results of
+    older code are served until they expire.
+    
+    Failures (a full disk, a locked or damaged file) are logged and taken
+    as misses, so a broken disk slows evaluation down but never stops it.
+    """
+    
+    def __init__(self, path: str, ttl: float = 86400, max_bytes: int = 256 * 1024 * 1024,
+                 namespace: str = "", compact_interval: float = 60.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.compact_interval = compact_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+        # Compaction has a connection of its own, so reads go on while it writes
+        self._compaction_lock = threading.Lock()
+        self._compaction_connection = self._connect()
+        self._counts = {"hits": 0, "misses": 0, "expirations": 0, "writes": 0, "rejections": 0,
+                        "errors": 0, "compactions": 0, "evictions": 0}
+        self._stored = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        self._written = 0  # bytes since the last compaction
+        self._closed = False
+        self._wake = threading.Event()
+        self._compactor = threading.Thread(target=self._compact_periodically, name="FLN cache compaction",
+                                           daemon=True)
+        self._compactor.start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        # Only takes effect on a new file; lets compaction shrink it
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(_SCHEMA)
+        return connection
+    
+    def _digest(self, key: str) -> bytes:
+        return blake2b(f"{self.namespace}\0{key}".encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+    
+    def _failed(self, action: str, error: sqlite3.Error) -> None:
+        logger.warning("Persistent cache %s failed (%s): %s", action, self.path, error)
+        self._count("errors")
+    
+    def get(self, key: str) -> Optional[bytes]:
+        digest = self._digest(key)
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT value, created, accessed FROM results WHERE key = ?", (digest,)).fetchone()
+                if row is None:
+                    self._counts["misses"] += 1
+                    return None
+                value, created, accessed = row
+                if self.ttl > 0 and now - created > self.ttl:
+                    # Left for compaction to delete
+                    self._counts["expirations"] += 1
+                    self._counts["misses"] += 1
+                    return None
+                if now - accessed > _TOUCH_INTERVAL:
+                    self._connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, digest))
+                self._counts["hits"] += 1
+                return value
+        except sqlite3.Error as error:
+            self._failed("read", error)
+            return None
+    
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            self._count("rejections")
+            return
+        digest = self._digest(key)
+        now = time.time()
+        try:
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (digest, value, len(value), now, now))
+                self._counts["writes"] += 1
+                self._written += len(value)
+                full = self._stored + self._written > self.max_bytes
+        except sqlite3.Error as error:
+            self._failed("write", error)
+            return
+        if full:
+            self._wake.set()
+    
+    def compact(self) -> None:
+        """Delete expired results, then the least recently read ones over the cap"""
+        with self._compaction_lock:
+            with self._lock:
+                self._written = 0
+            connection = self._compaction_connection
+            now = time.time()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if self.ttl > 0:
+                    connection.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+                stored = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                evicted = []
+                if stored > self.max_bytes:
+                    excess = stored - int(self.max_bytes * _LOW_WATER)
+                    rows = connection.execute("SELECT key, size FROM results ORDER BY accessed")
+                    for key, size in rows:
+                        evicted.append((key,))
+                        stored -= size
+                        excess -= size
+                        if excess <= 0:
+                            break
+                    rows.close()
+                    connection.executemany("DELETE FROM results WHERE key = ?", evicted)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            # Each step of the pragma frees one page
+            connection.execute("PRAGMA incremental_vacuum").fetchall()
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            with self._lock:
+                self._stored = stored
+                self._counts["compactions"] += 1
+                self._counts["evictions"] += len(evicted)
+    
+    def _compact_periodically(self) -> None:
+        while True:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._closed:
+                return
+            try:
+                self.compact()
+            except sqlite3.Error as error:
+                self._failed("compaction", error)
+    
+    def clear(self) -> None:
+        try:
+            with self._compaction_lock, self._lock:
+                self._connection.execute("DELETE FROM results")
+                self._stored = self._written = 0
+        except sqlite3.Error as error:
+            self._failed("clear", error)
+    
+    def close(self) -> None:
+        """Stop compacting and close the file; reads and writes fail after this"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._compactor.join()
+        with self._compaction_lock, self._lock:
+            self._compaction_connection.close()
+            self._connection.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counts)
+            try:
+                stats["size"], stats["bytes"] = self._connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            except sqlite3.Error:
+                stats["size"] = stats["bytes"] = None
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0
+        stats["max_bytes"] = self.max_bytes
+        try:
+            stats["file_bytes"] = os.path.getsize(self.path)
+        except OSError:
+            stats["file_bytes"] = None
+        return stats
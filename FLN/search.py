@@ -0,0 +1,158 @@
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+# A query term expands to at most this many prefix completions or near misses
+_MAX_EXPANSIONS = 50
+
+# Shorter prefixes are not completed: one letter would pull in a good part
+# of the vocabulary and rank nothing in particular
+_MIN_PREFIX = 2
+
+# Dice similarity of trigram sets a misspelt term needs to count as a match
+_FUZZY_THRESHOLD = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased runs of letters and digits"""
+    return _TOKEN.findall(text.lower())
+
+
+def _trigrams(term: str) -> Set[str]:
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking, prefix completion and typo tolerance.
+    
+    Documents are numbered in the order they are added, and each is a few
+    weighted fields: a term found in a field of weight 3 counts as three
+    occurrences. Postings are kept in arrays, in document order.
+    
+    A query term matches its own postings. The last term of a query also
+    matches the indexed terms it is a prefix of (from two letters on), so
+    a query typed so far already finds something. A term that is not indexed at all matches
+    the indexed terms sharing most of its character trigrams, scored
+    lower the further they are from it.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}  # term -> (documents, weighted frequencies)
+        self._lengths = array('d')
+        self._total_length = 0.0
+        self._terms: List[str] = []  # sorted, for prefix ranges
+        self._grams: Dict[str, Set[str]] = {}  # trigram -> terms containing it
+    
+    def __len__(self) -> int:
+        return len(self._lengths)
+    
+    def add(self, fields: Iterable[Tuple[str, float]]) -> int:
+        """Index one document given as (text, weight) fields; returns its number"""
+        document = len(self._lengths)
+        frequencies: Counter = Counter()
+        length = 0.0
+        for text, weight in fields:
+            for term in tokenize(text):
+                frequencies[term] += weight
+                length += weight
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('l'), array('d'))
+                self._add_term(term)
+            postings[0].append(document)
+            postings[1].append(frequency)
+        self._lengths.append(length)
+        self._total_length += length
+        return document
+    
+    def _add_term(self, term: str) -> None:
+        position = bisect_left(self._terms, term)
+        self._terms.insert(position, term)
+        for gram in _trigrams(term):
+            self._grams.setdefault(gram, set()).add(term)
+    
+    def _prefixed(self, prefix: str) -> List[str]:
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "\U0010ffff", start)
+        terms = self._terms[start:end]
+        if len(terms) > _MAX_EXPANSIONS:
+            terms = heapq.nlargest(_MAX_EXPANSIONS, terms, key=lambda term: len(self._postings[term][0]))
+        return terms
+    
+    def _similar(self, term: str) -> List[Tuple[str, float]]:
+        grams = _trigrams(term)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+        similar = []
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(_trigrams(candidate)))
+            if similarity >= _FUZZY_THRESHOLD:
+                similar.append((candidate, similarity))
+        return heapq.nlargest(_MAX_EXPANSIONS, similar, key=lambda item: item[1])
+    
+    def _expand(self, term: str, prefix: bool) -> List[Tuple[str, float]]:
+        """Indexed terms a query term stands for, with how much each counts"""
+        expansions = {}
+        if term in self._postings:
+            expansions[term] = 1.0
+        if prefix and len(term) >= _MIN_PREFIX:
+            for completion in self._prefixed(term):
+                expansions.setdefault(completion, 0.9)
+        if not expansions and len(term) >= 3:
+            for candidate, similarity in self._similar(term):
+                expansions[candidate] = 0.8 * similarity
+        return list(expansions.items())
+    
+    def search(self, query: str, limit: Optional[int] = 10, prefix: bool = True) -> List[Tuple[int, float]]:
+        """Best-scoring documents first, as (document, score); ties in document order.
+        
+        With `prefix`, the last term also matches longer terms unless the
+        query ends in whitespace, i.e. the user finished typing the word.
+        """
+        terms = tokenize(query)
+        if not terms or not self._lengths:
+            return []
+        count = len(self._lengths)
+        lengths = self._lengths
+        # BM25: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average length))
+        constant = self.k1 * (1 - self.b)
+        per_length = self.k1 * self.b / (self._total_length / count or 1.0)
+        scores: Dict[int, float] = {}
+        for position, term in enumerate(terms):
+            completing = prefix and position == len(terms) - 1 and not query[-1:].isspace()
+            best: Dict[int, float] = {}
+            for indexed, weight in self._expand(term, completing):
+                documents, frequencies = self._postings[indexed]
+                idf = math.log(1 + (count - len(documents) + 0.5) / (len(documents) + 0.5))
+                factor = weight * idf * (self.k1 + 1)
+                for document, frequency in zip(documents, frequencies):
+                    score = factor * frequency / (frequency + constant + per_length * lengths[document])
+                    # A document matching several expansions of one term counts once
+                    if score > best.get(document, 0.0):
+                        best[document] = score
+            for document, score in best.items():
+                scores[document] = scores.get(document, 0.0) + score
+        order = lambda item: (-item[1], item[0])
+        if limit is None:
+            return sorted(scores.items(), key=order)
+        return heapq.nsmallest(limit, scores.items(), key=order)
+    
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """Indexed terms starting with `prefix`, the most common first"""
+        prefix = prefix.lower()
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "\U0010ffff", start)
+        return heapq.nsmallest(limit, self._terms[start:end],
+                               key=lambda term: (-len(self._postings[term][0]), term))
@@ -25,62 +25,102 @@ class Token:
     position: int
 
 
+FUNCTIONS = frozenset({
+    'sqrt', 'sin', 'cos', 'tan', 'log', 'ln', 'abs', 'exp',
+    'floor', 'ceil', 'round', 'factorial', 'asin', 'acos', 'atan',
+    'sinh', 'cosh', 'tanh'
+})
+
+OPERATORS = frozenset({'+', '-', '*', '/', '^', '='})
+
+# Order matters: at each position the first alternative that matches wins,
+# exactly as if the patterns were tried one after another.
+TOKEN_PATTERNS = (
+    (TokenType.INTEGRAL, r'∫'),
+    (TokenType.DERIVATIVE, r'd/d[a-zA-Z]'),
+    (TokenType.DIFFERENTIAL, r'd[a-zA-Z]'),
+    (TokenType.FUNCTION, r'\b[a-zA-Z_][a-zA-Z0-9_]*\s*\('),
+    (TokenType.NUMBER, r'\b\d+\.?\d*\b'),
+    (TokenType.VARIABLE, r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'),
+    (TokenType.OPERATOR, r'[\+\-\*/^=]'),
+    (TokenType.PARENTHESIS_LEFT, r'\('),
+    (TokenType.PARENTHESIS_RIGHT, r'\)'),
+    (TokenType.COMMA, r','),
+    (TokenType.WHITESPACE, r'\s+')
+)
+
+
+def _build_scanner(patterns) -> re.Pattern:
+    """Compile token patterns into one regex with a named group per token type.
+    
+    Leading whitespace is consumed by the same match instead of producing a
+    separate WHITESPACE match, which halves the number of regex calls.
+    """
+    alternatives = '|'.join(
+        f'(?P<{token_type.name}>{pattern})'
+        for token_type, pattern in patterns
+        if token_type != TokenType.WHITESPACE
+    )
+    return re.compile(rf'\s*(?:{alternatives})')
+
+
+_FUNCTION_INDEX = [token_type for token_type, _ in TOKEN_PATTERNS].index(TokenType.FUNCTION)
+
+# Master scanner built once per process
+_SCANNER = _build_scanner(TOKEN_PATTERNS)
+
+# Identifiers followed by '(' that are not known functions fall through to the
+# patterns after FUNCTION, so they are rescanned without it
+_FALLBACK_SCANNER = _build_scanner(TOKEN_PATTERNS[_FUNCTION_INDEX + 1:])
+
+_WHITESPACE = re.compile(r'\s*')
+
+_TOKEN_TYPES = {token_type.name: token_type for token_type, _ in TOKEN_PATTERNS}
+
+
 class Tokenizer:
     def __init__(self):
-        self.functions = {
-            'sqrt', 'sin', 'cos', 'tan', 'log', 'ln', 'abs', 'exp',
-            'floor', 'ceil', 'round', 'factorial', 'asin', 'acos', 'atan',
-            'sinh', 'cosh', 'tanh'
-        }
-        
-        self.operators = {'+', '-', '*', '/', '^', '='}
-        
-        self.token_patterns = [
-            (TokenType.INTEGRAL, r'∫'),
-            (TokenType.DERIVATIVE, r'd/d[a-zA-Z]'),
-            (TokenType.DIFFERENTIAL, r'd[a-zA-Z]'),
-            (TokenType.FUNCTION, r'\b[a-zA-Z_][a-zA-Z0-9_]*\s*\('),
-            (TokenType.NUMBER, r'\b\d+\.?\d*\b'),
-            (TokenType.VARIABLE, r'\b[a-zA-Z_][a-zA-Z0-9_]*\b'),
-            (TokenType.OPERATOR, r'[\+\-\*/^=]'),
-            (TokenType.PARENTHESIS_LEFT, r'\('),
-            (TokenType.PARENTHESIS_RIGHT, r'\)'),
-            (TokenType.COMMA, r','),
-            (TokenType.WHITESPACE, r'\s+')
-        ]
+        # Shared, immutable tables: a Tokenizer holds no per-call state
+        self.functions = FUNCTIONS
+        self.operators = OPERATORS
+        self.token_patterns = TOKEN_PATTERNS
     
     def tokenize(self, expression: str) -> List[Token]:
         tokens = []
+        append = tokens.append
+        functions = self.functions
+        scan = _SCANNER.match
         position = 0
+        length = len(expression)
         
-        while position < len(expression):
-            match = None
+        while position < length:
+            match = scan(expression, position)
+            
+            if match is None:
+                # Trailing whitespace is fine, anything else is not
+                position = _WHITESPACE.match(expression, position).end()
+                if position < length:
+                    raise ValueError(f"Unexpected character at position {position}: {expression[position]}")
+                break
+            
+            kind = match.lastgroup
+            start = match.start(kind)
             
-            for token_type, pattern in self.token_patterns:
-                regex = re.compile(pattern)
-                match = regex.match(expression, position)
+            if kind == 'FUNCTION':
+                func_name = match.group(kind).rstrip('(').rstrip()
+                if func_name in functions:
+                    append(Token(TokenType.FUNCTION, func_name, start))
+                    append(Token(TokenType.PARENTHESIS_LEFT, '(', start + len(func_name)))
+                    position = match.end()
+                    continue
                 
-                if match:
-                    value = match.group(0)
-                    
-                    if token_type == TokenType.FUNCTION:
-                        func_name = value.rstrip('(').rstrip()
-                        if func_name in self.functions:
-                            tokens.append(Token(TokenType.FUNCTION, func_name, position))
-                            tokens.append(Token(TokenType.PARENTHESIS_LEFT, '(', position + len(func_name)))
-                            position += len(value)
-                            break
-                        else:
-                            continue
-                    
-                    if token_type != TokenType.WHITESPACE:
-                        tokens.append(Token(token_type, value, position))
-                    
-                    position += len(value)
-                    break
+                match = _FALLBACK_SCANNER.match(expression, start)
+                if match is None:
+                    raise ValueError(f"Unexpected character at position {start}: {expression[start]}")
+                kind = match.lastgroup
             
-            if not match:
-                raise ValueError(f"Unexpected character at position {position}: {expression[position]}")
+            append(Token(_TOKEN_TYPES[kind], match.group(kind), start))
+            position = match.end()
         
         return tokens
     
@@ -0,0 +1,306 @@
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Dict, Callable, Tuple, Any
+import math
+from .ast_nodes import (
+    ASTNode, NumberNode, VariableNode, OperatorNode, FunctionNode,
+    ParenthesesNode, UnaryNode, DerivativeNode, IntegralNode
+)
+
+# NumPy is optional and slow to import, so it is imported by the first
+# VectorizedExpression rather than with the package
+np = None
+
+
+def _load_numpy() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+class VectorError(IntEnum):
+    """Per-element error codes; each matches an error Natix would report"""
+    OK = 0
+    SYMBOLIC = 1                  # unbound variable, derivative or integral
+    DIVISION_BY_ZERO = 2
+    MODULO_BY_ZERO = 3
+    ZERO_TO_NEGATIVE_POWER = 4
+    SMALL_TO_NEGATIVE_POWER = 5
+    POWER_OVERFLOW = 6
+    COMPLEX_RESULT = 7            # negative base with a fractional exponent
+    SQRT_OF_NEGATIVE = 8
+    TANGENT_UNDEFINED = 9
+    LOG_OF_NON_POSITIVE = 10
+    EXP_OVERFLOW = 11
+    FACTORIAL_DOMAIN = 12
+    FACTORIAL_OVERFLOW = 13
+    ASIN_DOMAIN = 14
+    ACOS_DOMAIN = 15
+    RANGE_ERROR = 16              # what Natix reports as "Error in <name> function: ..."
+    UNKNOWN_OPERATION = 17
+
+
+@dataclass
+class VectorizedResult:
+    values: Any        # float64 array, NaN wherever error_codes is non-zero
+    error_codes: Any   # uint8 array of VectorError values
+    
+    @property
+    def valid(self) -> Any:
+        return self.error_codes == VectorError.OK
+    
+    def errors(self) -> Dict[VectorError, int]:
+        """Number of elements per error code"""
+        codes, counts = np.unique(self.error_codes, return_counts=True)
+        return {VectorError(int(code)): int(count) for code, count in zip(codes, counts) if code}
+
+
+# A lowered node: takes the variables dict, returns (values, error codes)
+VectorEvaluator = Callable[[Dict[str, Any]], Tuple[Any, Any]]
+
+
+def _flag(codes, condition, code: VectorError):
+    """Record `code` where `condition` holds, keeping any earlier error"""
+    return np.where((codes == 0) & condition, np.uint8(code), codes)
+
+
+def _merge(left_codes, right_codes):
+    # Natix evaluates the left operand first, so its error wins
+    return np.where(left_codes != 0, left_codes, right_codes)
+
+
+def _is_integer(values):
+    return np.isfinite(values) & (values == np.floor(values))
+
+
+def _add(left, right, codes):
+    return left + right, codes
+
+
+def _subtract(left, right, codes):
+    return left - right, codes
+
+
+def _multiply(left, right, codes):
+    return left * right, codes
+
+
+def _divide(left, right, codes):
+    codes = _flag(codes, right == 0, VectorError.DIVISION_BY_ZERO)
+    return left / np.where(right == 0, 1.0, right), codes
+
+
+def _power(left, right, codes):
+    general = (right != 0) & (right != 1)
+    codes = _flag(codes, general & (right < 0) & (left == 0), VectorError.ZERO_TO_NEGATIVE_POWER)
+    codes = _flag(codes, general & (right < 0) & (np.abs(left) < 1e-10), VectorError.SMALL_TO_NEGATIVE_POWER)
+    codes = _flag(codes, general & (left < 0) & ~_is_integer(right), VectorError.COMPLEX_RESULT)
+    result = np.power(left, right)
+    codes = _flag(codes, general & np.isinf(result), VectorError.POWER_OVERFLOW)
+    result = np.where(right == 0, 1.0, np.where(right == 1, left, result))
+    return result, codes
+
+
+def _modulo(left, right, codes):
+    codes = _flag(codes, right == 0, VectorError.MODULO_BY_ZERO)
+    return np.mod(left, np.where(right == 0, 1.0, right)), codes
+
+
+def _sqrt(arg, codes):
+    codes = _flag(codes, arg < 0, VectorError.SQRT_OF_NEGATIVE)
+    return np.sqrt(arg), codes
+
+
+def _trigonometric(ufunc):
+    def apply(arg, codes):
+        # math.sin/cos/tan reject infinities
+        codes = _flag(codes, np.isinf(arg), VectorError.RANGE_ERROR)
+        return ufunc(arg), codes
+    return apply
+
+
+def _tan(arg, codes):
+    codes = _flag(codes, np.isinf(arg), VectorError.RANGE_ERROR)
+    codes = _flag(codes, np.abs(np.cos(arg)) < 1e-10, VectorError.TANGENT_UNDEFINED)
+    return np.tan(arg), codes
+
+
+def _logarithm(ufunc):
+    def apply(arg, codes):
+        codes = _flag(codes, arg <= 0, VectorError.LOG_OF_NON_POSITIVE)
+        return ufunc(arg), codes
+    return apply
+
+
+def _exp(arg, codes):
+    result = np.exp(arg)
+    return result, _flag(codes, np.isinf(result), VectorError.EXP_OVERFLOW)
+
+
+def _hyperbolic(ufunc):
+    def apply(arg, codes):
+        # math.sinh/cosh raise OverflowError for large finite arguments
+        result = ufunc(arg)
+        return result, _flag(codes, np.isinf(result) & np.isfinite(arg), VectorError.RANGE_ERROR)
+    return apply
+
+
+def _rounding(ufunc):
+    def apply(arg, codes):
+        # math.floor/ceil and round() cannot convert inf or NaN to an integer
+        return ufunc(arg), _flag(codes, ~np.isfinite(arg), VectorError.RANGE_ERROR)
+    return apply
+
+
+_FACTORIALS = None
+
+
+def _factorial(arg, codes):
+    global _FACTORIALS
+    if _FACTORIALS is None:
+        _FACTORIALS = np.array([float(math.factorial(n)) for n in range(171)])
+    
+    codes = _flag(codes, arg < 0, VectorError.FACTORIAL_DOMAIN)
+    codes = _flag(codes, ~np.isfinite(arg), VectorError.RANGE_ERROR)
+    codes = _flag(codes, arg != np.floor(arg), VectorError.FACTORIAL_DOMAIN)
+    codes = _flag(codes, arg > 170, VectorError.FACTORIAL_OVERFLOW)
+    index = np.clip(np.nan_to_num(arg), 0, 170).astype(np.intp)
+    return _FACTORIALS[index], codes
+
+
+def _asin(arg, codes):
+    codes = _flag(codes, (arg < -1) | (arg > 1), VectorError.ASIN_DOMAIN)
+    return np.arcsin(arg), codes
+
+
+def _acos(arg, codes):
+    codes = _flag(codes, (arg < -1) | (arg > 1), VectorError.ACOS_DOMAIN)
+    return np.arccos(arg), codes
+
+
+def _complex_cbrt(arg, codes):
+    # Natix computes arg ** (1/3), which is complex for negative arguments
+    codes = _flag(codes, arg < 0, VectorError.COMPLEX_RESULT)
+    return np.power(arg, 1/3), codes
+
+
+_BINARY_OPERATIONS = {
+    '+': _add,
+    '-': _subtract,
+    '*': _multiply,
+    '/': _divide,
+    '^': _power,
+    '%': _modulo,
+}
+
+_FUNCTIONS = {
+    'sqrt': _sqrt,
+    'sin': _trigonometric(lambda arg: np.sin(arg)),
+    'cos': _trigonometric(lambda arg: np.cos(arg)),
+    'tan': _tan,
+    'log': _logarithm(lambda arg: np.log10(arg)),
+    'ln': _logarithm(lambda arg: np.log(arg)),
+    'abs': lambda arg, codes: (np.abs(arg), codes),
+    'exp': _exp,
+    'factorial': _factorial,
+    'asin': _asin,
+    'acos': _acos,
+    'atan': lambda arg, codes: (np.arctan(arg), codes),
+    'sinh': _hyperbolic(lambda arg: np.sinh(arg)),
+    'cosh': _hyperbolic(lambda arg: np.cosh(arg)),
+    'tanh': lambda arg, codes: (np.tanh(arg), codes),
+    'cbrt': _complex_cbrt,
+    'floor': _rounding(lambda arg: np.floor(arg)),
+    'ceil': _rounding(lambda arg: np.ceil(arg)),
+    'round': _rounding(lambda arg: np.round(arg)),
+}
+
+
+def _constant(value: float, code: VectorError = VectorError.OK) -> VectorEvaluator:
+    return lambda variables: (np.float64(value), np.uint8(code))
+
+
+def _lower(node: ASTNode) -> VectorEvaluator:
+    if isinstance(node, NumberNode):
+        return _constant(node.value)
+    elif isinstance(node, VariableNode):
+        name = node.name
+        
+        def load(variables):
+            if name in variables:
+                return variables[name], np.uint8(VectorError.OK)
+            return np.float64(np.nan), np.uint8(VectorError.SYMBOLIC)
+        return load
+    elif isinstance(node, ParenthesesNode):
+        return _lower(node.expression)
+    elif isinstance(node, OperatorNode):
+        left, right = _lower(node.left), _lower(node.right)
+        operation = _BINARY_OPERATIONS.get(node.operator)
+        if operation is None:
+            return _constant(np.nan, VectorError.UNKNOWN_OPERATION)
+        
+        def binary(variables):
+            left_values, left_codes = left(variables)
+            right_values, right_codes = right(variables)
+            return operation(left_values, right_values, _merge(left_codes, right_codes))
+        return binary
+    elif isinstance(node, FunctionNode):
+        argument = _lower(node.argument)
+        function = _FUNCTIONS.get(node.function_name)
+        if function is None:
+            return _constant(np.nan, VectorError.UNKNOWN_OPERATION)
+        
+        def call(variables):
+            return function(*argument(variables))
+        return call
+    elif isinstance(node, UnaryNode):
+        operand = _lower(node.operand)
+        if node.operator == '-':
+            def negate(variables):
+                values, codes = operand(variables)
+                return -values, codes
+            return negate
+        if node.operator == '+':
+            return operand
+        return _constant(np.nan, VectorError.UNKNOWN_OPERATION)
+    elif isinstance(node, (DerivativeNode, IntegralNode)):
+        return _constant(np.nan, VectorError.SYMBOLIC)
+    else:
+        raise ValueError(f"Unknown node type: {type(node)}")
+
+
+class VectorizedExpression:
+    """An expression evaluated over whole arrays of variable values with NumPy.
+    
+    Values are computed in float64. Where Natix would return an error or a
+    symbolic result, the element is NaN and carries a VectorError code.
+    """
+    
+    def __init__(self, expression: str, ast: ASTNode):
+        if not _load_numpy():
+            raise ImportError("Vectorized evaluation requires NumPy: pip install numpy")
+        self.expression = expression
+        self.ast = ast
+        self._evaluate = _lower(ast)
+    
+    def __call__(self, **variables) -> VectorizedResult:
+        return self.evaluate(variables)
+    
+    def evaluate(self, variables: Dict[str, Any] = None) -> VectorizedResult:
+        arrays = {name: np.asarray(value, dtype=np.float64) for name, value in (variables or {}).items()}
+        with np.errstate(all='ignore'):
+            values, codes = self._evaluate(arrays)
+        # Results take the shape of the inputs even where the expression ignores them
+        shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+        values, codes, _ = np.broadcast_arrays(np.asarray(values, dtype=np.float64),
+                                               np.asarray(codes, dtype=np.uint8), np.empty(shape))
+        values = np.where(codes != 0, np.nan, values)
+        return VectorizedResult(values=values, error_codes=codes.copy())
+    
+    def __repr__(self) -> str:
+        return f"VectorizedExpression({self.expression!r})"
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmarks for FLN Math Engine
+Run everything with `python examples/benchmarks.py` or pick sections by name,
+e.g. `python examples/benchmarks.py tokenizer`
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from FLN.ast_nodes import NodeInterner, get_node_interner
+from FLN.cache import ExpressionCache, LRUCache, sizeof
+from FLN.compact import CompactAST
+from FLN.data_structures import CanonicalLevel, FormulaDefinition
+from FLN.egraph import EGraph, simplify
+from FLN.engine import MathEngine
+from FLN.formula_database import DATA_FILE, FormulaDatabase, FormulaIndex, _build, load_snapshot
+from FLN.parser import Parser
+from FLN.tokenizer import Tokenizer
+
+
+def _time_per_call(func, repeat: int = 5, number: int = 1000) -> float:
+    """Best-of-`repeat` wall time of one call, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def _random_expression(rng: random.Random, length: int) -> str:
+    """Build a syntactically valid expression of roughly `length` characters"""
+    functions = ["sin", "cos", "sqrt", "log", "exp", "abs"]
+    operands = ["x", "y", "alpha", "2", "3.14", "10", "b_1"]
+    parts = [rng.choice(operands)]
+    size = len(parts[0])
+    while size < length:
+        operator = rng.choice([" + ", " - ", " * ", " / ", "^"])
+        if rng.random() < 0.3:
+            operand = f"{rng.choice(functions)}({rng.choice(operands)} + {rng.choice(operands)})"
+        else:
+            operand = rng.choice(operands)
+        parts.append(operator + operand)
+        size += len(operator) + len(operand)
+    return "".join(parts)
+
+
+_STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import FLN
+imported = time.perf_counter()
+engine = FLN.MathEngine()
+constructed = time.perf_counter()
+engine.evaluate("2 * x + 1", {"x": 3})
+print(imported - start, constructed - imported, time.perf_counter() - constructed)
+"""
+
+
+def bench_startup():
+    """Cold start in a fresh interpreter: import FLN, MathEngine(), first evaluate()"""
+    print("🚀 STARTUP")
+    print("-" * 50)
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    runs = []
+    for _ in range(5):
+        output = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append([float(value) for value in output.split()])
+    for column, label in enumerate(["import FLN", "MathEngine()", "first evaluate()"]):
+        best = min(run[column] for run in runs)
+        print(f"  {label:<17} {best * 1e3:7.1f} ms (best of {len(runs)} processes)")
+    with open(DATA_FILE, "rb") as file:
+        data = file.read()
+    built = _time_per_call(lambda: _build(data, ""), repeat=3, number=1)
+    loaded = _time_per_call(load_snapshot, repeat=3, number=20)
+    print(f"  formulas.json: {built * 1e3:.1f} ms to build, {loaded * 1e3:.2f} ms from the snapshot")
+    print()
+
+
+def bench_tokenizer():
+    """Per-character tokenizing cost for typical 50-300 character expressions"""
+    print("🔤 TOKENIZER")
+    print("-" * 50)
+    rng = random.Random(42)
+    tokenizer = Tokenizer()
+    for length in (50, 100, 200, 300):
+        corpus = [_random_expression(rng, length) for _ in range(50)]
+        chars = sum(len(expression) for expression in corpus)
+        elapsed = _time_per_call(lambda: [tokenizer.tokenize(e) for e in corpus], number=20)
+        print(f"  {length:>4} chars: {elapsed / chars * 1e9:8.1f} ns/char, "
+              f"{elapsed / len(corpus) * 1e6:8.1f} µs/expression")
+    print()
+
+
+def bench_parser():
+    """Parse time for typical expressions and for deeply nested input"""
+    print("🌳 PARSER")
+    print("-" * 50)
+    rng = random.Random(42)
+    parser = Parser()
+    corpus = [_random_expression(rng, 150) for _ in range(50)]
+    elapsed = _time_per_call(lambda: [parser.parse(e) for e in corpus], number=20)
+    print(f"  150 chars: {elapsed / len(corpus) * 1e6:8.1f} µs/expression")
+    for depth in (1000, 10000, 100000):
+        expression = "(" * depth + "x" + ")" * depth
+        elapsed = _time_per_call(lambda: parser.parse(expression), repeat=3, number=1)
+        print(f"  depth {depth:>6}: {elapsed * 1e3:8.1f} ms ({elapsed / depth * 1e6:.2f} µs/level)")
+    print()
+
+
+def bench_compile():
+    """Repeated evaluation of one formula: evaluate() versus compile() and compile_bytecode()"""
+    print("⚙️ COMPILED EXPRESSIONS")
+    print("-" * 50)
+    engine = MathEngine(enable_caching=False)
+    expression = "sqrt(x^2 + y^2) * sin(x) / (1 + exp(-y))"
+    samples = [{"x": i * 0.01, "y": 1 + i * 0.02} for i in range(200)]
+    elapsed = _time_per_call(lambda: [engine.evaluate(expression, v) for v in samples], repeat=3, number=1)
+    print(f"  engine.evaluate: {elapsed / len(samples) * 1e6:10.2f} µs/call")
+    compiled = engine.compile(expression)
+    elapsed = _time_per_call(lambda: [compiled(**v) for v in samples], number=50)
+    print(f"  compiled(**v):   {elapsed / len(samples) * 1e6:10.2f} µs/call")
+    program = engine.compile_bytecode(expression)
+    elapsed = _time_per_call(lambda: [program(**v) for v in samples], number=50)
+    print(f"  bytecode(**v):   {elapsed / len(samples) * 1e6:10.2f} µs/call")
+    print()
+
+
+def bench_vectorize():
+    """Throughput over 1e6 samples: compiled per-call loop versus NumPy arrays"""
+    print("🧮 VECTORIZED EVALUATION")
+    print("-" * 50)
+    try:
+        import numpy as np
+    except ImportError:
+        print("  NumPy is not installed, skipping")
+        print()
+        return
+    engine = MathEngine(enable_caching=False)
+    expression = "sqrt(x^2 + y^2) * sin(x) / (1 + exp(-y))"
+    size = 1_000_000
+    rng = np.random.default_rng(42)
+    x, y = rng.uniform(-10, 10, size), rng.uniform(-10, 10, size)
+    compiled = engine.compile(expression)
+    loop = 20000
+    pairs = list(zip(x[:loop].tolist(), y[:loop].tolist()))
+    elapsed = _time_per_call(lambda: [compiled(x=a, y=b) for a, b in pairs], repeat=3, number=1)
+    print(f"  compiled loop:   {loop / elapsed:14,.0f} samples/s")
+    vectorized = engine.vectorize(expression)
+    elapsed = _time_per_call(lambda: vectorized(x=x, y=y), repeat=3, number=1)
+    print(f"  vectorized:      {size / elapsed:14,.0f} samples/s ({elapsed * 1e3:.1f} ms for {size:,})")
+    print()
+
+
+def bench_steps():
+    """Latency of Natix.evaluate and engine.evaluate per step level"""
+    print("📝 STEP LEVELS")
+    print("-" * 50)
+    engine = MathEngine(enable_caching=False)
+    expression = "sqrt(x^2 + y^2) * sin(x) / (1 + exp(-y))"
+    variables = {"x": 1.5, "y": 2}
+    ast = engine.parse_expression(expression)
+    for level in ("full", "summary", "none"):
+        natix = _time_per_call(lambda: engine.natix.evaluate(ast, variables, level), number=200)
+        total = _time_per_call(lambda: engine.evaluate(expression, variables, level), repeat=3, number=20)
+        steps = len(engine.evaluate(expression, variables, level).computation_steps)
+        print(f"  {level:>7}: natix {natix * 1e6:8.1f} µs, engine {total * 1e3:6.2f} ms, {steps:2d} steps")
+    print()
+
+
+def bench_natix():
+    """Natix.evaluate cost per node as expressions get deeper"""
+    print("⚡ NATIX")
+    print("-" * 50)
+    parser = Parser()
+    natix = MathEngine(enable_caching=False).natix
+    for terms in (50, 100, 200):
+        ast = parser.parse(" + ".join(f"x * {i}" for i in range(terms)))
+        elapsed = _time_per_call(lambda: natix.evaluate(ast, {"x": 2}), repeat=3, number=10)
+        nodes = 4 * terms - 1
+        print(f"  {nodes:>4} nodes: {elapsed * 1e3:8.2f} ms ({elapsed / nodes * 1e6:.1f} µs/node)")
+    print()
+
+
+def bench_folex():
+    """Formula detection latency, and how it holds up as the database grows"""
+    print("🔍 FORMULA DETECTION")
+    print("-" * 50)
+    folex = MathEngine(enable_caching=False).folex
+    corpus = ["(x + y)^2", "sin(x)^2 + cos(x)^2", "sqrt(x^2 + y^2) * sin(x) / (1 + exp(-y))", "2 + 3"]
+    for expression in corpus:
+        candidates = len(folex._candidates(folex._clean_expression(expression)))
+        elapsed = _time_per_call(lambda: folex.detect_formulas(expression), number=200)
+        print(f"  {expression:<42} {elapsed * 1e6:8.1f} µs ({candidates} of {len(folex.formulas)} tested)")
+    parser = Parser()
+    asts = [parser.parse(expression) for expression in corpus]
+    elapsed = _time_per_call(lambda: [folex.match_ast(ast) for ast in asts], number=200)
+    print(f"  match_ast(), structural: {elapsed / len(corpus) * 1e6:8.1f} µs/expression")
+    engine = MathEngine(enable_caching=False)
+    for expression in corpus:
+        stats = engine.evaluate(expression, {"x": 1, "y": 2}).detection_stats
+        print(f"  evaluate({expression!r}): {stats['detections']} detections of {stats['distinct']} strings, "
+              f"{stats['regex_searches']} regex searches run, {stats['regex_searches_saved']} saved")
+    # Formulas the corpus cannot match should cost nothing at detection time
+    padded = folex.formulas + [
+        FormulaDefinition(f"Filler {i}", rf"zeta{i}\(([a-zA-Z])\)", r"\1", 10)
+        for i in range(5000)
+    ]
+    folex.reload_formulas(padded)
+    elapsed = _time_per_call(lambda: [folex.detect_formulas(e) for e in corpus], number=200)
+    print(f"  with {len(padded)} formulas: {elapsed / len(corpus) * 1e6:8.1f} µs/expression")
+    print()
+
+
+def bench_lookup():
+    """FormulaDatabase lookups on a 50k-formula catalogue: dict indexes versus scanning"""
+    print("📚 FORMULA LOOKUP")
+    print("-" * 50)
+    db = FormulaDatabase()
+    base = list(db.formulas)
+    rng = random.Random(7)
+    for i in range(50_000 - len(base)):
+        formula = rng.choice(base)
+        db.add_formula(FormulaDefinition(f"{formula.name} {i}", formula.pattern, formula.replacement,
+                                         rng.randint(6, 12), f"{formula.category} {i % 500}",
+                                         formula.description, formula.topic))
+    formulas = db.formulas
+    name = formulas[-1].name.lower()
+    lookups = {
+        "by name": (lambda: db.get_formula_by_name(name),
+                    lambda: next(f for f in formulas if f.name.lower() == name)),
+        "by category": (lambda: db.get_formulas_by_category("calculus 42"),
+                        lambda: [f for f in formulas if f.category.lower() == "calculus 42"]),
+        "by grade": (lambda: db.get_formulas_by_grade(12),
+                     lambda: [f for f in formulas if f.grade == 12]),
+    }
+    for label, (indexed, scanned) in lookups.items():
+        fast = _time_per_call(indexed, number=100)
+        slow = _time_per_call(scanned, repeat=3, number=5)
+        print(f"  {label:<12} {fast * 1e6:9.2f} µs indexed, {slow * 1e6:9.1f} µs scanning")
+    print()
+
+
+def bench_search():
+    """Ranked search_formulas() on a synthetic 100k-formula catalogue, keystroke by keystroke"""
+    print("🔎 FORMULA SEARCH")
+    print("-" * 50)
+    base = FormulaDatabase().formulas
+    words = sorted({word for f in base for word in f"{f.name} {f.description}".lower().split() if word.isalpha()})
+    rng = random.Random(11)
+    catalogue = [
+        FormulaDefinition(" ".join(rng.sample(words, 3)).title(), "", "", rng.randint(6, 12),
+                          rng.choice(base).category, " ".join(rng.sample(words, 8)), rng.choice(base).topic)
+        for _ in range(100_000)
+    ]
+    index = FormulaIndex(catalogue)
+    start = time.perf_counter()
+    index.search("warm up")
+    print(f"  index of {len(catalogue)} formulas built in {time.perf_counter() - start:.2f} s")
+    
+    query = "pythagorean identity"
+    latencies = [_time_per_call(lambda: index.search(query[:end], limit=10), repeat=3, number=5)
+                 for end in range(1, len(query) + 1)]
+    print(f"  typing {query!r}, top 10: {sum(latencies) / len(latencies) * 1e3:.2f} ms/keystroke "
+          f"(worst {max(latencies) * 1e3:.2f} ms)")
+    for label, text in (("misspelt 'pythagoran identty'", "pythagoran identty"), ("complete('deriv')", None)):
+        call = (lambda: index.search(text, limit=10)) if text else (lambda: index.complete("deriv"))
+        print(f"  {label:<30} {_time_per_call(call, repeat=3, number=5) * 1e3:6.2f} ms")
+    elapsed = _time_per_call(lambda: index.add(rng.choice(catalogue)), number=100)
+    print(f"  incremental add: {elapsed * 1e6:.1f} µs/formula")
+    scanned = _time_per_call(lambda: [f for f in catalogue if "pythagorean" in
+                                      (f.name + f.description + f.topic + f.category).lower()], repeat=3, number=1)
+    print(f"  (an unranked substring scan: {scanned * 1e3:.1f} ms/query)")
+    print()
+
+
+def _size(ast) -> int:
+    return 1 + sum(_size(child) for child in ast.children())
+
+
+def bench_egraph():
+    """Greedy fixpoint rewriting versus e-graph saturation: result size and time"""
+    print("🕸️ EQUALITY SATURATION")
+    print("-" * 50)
+    engine = MathEngine(enable_caching=False)
+    rules = engine.folex.equality_rules()
+    parser = Parser()
+    corpus = ["sin(x)^2 + cos(x)^2 + a*b + a*c", "x^2 * x^3 + sqrt(y^2)",
+              "cosh(t)^2 - sinh(t)^2 + (z^2)^3", "log(p^q) + a*b*c*d"]
+    for expression in corpus:
+        ast = parser.parse(expression)
+        greedy = rules.rewrite(ast)
+        greedy_time = _time_per_call(lambda: rules.rewrite(ast), number=20)
+        graph = EGraph()
+        root = graph.add_ast(ast)
+        report = graph.saturate(rules)
+        simplified = graph.extract(root)
+        saturate_time = _time_per_call(lambda: simplify(ast, rules), repeat=3, number=5)
+        print(f"  {expression}")
+        print(f"    greedy:    {_size(greedy):3d} nodes in {greedy_time * 1e3:7.2f} ms  {greedy.to_string()}")
+        print(f"    saturated: {_size(simplified):3d} nodes in {saturate_time * 1e3:7.2f} ms  {simplified.to_string()}")
+        print(f"    {graph.class_count} classes, {report.iterations} iterations ({report.stop_reason}), "
+              f"{report.classes_searched} rule/class searches")
+    print()
+
+
+def _retained_bytes(build) -> int:
+    """Bytes still allocated after `build()` while its result is alive"""
+    tracemalloc.start()
+    result = build()
+    get_node_interner().sweep()  # not the entries of nodes that died meanwhile
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_interning():
+    """Memory held by a parsed corpus: shared (interned) nodes versus plain trees"""
+    print("🧬 HASH-CONSED AST")
+    print("-" * 50)
+    rng = random.Random(42)
+    parser = Parser()
+    terms = [f"({_random_expression(rng, 30)})" for _ in range(50)]
+    corpora = {
+        "random, few repeats": [_random_expression(rng, 300) for _ in range(2000)],
+        "generated from 50 terms": [" + ".join(rng.choice(terms) for _ in range(10)) for _ in range(2000)],
+        "sin(x)*sin(x)*... x 2000": ["*".join(["sin(x)"] * 20)] * 2000,
+    }
+    for name, corpus in corpora.items():
+        trees = _retained_bytes(lambda: [parser.parse(e).clone() for e in corpus])
+        shared = _retained_bytes(lambda: [parser.parse(e) for e in corpus])
+        print(f"  {name:<26} trees {trees / 1e6:7.2f} MB, interned {shared / 1e6:7.2f} MB "
+              f"({trees / shared:.1f}x)")
+    print()
+
+
+def bench_compact():
+    """Memory held by 100k parsed expressions: node trees, interned DAGs, CompactAST"""
+    print("🗜️ COMPACT AST")
+    print("-" * 50)
+    rng = random.Random(42)
+    parser = Parser()
+    corpus = [_random_expression(rng, rng.randint(20, 120)) for _ in range(100_000)]
+    # Parse once untraced; each layout is then built from these ASTs
+    parsed = [parser.parse(e) for e in corpus]
+    nodes = sum(len(CompactAST.from_ast(ast.clone())) for ast in parsed)
+    
+    def interned():
+        # the interner's table is part of what a DAG costs
+        interner = NodeInterner()
+        return interner, [interner.intern(ast) for ast in parsed]
+    
+    layouts = {
+        "node trees": lambda: [ast.clone() for ast in parsed],
+        "interned DAGs": interned,
+        "CompactAST": lambda: [CompactAST.from_ast(ast) for ast in parsed],
+    }
+    for name, build in layouts.items():
+        size = _retained_bytes(build)
+        print(f"  {name:<14} {size / 1e6:8.1f} MB ({size / nodes:5.1f} bytes/node)")
+    compact = [CompactAST.from_ast(ast) for ast in parsed[:1000]]
+    elapsed = _time_per_call(lambda: [c.to_ast() for c in compact], repeat=3, number=1)
+    print(f"  to_ast(): {elapsed / len(compact) * 1e6:.1f} µs/expression (~{nodes // len(parsed)} nodes)")
+    print()
+
+
+def bench_cache():
+    """ExpressionCache lookups and stores from many threads sharing one cache"""
+    print("🗄️ SHARED CACHE")
+    print("-" * 50)
+    operations = 20_000
+    
+    def run(cache, threads):
+        def work(number):
+            for i in range(operations // threads):
+                expression = f"x + {(number * 31 + i) % 400}"
+                if cache.get_cached_evaluation(expression, {"x": 1}) is None:
+                    cache.cache_evaluation(expression, {"x": 1}, i)
+        
+        workers = [threading.Thread(target=work, args=(number,)) for number in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return operations / (time.perf_counter() - start)
+    
+    for threads in (1, 8, 32):
+        single = run(ExpressionCache(max_size=1000, shards=1), threads)
+        sharded = run(ExpressionCache(max_size=1000), threads)
+        print(f"  {threads:>2} threads: {sharded / 1e3:7.1f}k lookups/s sharded, {single / 1e3:7.1f}k with one lock")
+    print()
+
+
+def bench_budget():
+    """Sizing cached results, and what a byte budget keeps under a mix of small and huge ones"""
+    print("⚖️ CACHE BUDGET")
+    print("-" * 50)
+    engine = MathEngine(enable_caching=False)
+    for terms in (1, 8, 30):
+        expression = " + ".join(f"sin(x)^2 + cos(x)^2 + (x + {n})^2" for n in range(terms))
+        trace = engine.evaluate(expression, {"x": 2})
+        print(f"  {len(trace.computation_steps):>3}-step trace: {sizeof(trace):>7,} bytes in "
+              f"{_time_per_call(lambda: sizeof(trace), number=200) * 1e6:5.1f} µs, "
+              f"{len(str(trace)):>7,} characters in {_time_per_call(lambda: str(trace), number=200) * 1e6:5.1f} µs")
+    
+    # 2000 small results asked for again and again, between one-off 30-term traces
+    small = [engine.evaluate(f"x + {n}", {"x": 1}, steps="none") for n in range(20)]
+    rng = random.Random(7)
+    requests = [("hot", rng.randrange(2000)) if rng.random() < 0.8 else ("trace", i) for i in range(50_000)]
+    budget = 2000 * sizeof(small[0]) + 20 * sizeof(trace)
+    
+    def run(cache):
+        hot = hits = 0
+        for kind, key in requests:
+            hot += kind == "hot"
+            if cache.get((kind, key)) is not None:
+                hits += kind == "hot"
+            else:
+                cache.put((kind, key), small[key % 20] if kind == "hot" else trace)
+        return hits / hot, cache.get_stats()["bytes"], len(cache)
+    
+    for label, cache in (("LRU, 250 entries", LRUCache(max_size=250)),
+                         ("LRU, 2000 entries", LRUCache(max_size=2000)),
+                         (f"{budget / 2**20:.1f} MiB budget", LRUCache(max_size=10_000, max_bytes=budget))):
+        rate, held, count = run(cache)
+        print(f"  {label:<18} hot hit rate {rate:6.1%}, {count:5} entries, {held / 2**20:4.1f} MiB held")
+    print()
+
+
+def bench_keys():
+    """Latency of a cache hit, with the JSON string keys cache lookups used to build and with tuple keys"""
+    print("🔑 CACHE KEYS")
+    print("-" * 50)
+    expression = "sin(x)^2 + cos(y)^2 * theta"
+    variables = {"x": 2.0, "y": 3, "theta": 0.5}
+    
+    def json_key(expression, variables, steps="full"):
+        # How evaluation keys used to be made
+        var_str = json.dumps(sorted(variables.items()), sort_keys=True)
+        return f"{expression}|{var_str}" if steps == "full" else f"{expression}|{var_str}|{steps}"
+    
+    cache = ExpressionCache()
+    cache.evaluation_cache.put(json_key(expression, variables), "result")
+    cache.cache_evaluation(expression, variables, "result")
+    before = _time_per_call(lambda: cache.evaluation_cache.get(json_key(expression, variables)), number=20_000)
+    after = _time_per_call(lambda: cache.get_cached_evaluation(expression, variables), number=20_000)
+    key = _time_per_call(lambda: cache._make_evaluation_key(expression, variables), number=20_000)
+    print(f"  hit with JSON keys:  {before * 1e6:5.2f} µs ({_time_per_call(lambda: json_key(expression, variables), number=20_000) * 1e6:.2f} µs making the key)")
+    print(f"  hit with tuple keys: {after * 1e6:5.2f} µs ({key * 1e6:.2f} µs making the key), {before / after:.1f}x faster")
+    
+    engine = MathEngine()
+    engine.evaluate(expression, variables)
+    print(f"  MathEngine.evaluate() answered from the cache: {_time_per_call(lambda: engine.evaluate(expression, variables), number=20_000) * 1e6:5.2f} µs")
+    print()
+
+
+def bench_canonical():
+    """Evaluation cache hit rates when the same expressions arrive spelled differently"""
+    print("🔤 CANONICAL KEYS")
+    print("-" * 50)
+    rng = random.Random(11)
+    pairs = [(_random_expression(rng, 20), _random_expression(rng, 20)) for _ in range(200)]
+    
+    def spell(left, right):
+        # What different clients send for the same sum
+        if rng.random() < 0.5:
+            left, right = right, left
+        text = f"({left}) + ({right})" if rng.random() < 0.5 else f"({left})+({right})"
+        if rng.random() < 0.3:
+            text = f"({text})"
+        return text.replace(" * ", " × ") if rng.random() < 0.3 else text
+    
+    requests = [spell(*pairs[min(int(rng.expovariate(1 / 40)), 199)]) for _ in range(5_000)]
+    variables = {"x": 1.5, "y": 2.0, "alpha": 0.5, "b_1": 3.0}
+    for level in CanonicalLevel:
+        engine = MathEngine(canonical=level)
+        engine.cache = engine.folex.cache = ExpressionCache(max_size=20_000, max_bytes=None)
+        start = time.perf_counter()
+        for expression in requests:
+            engine.evaluate(expression, variables)
+        elapsed = time.perf_counter() - start
+        stats = engine.get_cache_stats()
+        gain = stats["canonical"]["hit_rate_gain"]
+        print(f"  {level.value:<12} hit rate {stats['evaluation_cache']['hit_rate']:6.1%} "
+              f"(+{gain:5.1%} reported by get_stats()), {elapsed / len(requests) * 1e6:7.1f} µs per request")
+    
+    # What canonical keys add to a hit
+    expression = "(x + 1) * (y + 2)"
+    for level in (CanonicalLevel.NONE, CanonicalLevel.COMMUTATIVE):
+        engine = MathEngine(canonical=level)
+        engine.evaluate(expression, {"x": 1, "y": 2})
+        hit = _time_per_call(lambda: engine.evaluate(expression, {"x": 1, "y": 2}), number=20_000)
+        print(f"  cache hit, {level.value:<12} {hit * 1e6:5.2f} µs")
+    print()
+
+
+_RESTART_SCRIPT = """
+import json, sys, time
+from FLN.cache import get_global_cache
+from FLN.engine import MathEngine
+from FLN.persistent import SQLiteBackend
+requests_path, cache_path = sys.argv[1:]
+with open(requests_path) as file:
+    requests, variables = json.load(file)
+if cache_path:
+    get_global_cache().backend = SQLiteBackend(cache_path)
+engine = MathEngine()
+engine.evaluate("1 + 1")  # imports and the formula database, not what is measured
+latencies = []
+for expression in requests:
+    start = time.perf_counter()
+    engine.evaluate(expression, variables)
+    latencies.append(time.perf_counter() - start)
+backend = get_global_cache().get_stats()["backend"]
+print(json.dumps([latencies, backend and backend["hits"]]))
+"""
+
+
+def bench_restart():
+    """First requests after a restart: empty caches, against a warm SQLite second tier"""
+    print("💾 WARM START")
+    print("-" * 50)
+    rng = random.Random(13)
+    expressions = [_random_expression(rng, 60) for _ in range(500)]
+    requests = [expressions[min(int(rng.expovariate(1 / 100)), 499)] for _ in range(3_000)]
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    with tempfile.TemporaryDirectory() as directory:
+        requests_path = os.path.join(directory, "requests.json")
+        cache_path = os.path.join(directory, "cache.sqlite")
+        with open(requests_path, "w") as file:
+            json.dump([requests, {"x": 1.5, "y": 2.0, "alpha": 0.5, "b_1": 3.0}], file)
+        # Each run is a fresh process, as after a deploy; the second fills the file the third starts from
+        for label, path in (("cold, memory only", ""), ("cold, filling SQLite", cache_path),
+                            ("warm SQLite", cache_path)):
+            output = subprocess.run([sys.executable, "-c", _RESTART_SCRIPT, requests_path, path], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout
+            latencies, hits = json.loads(output)
+            first = sorted(latencies[:500])
+            print(f"  {label:<21} first 500: mean {sum(first) / len(first) * 1e6:7.1f} µs, "
+                  f"p99 {first[int(len(first) * 0.99)] * 1e6:7.1f} µs; all {len(latencies)}: "
+                  f"{sum(latencies) * 1e3:6.1f} ms" + (f", {hits} from disk" if hits else ""))
+        size = os.path.getsize(cache_path)
+    print(f"  SQLite file: {size / 1024:.0f} KiB for {len(set(requests))} results")
+    print()
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "tokenizer": bench_tokenizer,
+    "parser": bench_parser,
+    "compile": bench_compile,
+    "vectorize": bench_vectorize,
+    "steps": bench_steps,
+    "natix": bench_natix,
+    "folex": bench_folex,
+    "lookup": bench_lookup,
+    "search": bench_search,
+    "cache": bench_cache,
+    "budget": bench_budget,
+    "keys": bench_keys,
+    "canonical": bench_canonical,
+    "restart": bench_restart,
+    "egraph": bench_egraph,
+    "interning": bench_interning,
+    "compact": bench_compact,
+}
+
+
+def main():
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
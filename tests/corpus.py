@@ -0,0 +1,47 @@
+"""
+Expressions and variable bindings shared by the tests that check a compiled
+form (closures, bytecode, numpy) against Natix.
+"""
+
+import math
+
+
+EXPRESSIONS = [
+    "2 + 3 * 4",
+    "(x + y)^2",
+    "sqrt(x^2 + y^2)",
+    "sin(x) * exp(-x/5)",
+    "x / y",
+    "1/0",
+    "x - y * 2",
+    "sqrt(-x)",
+    "log(y - 1)",
+    "ln(x - x)",
+    "tan(x)",
+    "factorial(x)",
+    "factorial(y + 0.5)",
+    "asin(y)",
+    "acos(-y)",
+    "exp(x * 1000)",
+    "0^(-1)",
+    "x^y",
+    "y^1000",
+    "-x^2",
+    "x + z",
+    "sinh(y) / acos(y)",
+    "sinh(y * 1000) / acos(y)",
+    "floor(x) + ceil(y) + round(x * y)",
+    "d/dx(x^2)",
+]
+
+VARIABLES = [
+    {},
+    {"x": 3, "y": 4},
+    {"x": 0, "y": 0},
+    {"x": math.pi / 2, "y": 1},
+    {"x": 171, "y": 2.5},
+    {"x": -2.5, "y": 10},
+    {"x": 1e-12, "y": -3},
+    {"x": -8, "y": 1 / 3},
+    {"x": 0.5, "y": -0.5},
+]
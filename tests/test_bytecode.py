@@ -0,0 +1,104 @@
+"""
+Tests for bytecode programs: results must match Natix exactly.
+"""
+
+import io
+import contextlib
+
+import pytest
+
+from FLN.ast_nodes import OperatorNode, FunctionNode, UnaryNode, NumberNode, VariableNode
+from FLN.bytecode import BytecodeProgram, Opcode
+from FLN.cache import ExpressionCache
+from FLN.natix import Natix
+from FLN.parser import Parser
+
+from corpus import EXPRESSIONS, VARIABLES
+
+
+def _natix(ast, variables):
+    result, _ = Natix().evaluate(ast, variables)
+    return result
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_matches_natix(expression):
+    ast = Parser().parse(expression)
+    program = BytecodeProgram(expression, ast)
+    for variables in VARIABLES:
+        try:
+            expected = _natix(ast, variables)
+        except TypeError:  # complex result
+            with pytest.raises(TypeError):
+                program(**variables)
+            with pytest.raises(TypeError):
+                program.evaluate(variables)
+            continue
+        assert program(**variables) == expected
+        assert program.evaluate(variables) == expected
+
+
+def test_unknown_operations_match_natix():
+    x = VariableNode("x")
+    asts = [
+        OperatorNode("&", x, NumberNode(1)),
+        FunctionNode("gamma", x),
+        UnaryNode("!", x),
+    ]
+    for ast in asts:
+        program = BytecodeProgram(ast.to_string(), ast)
+        for variables in ({}, {"x": 2}):
+            assert program(**variables) == _natix(ast, variables)
+
+
+def test_complex_power_raises_like_natix():
+    ast = Parser().parse("x^0.5")
+    with pytest.raises(TypeError):
+        _natix(ast, {"x": -8})
+    with pytest.raises(TypeError):
+        BytecodeProgram("x^0.5", ast)(x=-8)
+
+
+def test_emits_postfix_code():
+    program = BytecodeProgram("sin(x) + 2 * y", Parser().parse("sin(x) + 2 * y"))
+    opcodes = [Opcode(opcode) for opcode, _ in program.instructions]
+    assert opcodes == [
+        Opcode.LOAD_VAR, Opcode.CALL_SIN,
+        Opcode.PUSH_CONST, Opcode.LOAD_VAR, Opcode.MULTIPLY,
+        Opcode.ADD,
+    ]
+    assert program.variables == frozenset({"x", "y"})
+    assert "CALL_SIN" in program.disassemble()
+
+
+def test_constant_subtrees_are_folded():
+    program = BytecodeProgram("x + (2 * 3 - 1)", Parser().parse("x + (2 * 3 - 1)"))
+    assert program.instructions == ((Opcode.LOAD_VAR, "x"), (Opcode.PUSH_CONST, 5), (Opcode.ADD, None))
+    assert program(x=1) == 6
+
+
+def test_runs_trees_too_deep_to_recurse():
+    expression = " + ".join(["x"] * 5000)
+    program = BytecodeProgram(expression, Parser().parse(expression))
+    assert program(x=1) == 5000
+
+
+def test_programs_are_cached_next_to_the_ast():
+    with contextlib.redirect_stdout(io.StringIO()):
+        from FLN.engine import MathEngine
+        engine = MathEngine()
+    program = engine.compile_bytecode("x^2 + 1")
+    assert engine.compile_bytecode("x^2 + 1") is program
+    assert engine.cache.get_cached_ast("x^2 + 1") is not None
+    assert program(x=3) == 10
+
+
+def test_expression_cache_program_roundtrip():
+    cache = ExpressionCache()
+    program = BytecodeProgram("x", Parser().parse("x"))
+    assert cache.get_cached_program("x") is None
+    cache.cache_program("x", program)
+    assert cache.get_cached_program("x") is program
+    assert cache.get_stats()["program_cache"]["hits"] == 1
+    cache.clear_all()
+    assert cache.get_cached_program("x") is None
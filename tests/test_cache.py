@@ -0,0 +1,175 @@
+"""
+Tests for the expression cache: LRU order, expiry, byte budgets, keys, and sharing between threads.
+"""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from FLN.cache import ExpressionCache, LazyEvaluator, LRUCache, get_global_cache, sizeof
+from FLN.data_structures import ComputationStep
+from FLN.engine import MathEngine
+
+
+@pytest.fixture
+def busy_switching():
+    # Switch threads as often as possible to expose unguarded updates
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _hammer(threads, work):
+    errors = []
+    start = threading.Barrier(threads)
+    
+    def run(number):
+        start.wait()
+        try:
+            work(number)
+        except BaseException as error:  # reported below, not lost in the thread
+            errors.append(error)
+    
+    workers = [threading.Thread(target=run, args=(number,)) for number in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert errors == []
+
+
+def test_lru_order_and_expiry(monkeypatch):
+    cache = LRUCache(max_size=2, ttl=10, shards=1)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert (cache.get("b"), cache.get("a"), cache.get("c")) == (None, 1, 3)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("a") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (3, 2, 1, 1)
+
+
+def test_shards_split_the_capacity_exactly():
+    cache = LRUCache(max_size=250)
+    assert cache.get_stats()["shards"] > 1
+    for number in range(1000):
+        cache.put(number, number)
+    assert len(cache) == 250
+    assert cache.get_stats()["evictions"] == 750
+
+
+def test_sizeof_counts_what_a_value_holds_once():
+    text = "x" * 1000
+    assert sizeof([text, text]) < sizeof([text, "y" * 1000]) < sizeof([text] * 2) + 1100
+    step = ComputationStep(1, "x + x", "2 * x", "simplify", ["Like Terms"] * 3)
+    assert sizeof([step, step]) == sizeof([step]) + sys.getsizeof([step, step]) - sys.getsizeof([step])
+    assert sizeof(step) > sys.getsizeof(step) + sys.getsizeof("Like Terms")
+    # Closures are followed into what they captured
+    captured = list(range(1000))
+    assert sizeof(lambda: captured) > sys.getsizeof(captured)
+
+
+def test_byte_budget_keeps_small_hot_entries():
+    small, big = "s" * 50, ["b" * 16000]
+    budget = 100 * sizeof(small) + 5 * sizeof(big)
+    cache = LRUCache(max_size=1000, shards=1, max_bytes=budget)
+    for key in range(100):
+        cache.put(key, small)
+    # A stream of big traces, each used once, does not push the small ones out
+    for key in range(100, 300):
+        cache.put(key, list(big))
+        assert cache.get_stats()["bytes"] <= budget
+    assert all(cache.get(key) == small for key in range(100))
+    assert cache.get(299) == big and cache.get(100) is None
+
+
+def test_values_over_the_budget_are_not_stored():
+    cache = LRUCache(max_size=10, shards=1, max_bytes=1000)
+    cache.put("key", "small")
+    cache.put("key", "x" * 2000)
+    assert cache.get("key") is None
+    stats = cache.get_stats()
+    assert (stats["rejections"], stats["size"], stats["bytes"]) == (1, 0, 0)
+
+
+def test_evaluation_keys():
+    cache = ExpressionCache()
+    cache.cache_evaluation("x + y", {"x": 1, "y": 2}, "ints")
+    cache.cache_evaluation("x + y", {"x": 1.0, "y": 2}, "floats")
+    cache.cache_evaluation("x + y", {"x": 1, "y": 2}, "summary", steps="summary")
+    # Order does not matter, types and step levels do
+    assert cache.get_cached_evaluation("x + y", {"y": 2, "x": 1}) == "ints"
+    assert cache.get_cached_evaluation("x + y", {"y": 2, "x": 1.0}) == "floats"
+    assert cache.get_cached_evaluation("x + y", {"x": True, "y": 2}) is None
+    assert cache.get_cached_evaluation("x + y", {"x": 1, "y": 2}, steps="summary") == "summary"
+    assert cache.get_cached_evaluation("x + y", {"x": 1, "y": 2}, steps="none") is None
+    # Values that cannot be hashed are keyed by content
+    cache.cache_evaluation("sum(v)", {"v": [1, 2, {"a": 3}]}, "list")
+    assert cache.get_cached_evaluation("sum(v)", {"v": [1, 2, {"a": 3}]}) == "list"
+    assert cache.get_cached_evaluation("sum(v)", {"v": (1, 2, {"a": 3})}) is None
+    assert cache.get_cached_evaluation("x", None) is None
+    cache.cache_evaluation("x", None, "none")
+    assert cache.get_cached_evaluation("x", {}) == "none"
+
+
+def test_signed_zeros_are_told_apart():
+    cache = ExpressionCache()
+    cache.cache_evaluation("x", {"x": 0.0, "y": 1}, "plus")
+    cache.cache_evaluation("v", {"v": [0.0]}, "plus")
+    assert cache.get_cached_evaluation("x", {"x": -0.0, "y": 1}) is None
+    assert cache.get_cached_evaluation("x", {"y": 1, "x": 0.0}) == "plus"
+    assert cache.get_cached_evaluation("v", {"v": [-0.0]}) is None
+    engine = MathEngine()
+    engine.cache = cache
+    assert engine.evaluate("x*1", {"x": 0.0}).final_result == "0.0"
+    assert engine.evaluate("x*1", {"x": -0.0}).final_result == "-0.0"
+
+
+def test_same_lazy_request_gets_the_same_id():
+    lazy = LazyEvaluator(ExpressionCache())
+    first = lazy.add_to_queue("x + 1", {"x": 1, "y": 2})
+    assert lazy.add_to_queue("x + 1", {"y": 2, "x": 1}) == first
+    assert len({first, lazy.add_to_queue("x + 1", {"x": 1, "y": 2}, priority=1),
+                lazy.add_to_queue("x + 1", {"x": 1.0, "y": 2})}) == 3
+
+
+def test_cache_survives_32_threads(busy_switching):
+    # Few entries for many keys: constant eviction, as under real load
+    cache = ExpressionCache(max_size=16)
+    rounds = 2000
+    
+    def work(number):
+        for i in range(rounds):
+            expression = f"x + {(number * 7 + i) % 13}"
+            variables = {"x": i % 3}
+            cached = cache.get_cached_evaluation(expression, variables)
+            # Whatever comes back belongs to this key
+            assert cached is None or cached == (expression, variables["x"])
+            cache.cache_evaluation(expression, variables, (expression, variables["x"]))
+    
+    _hammer(32, work)
+    stats = cache.evaluation_cache.get_stats()
+    assert stats["total_requests"] == 32 * rounds
+    assert stats["hits"] > 0 and stats["evictions"] > 0
+    assert len(cache.evaluation_cache) <= 8
+
+
+def test_engines_share_the_global_cache_across_threads(busy_switching):
+    expressions = [f"{n} * x + sin(x)^2 + cos(x)^2" for n in range(20)]
+    expected = {e: MathEngine(enable_caching=False).evaluate(e, {"x": 2}).final_result for e in expressions}
+    get_global_cache().clear_all()
+    
+    def work(number):
+        engine = MathEngine()
+        for i in range(60):
+            expression = expressions[(number + i) % len(expressions)]
+            assert engine.evaluate(expression, {"x": 2}).final_result == expected[expression]
+    
+    _hammer(32, work)
+    assert get_global_cache().evaluation_cache.get_stats()["hits"] > 0
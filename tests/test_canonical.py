@@ -0,0 +1,94 @@
+"""
+Tests for canonical cache keys: respelling expressions and sharing their results.
+"""
+
+import pytest
+
+from FLN.ast_nodes import OperatorNode, ParenthesesNode, UnaryNode, FunctionNode
+from FLN.cache import ExpressionCache
+from FLN.canonical import canonical_form, normalize_text
+from FLN.data_structures import CanonicalLevel
+from FLN.engine import MathEngine
+from FLN.parser import Parser
+
+
+def _shape(node):
+    # The tree without its parentheses
+    if isinstance(node, ParenthesesNode):
+        return _shape(node.expression)
+    if isinstance(node, OperatorNode):
+        return node.operator, _shape(node.left), _shape(node.right)
+    if isinstance(node, UnaryNode):
+        return node.operator, _shape(node.operand)
+    if isinstance(node, FunctionNode):
+        return node.function_name, _shape(node.argument)
+    return node
+
+
+def test_text_keeps_whitespace_that_separates_tokens():
+    assert normalize_text("  x  ×  ( y ÷ 2 ) ") == "x*(y/2)"
+    assert normalize_text("x² − 1") == "x^2-1"
+    assert normalize_text("sin (x)") == "sin(x)"
+    assert normalize_text("2  3") == "2 3"
+
+
+@pytest.mark.parametrize("expression, structure, commutative", [
+    ("((x)) + 1", "x+1", "1+x"),
+    ("c * (a*b)", "c*(a*b)", "a*b*c"),
+    ("a - (b - c)", "a-(b-c)", "a-(b-c)"),
+    ("(a ^ b) ^ c", "a^b^c", "a^b^c"),
+    ("a ^ (b ^ c)", "a^(b^c)", "a^(b^c)"),
+    ("(-2) ^ 2", "(-2)^2", "(-2)^2"),
+    ("-(2 ^ 2)", "-2^2", "-2^2"),
+    ("2 ^ (-x)", "2^(-x)", "2^(-x)"),
+    ("x * (-y)", "x*-y", "-y*x"),
+    ("-(-x)", "-(-x)", "-(-x)"),
+    ("sin((x + y)) * 2", "sin(x+y)*2", "2*sin(x+y)"),
+])
+def test_canonical_spellings_parse_back_to_the_same_tree(expression, structure, commutative):
+    parser = Parser()
+    assert canonical_form(expression) == structure
+    assert canonical_form(expression, "commutative") == commutative
+    assert _shape(parser.parse(structure)) == _shape(parser.parse(expression))
+    assert canonical_form(commutative, CanonicalLevel.COMMUTATIVE) == commutative
+
+
+def test_what_cannot_be_respelled_keeps_its_text():
+    # Trailing tokens the parser would ignore, calculus, exponent notation
+    assert canonical_form("2 3") == "2 3"
+    assert canonical_form("x = 1") == "x=1"
+    assert canonical_form("d/dx(x ^ 2)") == "d/dx(x^2)"
+    assert canonical_form("100000000000000000000.0 + x") == "100000000000000000000.0+x"
+    assert canonical_form("x + 1", "none") == "x + 1"
+
+
+def test_engine_shares_results_between_spellings():
+    cache = ExpressionCache()
+    engine = MathEngine(canonical="structure")
+    engine.cache = cache
+    first = engine.evaluate("(x + 1) * 2", {"x": 3})
+    assert engine.evaluate("((x+1))*2", {"x": 3}) is first
+    assert engine.evaluate("(x + 1) × 2", {"x": 3}) is first
+    assert engine.evaluate("2 * (x + 1)", {"x": 3}) is not first
+    assert first.final_result == "8"
+    # The same spelling again would have hit without canonical keys too
+    assert engine.evaluate("((x+1))*2", {"x": 3}) is first
+    canonical = cache.get_stats()["canonical"]
+    assert (canonical["lookups"], canonical["hits"], canonical["spelled_hits"]) == (5, 3, 1)
+    assert canonical["hit_rate_gain"] == 0.4
+    
+    # Raw keys never merge spellings and record nothing
+    raw = MathEngine()
+    raw.cache = cache
+    assert raw.evaluate("2 * (x + 1)", {"x": 3}) is not first
+    assert cache.get_stats()["canonical"]["lookups"] == 5
+
+
+def test_canonical_evaluation_matches_the_canonical_spelling():
+    engine = MathEngine(enable_caching=False, canonical="commutative")
+    plain = MathEngine(enable_caching=False)
+    for expression in ("y*x + (2)", "sqrt((x)) ^ 2", "x − 1"):
+        canonical = canonical_form(expression, "commutative")
+        assert engine.evaluate(expression, {"x": 4, "y": 2}) == plain.evaluate(canonical, {"x": 4, "y": 2})
+    # Errors still name what was asked
+    assert engine.evaluate("x +", {"x": 1}).original_expression == "x +"
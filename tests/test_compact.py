@@ -0,0 +1,46 @@
+"""
+Tests for the array-backed CompactAST representation.
+"""
+
+import pytest
+
+from FLN.ast_nodes import NodeInterner
+from FLN.compact import CompactAST
+from FLN.parser import Parser
+
+
+EXPRESSIONS = [
+    "2 + 3 * 4",
+    "-(x + y)^2 / 2.0",
+    "sqrt(x^2 + y^2) * sin(x)",
+    "((((x))))",
+    "d/dx(x^2)",
+    "∫x^2 dx",
+    "∫_0^1 x^2 dx",
+    "factorial(5) - 2 + 2.0",
+]
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_round_trip(expression):
+    ast = Parser().parse(expression)
+    compact = CompactAST.from_ast(ast)
+    assert compact.to_ast() is ast
+    assert compact.to_string() == ast.to_string()
+    # a fresh interner rebuilds an equal, independent tree
+    rebuilt = compact.to_ast(NodeInterner())
+    assert rebuilt == ast
+    assert rebuilt is not ast
+
+
+def test_shared_subtrees_are_stored_once():
+    ast = Parser().parse("sin(x) * sin(x) + 2")
+    assert len(CompactAST.from_ast(ast)) == 5
+    # a plain tree keeps its duplicates
+    assert len(CompactAST.from_ast(ast.clone())) == 7
+
+
+def test_numbers_keep_their_type():
+    compact = CompactAST.from_ast(Parser().parse("2 + 2.0"))
+    assert compact.symbols.count(2) == 2
+    assert compact.to_string() == "(2 + 2.0)"
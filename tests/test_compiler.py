@@ -0,0 +1,55 @@
+"""
+Tests for compiled expressions: results must match Natix exactly.
+"""
+
+import math
+
+import pytest
+
+from FLN.compiler import CompiledExpression
+from FLN.natix import Natix
+from FLN.parser import Parser
+
+from corpus import EXPRESSIONS, VARIABLES
+
+
+def _natix(ast, variables):
+    result, _ = Natix().evaluate(ast, variables)
+    return result
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_matches_natix(expression):
+    ast = Parser().parse(expression)
+    compiled = CompiledExpression(expression, ast)
+    for variables in VARIABLES:
+        try:
+            expected = _natix(ast, variables)
+        except TypeError:  # complex result
+            with pytest.raises(TypeError):
+                compiled(**variables)
+            with pytest.raises(TypeError):
+                compiled.evaluate(variables)
+            continue
+        assert compiled(**variables) == expected
+        assert compiled.evaluate(variables) == expected
+
+
+def test_complex_power_raises_like_natix():
+    ast = Parser().parse("x^0.5")
+    with pytest.raises(TypeError):
+        _natix(ast, {"x": -8})
+    with pytest.raises(TypeError):
+        CompiledExpression("x^0.5", ast)(x=-8)
+
+
+def test_collects_variable_names():
+    compiled = CompiledExpression("x * y + sin(x)", Parser().parse("x * y + sin(x)"))
+    assert compiled.variables == frozenset({"x", "y"})
+
+
+def test_constant_subtrees_are_folded_per_subtree():
+    # acos(y) reuses a name seen earlier and must still be evaluated per call
+    compiled = CompiledExpression("sinh(y) + acos(y)", Parser().parse("sinh(y) + acos(y)"))
+    assert compiled(y=0) == math.sinh(0) + math.acos(0)
+    assert compiled() == "sinh(y) + acos(y)"
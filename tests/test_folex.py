@@ -0,0 +1,159 @@
+"""
+Tests for formula detection: the literal prefilter must never drop a match.
+"""
+
+import io
+import contextlib
+import re
+
+import pytest
+
+from FLN.cache import ExpressionCache
+from FLN.data_structures import FormulaDefinition
+from FLN.formula_database import get_formula_database
+from FLN.folex import DetectionContext, Folex, _required_literals
+
+
+with contextlib.redirect_stdout(io.StringIO()):
+    FOLEX = Folex()
+
+EXPRESSIONS = [
+    "(x + y)^2",
+    "(a-b)^2",
+    "sin(x)^2 + cos(x)^2",
+    "SIN(2*x)",
+    "log(a*b)",
+    "d/dx(x^3)",
+    "lim_x->a(f+g)",
+    "∫sin(x)dx",
+    "sın(x)",
+    "x^2 - y^2",
+    "2 + 3",
+    "",
+]
+
+
+def _brute_force(folex, expression):
+    clean = folex._clean_expression(expression)
+    return [f.name for f in folex.formulas if re.search(f.pattern, clean, re.IGNORECASE)]
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_matches_testing_every_pattern(expression):
+    detected = FOLEX.detect_formulas(expression)
+    assert sorted(m.formula_name for m in detected) == sorted(_brute_force(FOLEX, expression))
+
+
+def test_prefilter_skips_implausible_formulas():
+    candidates = FOLEX._candidates(FOLEX._clean_expression("2 + 3"))
+    assert len(candidates) < len(FOLEX.formulas) // 10
+
+
+def test_required_literals():
+    assert _required_literals(r"sin\(([a-zA-Z])\)\^2") == ["sin(", ")^2"]
+    assert _required_literals(r"LOG\s*\(x?y") == ["log", "(", "y"]
+    assert _required_literals(r"(ab)+c") == ["ab", "c"]
+    assert _required_literals(r"∫sin") == ["sin"]
+    assert _required_literals(r"[a-z]|b") == []
+
+
+def test_added_and_reloaded_formulas_are_indexed():
+    with contextlib.redirect_stdout(io.StringIO()):
+        folex = Folex()
+    formulas = list(folex.formulas)
+    folex.reload_formulas(formulas)
+    folex.add_formula(FormulaDefinition("Zeta", r"zeta\(([a-z])\)", r"\1", 10))
+    assert [m.formula_name for m in folex.detect_formulas("zeta(s)")] == ["Zeta"]
+    # Appending to the list directly is picked up too
+    formulas.append(FormulaDefinition("Eta", r"eta\(([a-z])\)", r"\1", 10))
+    assert "Eta" in [m.formula_name for m in folex.detect_formulas("eta(s)")]
+
+
+def test_invalid_pattern_never_matches():
+    with contextlib.redirect_stdout(io.StringIO()):
+        folex = Folex()
+    folex.reload_formulas([FormulaDefinition("Broken", r"(x", "", 10),
+                           FormulaDefinition("Square", r"x\^2", "", 10)])
+    assert [m.formula_name for m in folex.detect_formulas("(x^2")] == ["Square"]
+
+
+def test_detection_context_detects_each_string_once():
+    context = DetectionContext(FOLEX)
+    first = context.detect_formulas("(x + y)^2")
+    again = context.detect_formulas(" ( x+y ) ^2 ")  # cleans to the same string
+    assert [m.formula_name for m in again] == [m.formula_name for m in first]
+    assert again is not first
+    assert context.stats["detections"] == 2
+    assert context.stats["distinct"] == 1
+    assert context.stats["regex_searches_saved"] == context.stats["regex_searches"] > 0
+
+
+def test_evaluate_reports_detection_stats():
+    with contextlib.redirect_stdout(io.StringIO()):
+        from FLN.engine import MathEngine
+        engine = MathEngine(enable_caching=False)
+    result = engine.evaluate("(a + b)^2 + (a + b)^2", {"a": 1, "b": 2})
+    stats = result.detection_stats
+    # The expression, its printed AST and every step result
+    assert stats["detections"] == 2 + len(result.computation_steps)
+    assert stats["distinct"] < stats["detections"]
+    assert stats["regex_searches_saved"] > 0
+
+
+def test_detections_are_cached_per_formula_set():
+    cache = ExpressionCache()
+    with contextlib.redirect_stdout(io.StringIO()):
+        folex = Folex(cache=cache)
+    first = folex.detect_formulas("(x + y)^2")
+    assert folex.detect_formulas("(x+y)^2") == first
+    stats = cache.formula_cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    # Changing the database's formula set invalidates earlier detections
+    get_formula_database().bump_version()
+    folex.detect_formulas("(x + y)^2")
+    assert cache.formula_cache.get_stats()["misses"] == 2
+
+
+def test_added_formula_invalidates_cached_detections():
+    with contextlib.redirect_stdout(io.StringIO()):
+        folex = Folex(cache=ExpressionCache())
+    folex.reload_formulas([FormulaDefinition("Square", r"x\^2", "", 10)])
+    assert [m.formula_name for m in folex.detect_formulas("x^2")] == ["Square"]
+    folex.add_formula(FormulaDefinition("Power", r"\^", "", 10))
+    assert sorted(m.formula_name for m in folex.detect_formulas("x^2")) == ["Power", "Square"]
+
+
+def test_switching_caching_off_stops_caching_detections():
+    with contextlib.redirect_stdout(io.StringIO()):
+        from FLN.engine import MathEngine
+        engine = MathEngine()
+    engine.enable_caching(False)
+    assert engine.cache is None and engine.folex.cache is None
+    assert not engine.caching_enabled
+    engine.enable_caching()
+    assert engine.folex.cache is engine.cache is not None
+
+
+def test_apply_formula_to_ast_uses_compiled_replacement():
+    from FLN.parser import Parser
+    ast = Parser().parse("(p + q)^2 * log(m * n)")
+    match = next(m for m in FOLEX.match_ast(ast) if m.formula_name == "Perfect Square (a+b)²")
+    result = FOLEX.apply_formula_to_ast(ast, match)
+    assert result.to_string() == "((((p ^ 2) + ((2 * p) * q)) + (q ^ 2)) * log((m * n)))"
+    # The untouched factor is shared with the input
+    assert result.right is ast.right
+    # Prose replacements have no template
+    assert FOLEX.rewrite(ast, ["FOIL method"]) is ast
+
+
+def test_engine_applies_and_rewrites_formulas():
+    with contextlib.redirect_stdout(io.StringIO()):
+        from FLN.engine import MathEngine
+        engine = MathEngine(enable_caching=False)
+    assert engine.apply_formula("log(x*y)", "log product rule") == "(log(x) + log(y))"
+    assert engine.apply_formula("x + 1", "Log Product Rule") == "x + 1"
+    assert engine.apply_formula("x + 1", "No Such Formula") == "x + 1"
+    assert engine.rewrite("ln(a*b) + (sin(c)^2 + cos(c)^2)",
+                          ["Natural Log Product", "Pythagorean Identity"]) == "((ln(a) + ln(b)) + (1))"
+    # Evaluation is unaffected: the value, not a rewritten expression
+    assert engine.evaluate("(a + b)^2", {"a": 1, "b": 2}).final_result == "9"
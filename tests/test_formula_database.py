@@ -0,0 +1,157 @@
+"""
+Tests for the formula database: formulas.json, its snapshot, and lazy, silent loading.
+"""
+
+import json
+import logging
+import os
+import shutil
+
+import pytest
+
+from FLN.data_structures import FormulaDefinition
+from FLN.engine import MathEngine
+from FLN.folex import Folex, _UNCOMPILED, _required_literals
+from FLN.formula_database import DATA_FILE, FormulaDatabase, load_snapshot, snapshot_path
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "formulas.json")
+    shutil.copyfile(DATA_FILE, path)
+    return path
+
+
+def _edit(path, edit):
+    with open(path, encoding="utf-8") as file:
+        document = json.load(file)
+    edit(document)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file)
+
+
+def test_snapshot_is_reused_until_the_source_changes(source, caplog):
+    with caplog.at_level(logging.INFO, logger="FLN.formula_database"):
+        count = FormulaDatabase(source).get_formula_count()
+        assert os.path.exists(snapshot_path(source))
+        assert FormulaDatabase(source).get_formula_count() == count
+    assert caplog.text.count("snapshot rebuilt") == 1
+    
+    _edit(source, lambda document: document["sections"][0]["formulas"].pop())
+    assert FormulaDatabase(source).get_formula_count() == count - 1
+    # A damaged snapshot is rebuilt too
+    with open(snapshot_path(source), "wb") as file:
+        file.write(b"\x00garbage")
+    assert FormulaDatabase(source).get_formula_count() == count - 1
+
+
+def test_source_fields_are_checked(source):
+    _edit(source, lambda document: document["sections"][0]["formulas"][0].update(grdae=8))
+    with pytest.raises(ValueError, match="grdae"):
+        FormulaDatabase(source).get_formula_count()
+
+
+def test_snapshot_precomputes_pattern_literals():
+    literals = load_snapshot()[3]
+    for formula in FormulaDatabase().formulas:
+        try:
+            expected = tuple(_required_literals(formula.pattern))
+        except Exception:
+            expected = None
+        assert literals[formula.pattern] == expected, formula.name
+
+
+def test_category_lookup_only_loads_its_sections():
+    db = FormulaDatabase()
+    assert db._formulas is None and db.version == 0
+    roots = db.get_formulas_by_category("Roots")
+    assert {formula.category for formula in roots} == {"Roots"}
+    assert len(db._sections) == sum("Roots" in categories for _, categories, _ in db._section_data())
+    # The full list reuses what is already loaded and keeps section order
+    assert all(any(formula is other for other in db.formulas) for formula in roots)
+    assert db.formulas[0].name == "Perfect Square (a+b)²"
+    assert db.get_formulas_by_category("Roots") == roots
+
+
+def test_loading_logs_instead_of_printing(capsys, caplog):
+    with caplog.at_level(logging.INFO, logger="FLN.formula_database"):
+        count = FormulaDatabase().get_formula_count()
+    assert capsys.readouterr().out == ""
+    assert f"{count} formulas" in caplog.text
+
+
+def test_folex_compiles_patterns_on_first_use():
+    folex = Folex()
+    assert folex._formulas is None
+    names = [match.formula_name for match in folex.detect_formulas("(x + y)^2")]
+    assert "Perfect Square (a+b)²" in names
+    assert _UNCOMPILED in folex._compiled
+    # Structural matching builds its own index only when asked
+    assert folex._tree_index is None
+
+
+def test_lookups_agree_with_scanning():
+    db = FormulaDatabase()
+    formulas = db.formulas
+    assert db.get_formulas_by_grade(9) == [f for f in formulas if f.grade == 9]
+    assert db.get_formulas_by_category("tRIGONOMETRY") == [f for f in formulas if f.category == "Trigonometry"]
+    assert db.get_formulas_by_topic("algebra") == [f for f in formulas if f.topic == "Algebra"]
+    assert db.get_formula_by_name("log power rule") is next(f for f in formulas if f.name == "Log Power Rule")
+    assert db.get_formula_by_name("No Such Formula") is None
+    found = db.search_formulas("pythagorean identity")
+    assert found[0].name == "Pythagorean Identity"
+    assert {f.name for f in found} >= {"Pythagorean Theorem", "Hyperbolic Identity"}
+    assert db.search_formulas("pythag", limit=1) == found[:1]
+    assert "derivative" in db.complete("deriv")
+    categories = db.get_all_categories()
+    assert categories[:2] == ["Algebraic Identities", "Trigonometry"]
+    assert sorted(categories) == sorted({f.category for f in formulas})
+    # Known without building every formula
+    assert FormulaDatabase().get_all_categories() == categories
+
+
+def test_index_follows_additions_and_reloads(source):
+    db = FormulaDatabase(source)
+    count = db.get_formula_count()
+    version = db.version
+    assert db.search_formulas("golden") == []  # builds the search index
+    db.add_formula(FormulaDefinition("Golden Ratio", r"phi", "", 10, "Constants"))
+    assert db.get_formula_by_name("golden ratio").category == "Constants"
+    assert db.get_all_categories()[-1] == "Constants"
+    assert db.search_formulas("golden") == [db.formulas[-1]]
+    assert db.version > version
+    # Appending directly is noticed as well
+    db.formulas.append(FormulaDefinition("Silver Ratio", r"delta", "", 10, "Constants"))
+    assert len(db.get_formulas_by_category("constants")) == 2
+    
+    _edit(source, lambda document: document["sections"][0]["formulas"][0].update(name="Renamed"))
+    version = db.version
+    db.reload_formulas()
+    assert db.get_formula_count() == count
+    assert db.get_formulas_by_category("Constants") == []
+    assert db.get_formula_by_name("Renamed") is db.formulas[0]
+    assert db.version > version
+
+
+def test_digest_follows_the_formula_set(source):
+    digest = FormulaDatabase(source).digest
+    assert FormulaDatabase(source).digest == digest
+    # Unlike the version, it is the same in every process for the same formulas
+    db = FormulaDatabase(source)
+    db.bump_version()
+    assert db.digest == digest
+    db.add_formula(FormulaDefinition("Golden Ratio", r"phi", "", 10, "Constants"))
+    assert db.digest != digest
+    _edit(source, lambda document: document["sections"][0]["formulas"].pop())
+    assert FormulaDatabase(source).digest not in (digest, db.digest)
+
+
+def test_folex_and_engine_lookups():
+    local = Folex()
+    local.reload_formulas([FormulaDefinition("Square", r"x\^2", "", 10, "Powers", topic="Algebra")])
+    assert [f.name for f in local.get_formulas_by_topic("ALGEBRA")] == ["Square"]
+    assert local.suggest_formula("x^2").name == "Square"
+    engine = MathEngine(enable_caching=False)
+    assert engine.get_formula_by_name("pythagorean identity").category == "Trigonometry"
+    assert "Calculus" in engine.get_all_categories()
+    assert engine.get_formulas_by_category("Roots") == engine.folex.get_formulas_by_category("roots")
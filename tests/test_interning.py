@@ -0,0 +1,69 @@
+"""
+Tests for hash-consed AST nodes.
+"""
+
+import dataclasses
+import gc
+
+import pytest
+
+from FLN.ast_nodes import NodeInterner, NumberNode, OperatorNode, VariableNode, get_node_interner
+from FLN.parser import Parser
+
+
+def test_parsed_subexpressions_are_shared():
+    parser = Parser()
+    ast = parser.parse("sin(x) * cos(y) + sin(x) * cos(y)")
+    assert ast.left is ast.right
+    assert parser.parse("2 * sin(x)").right is ast.left.left
+
+
+def test_parsers_share_the_global_interner():
+    interner = get_node_interner()
+    assert get_node_interner() is interner
+    ast = Parser().parse("x * 2.5 + 1")
+    assert interner.intern(ast) is ast
+    assert ast.left.right is interner.number(2.5)
+
+
+def test_hashes_are_computed_as_nodes_are_built():
+    built = OperatorNode("+", VariableNode("x"), NumberNode(1.0))
+    assert "_hash" in vars(built)
+    assert hash(built) == hash(OperatorNode("+", VariableNode("x"), NumberNode(1.0)))
+    # Deeper than the recursion limit: hashing never walks the tree
+    ast = Parser().parse("+".join(["x"] * 5000))
+    assert {ast: 1}[ast] == 1
+
+
+def test_nodes_are_immutable_and_hashable():
+    ast = Parser().parse("x + 1")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        ast.left = VariableNode("y")
+    assert hash(ast) == hash(ast.clone())
+    assert ast == ast.clone()
+
+
+def test_numbers_keep_their_printed_form():
+    interner = NodeInterner()
+    assert interner.number(2) is not interner.number(2.0)
+    assert interner.number(0.0) is not interner.number(-0.0)
+    assert interner.number(2) is interner.number(2)
+
+
+def test_intern_rebuilds_a_tree_as_a_dag():
+    interner = NodeInterner()
+    tree = Parser().parse("(a + b) * (a + b)").clone()
+    assert tree.left is not tree.right
+    dag = interner.intern(tree)
+    assert dag == tree
+    assert dag.left is dag.right
+    assert interner.intern(tree.clone()) is dag
+
+
+def test_unused_nodes_are_released():
+    interner = NodeInterner()
+    ast = interner.intern(Parser().parse("sqrt(x^2 + y^2)"))
+    assert len(interner) == 7  # the two 2s are one node
+    del ast
+    gc.collect()
+    assert len(interner) == 0
@@ -0,0 +1,39 @@
+"""
+Tests for the per-evaluation subexpression memo in Natix.
+"""
+
+from FLN.natix import EvaluationContext, Natix
+from FLN.parser import Parser
+
+
+def test_equal_subtrees_share_a_key():
+    # clone() gives a plain tree, so the two (a + b) are separate objects
+    ast = Parser().parse("(a + b) * (a + b) - a + b").clone()
+    context = EvaluationContext()
+    left, right = ast.left.left.left, ast.left.left.right
+    assert left is not right
+    assert context.node_key(left) == context.node_key(right)
+    assert context.node_key(ast.left) != context.node_key(ast.right)
+
+
+def test_keys_follow_the_printed_form():
+    # 2 and 2.0 print differently, so they must not share a cached result
+    context = EvaluationContext()
+    ast = Parser().parse("2 + 2.0")
+    assert context.node_key(ast.left) != context.node_key(ast.right)
+
+
+def test_repeated_subexpression_is_served_from_the_memo():
+    ast = Parser().parse("sin(x) * sin(x) + 2")
+    result, steps = Natix().evaluate(ast, {"x": 1})
+    cached = [step for step in steps if step.operation == "cached_result"]
+    assert [step.expression for step in cached] == ["sin(x)"]
+    assert sum(step.operation == "sin" for step in steps) == 1
+    assert result == Natix().evaluate(Parser().parse("sin(1) * sin(1) + 2"))[0]
+
+
+def test_deep_expressions_visit_each_node_once():
+    ast = Parser().parse(" + ".join(f"x * {i}" for i in range(150))).clone()
+    context = EvaluationContext()
+    context.node_key(ast)
+    assert len(context._node_keys) == 4 * 150 - 1
@@ -0,0 +1,142 @@
+"""
+Tests for the operator-precedence parser: tree shapes, deep nesting, error messages and sharing between threads.
+"""
+
+import sys
+import threading
+
+import pytest
+
+from FLN.ast_nodes import (DerivativeNode, FunctionNode, NumberNode, OperatorNode, ParenthesesNode,
+                           UnaryNode, VariableNode)
+from FLN.parser import Parser, _ParseCursor
+from FLN.tokenizer import Token, TokenType
+
+x, y, a, b, c, d = (VariableNode(name) for name in "xyabcd")
+
+
+def _number(value):
+    return NumberNode(value)
+
+
+def _op(operator, left, right):
+    return OperatorNode(operator, left, right)
+
+
+# The trees the recursive-descent parser this one replaced built for each expression
+SHAPES = [
+    ("-2^2", UnaryNode("-", _op("^", _number(2), _number(2)))),
+    ("2^3^2", _op("^", _op("^", _number(2), _number(3)), _number(2))),
+    ("(-x)^2", _op("^", ParenthesesNode(UnaryNode("-", x)), _number(2))),
+    ("-x^2", UnaryNode("-", _op("^", x, _number(2)))),
+    ("a - b - c", _op("-", _op("-", a, b), c)),
+    ("a / b * c", _op("*", _op("/", a, b), c)),
+    ("a + b * c ^ d", _op("+", a, _op("*", b, _op("^", c, d)))),
+    ("2 * -3", _op("*", _number(2), UnaryNode("-", _number(3)))),
+    ("-a * b", _op("*", UnaryNode("-", a), b)),
+    ("((x + 1))", ParenthesesNode(ParenthesesNode(_op("+", x, _number(1))))),
+    ("sin(x)^2", _op("^", FunctionNode("sin", x), _number(2))),
+    ("3.14 * r^2", _op("*", _number(3.14), _op("^", VariableNode("r"), _number(2)))),
+    ("sqrt(x^2 + y^2)", FunctionNode("sqrt", _op("+", _op("^", x, _number(2)), _op("^", y, _number(2))))),
+    ("log(x * y) - exp(-x)", _op("-", FunctionNode("log", _op("*", x, y)), FunctionNode("exp", UnaryNode("-", x)))),
+    ("d/dx(x^2)", DerivativeNode("x", _op("^", x, _number(2)))),
+]
+
+
+@pytest.mark.parametrize("expression, expected", SHAPES)
+def test_trees_match_recursive_descent(expression, expected):
+    parser = Parser()
+    assert parser.parse(expression) == expected
+    assert parser.parse_complete(expression) == expected
+
+
+def test_numbers_keep_their_type():
+    parser = Parser()
+    assert type(parser.parse("2").value) is int
+    assert type(parser.parse("2.0").value) is float
+
+
+def test_deep_nesting_does_not_recurse():
+    depth = 10_000
+    for parse in (Parser().parse, Parser().parse_complete):
+        ast = parse("(" * depth + "x" + ")" * depth)
+        nesting = 0
+        while isinstance(ast, ParenthesesNode):
+            ast = ast.expression
+            nesting += 1
+        assert (nesting, ast) == (depth, x)
+    
+    ast = Parser().parse("sin(" * depth + "x" + ")" * depth)
+    for _ in range(depth):
+        assert ast.function_name == "sin"
+        ast = ast.argument
+    assert ast == x
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("(x + 1", "Expected ')'"),
+    ("sin(x", "Expected ')' after function argument"),
+    ("", "Unexpected end of expression"),
+    ("x +", "Unexpected end of expression"),
+    ("2 * )", "Unexpected token type: TokenType.PARENTHESIS_RIGHT at position 4"),
+    ("2^-x", "Unexpected token type: TokenType.OPERATOR at position 2"),
+    ("d/dx x", "Expected '(' after d/dx"),
+    ("∫ x", "Expected 'dx' at end of integral"),
+])
+def test_error_messages(expression, message):
+    with pytest.raises(ValueError) as error:
+        Parser().parse(expression)
+    assert str(error.value) == message
+
+
+def test_function_name_without_parenthesis():
+    # The tokenizer only makes a function token in front of '(', so build one that is not
+    tokens = [Token(TokenType.FUNCTION, "sin", 0), Token(TokenType.VARIABLE, "x", 4)]
+    with pytest.raises(ValueError, match=r"^Expected '\(' after function name$"):
+        Parser()._parse_expression(_ParseCursor(tokens))
+
+
+@pytest.fixture
+def busy_switching():
+    # Switch threads as often as possible to expose state shared between parses
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_one_parser_is_shared_between_threads(busy_switching):
+    parser = Parser()
+    threads = 8
+    errors = []
+    start = threading.Barrier(threads)
+    
+    def run(number):
+        # Each thread parses different expressions, so a cursor or token list
+        # leaking from another parse shows up as a wrong tree
+        shapes = SHAPES[number::threads] + [("(" * 50 + f"x + {number}" + ")" * 50, None)]
+        start.wait()
+        try:
+            for _ in range(50):
+                for expression, expected in shapes:
+                    ast = parser.parse(expression)
+                    if expected is None:
+                        while isinstance(ast, ParenthesesNode):
+                            ast = ast.expression
+                        expected = _op("+", x, _number(number))
+                    assert ast == expected, expression
+        except BaseException as error:  # reported below, not lost in the thread
+            errors.append(error)
+    
+    workers = [threading.Thread(target=run, args=(number,)) for number in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert errors == []
+
+
+def test_parse_complete_rejects_trailing_tokens():
+    assert Parser().parse("2 3") == _number(2)
+    with pytest.raises(ValueError, match="Unexpected token '3' at position 2"):
+        Parser().parse_complete("2 3")
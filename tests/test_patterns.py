@@ -0,0 +1,154 @@
+"""
+Tests for tree patterns, the discrimination tree index and rewriting.
+"""
+
+import io
+import contextlib
+
+import pytest
+
+from FLN.parser import Parser
+from FLN.patterns import (
+    DiscriminationTree, RewriteSystem, instantiate, parse_rewrite_template, parse_tree_pattern
+)
+
+
+def _parse(expression):
+    return Parser().parse(expression)
+
+
+def test_wildcards_bind_subtrees():
+    pattern = parse_tree_pattern("(?a + ?b)^2")
+    bindings = pattern.match(_parse("((x * 2) + sin(y))^2"))
+    assert bindings["a"].to_string() == "(x * 2)"
+    assert bindings["b"].to_string() == "sin(y)"
+    assert pattern.variables == ("a", "b")
+
+
+def test_parentheses_are_ignored():
+    pattern = parse_tree_pattern("?a - ?b")
+    assert pattern.match(_parse("((x)) - (y)")) is not None
+
+
+def test_repeated_variable_needs_equal_subtrees():
+    pattern = parse_tree_pattern("sin(?x)^2 + cos(?x)^2")
+    assert pattern.match(_parse("sin(t + 1)^2 + cos((t + 1))^2")) is not None
+    assert pattern.match(_parse("sin(t)^2 + cos(u)^2")) is None
+
+
+def test_literals_must_match_exactly():
+    pattern = parse_tree_pattern("pi * ?r^2")
+    assert pattern.match(_parse("pi * a^2")) is not None
+    assert pattern.match(_parse("pi * a^3")) is None
+    assert pattern.match(_parse("e * a^2")) is None
+    # Only the whole tree, not a subtree
+    assert pattern.match(_parse("pi * a^2 + 1")) is None
+
+
+def test_incomplete_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        parse_tree_pattern("?a + ?b ?c")
+
+
+def test_index_finds_matches_in_every_subtree():
+    index = DiscriminationTree()
+    index.insert(parse_tree_pattern("(?a + ?b)^2"), "square")
+    index.insert(parse_tree_pattern("?a * ?b"), "product")
+    index.insert(parse_tree_pattern("?a * 2"), "double")
+    index.insert(parse_tree_pattern("sqrt(?a)"), "root")
+    assert len(index) == 4
+    matches = index.match(_parse("3 * (x + y)^2 + (x * 2)"))
+    found = sorted((m.value, m.node.to_string()) for m in matches)
+    assert found == [
+        ("double", "(x * 2)"),
+        ("product", "(3 * (((x + y)) ^ 2))"),
+        ("product", "(x * 2)"),
+        ("square", "(((x + y)) ^ 2)"),
+    ]
+
+
+def test_index_agrees_with_direct_matching():
+    patterns = ["?a + ?b", "?a + ?a", "?a^2", "sin(?a)", "-?a", "?a / (?b + ?c)", "d/dx(?a)"]
+    expressions = ["x + x", "sin(x)^2 + 1", "-(a / (b + c))", "d/dx(x^2 + x^2)", "2 + 3 * 4"]
+    index = DiscriminationTree()
+    compiled = [parse_tree_pattern(text) for text in patterns]
+    for pattern in compiled:
+        index.insert(pattern, pattern.text)
+    for expression in expressions:
+        ast = _parse(expression)
+        from_index = {(m.value, id(m.node)) for m in index.match(ast)}
+        stack, direct, seen = [ast], set(), set()
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            stack.extend(node.children())
+            for pattern in compiled:
+                if type(node).__name__ != "ParenthesesNode" and pattern.match(node) is not None:
+                    direct.add((pattern.text, id(node)))
+        assert from_index == direct, expression
+
+
+def test_folex_matches_translated_database_patterns():
+    with contextlib.redirect_stdout(io.StringIO()):
+        from FLN.engine import MathEngine
+        engine = MathEngine()
+    names = [m.formula_name for m in engine.match_formulas("sin(t)^2 + cos(t)^2")]
+    assert names[0] == "Pythagorean Identity"
+    match = engine.match_formulas("3 * (p - q)^2")
+    square = next(m for m in match if m.formula_name == "Perfect Square (a-b)²")
+    assert square.variables == {"a": "p", "b": "q"}
+    assert square.confidence < 1.0
+    # The regex for this formula cannot match the parenthesized to_string() output
+    assert "Perfect Square (a-b)²" not in [
+        m.formula_name for m in engine.detect_formulas(engine.parse_expression("3 * (p - q)^2").to_string())
+    ]
+
+
+def test_replacement_compiles_to_template():
+    pattern = parse_tree_pattern("(?a + ?b)^2")
+    template = parse_rewrite_template(r"(\1)^2 + 2*(\1)*(\2) + (\2)^2", pattern)
+    bindings = pattern.match(_parse("(x + sin(y))^2"))
+    result = instantiate(template, bindings)
+    assert result.to_string() == "(((x ^ 2) + ((2 * x) * sin(y))) + (sin(y) ^ 2))"
+    # Bound subtrees are shared rather than copied
+    assert result.right.left is bindings["b"]
+
+
+def test_template_names_must_come_from_the_pattern():
+    pattern = parse_tree_pattern("sqrt(?a) * sqrt(?b)")
+    with pytest.raises(ValueError):
+        parse_rewrite_template("sqrt(a*b)", pattern)
+    with pytest.raises(ValueError):
+        parse_rewrite_template("FOIL method", pattern)
+    assert parse_rewrite_template("sqrt(?a * ?b)", pattern).variables == ("a", "b")
+
+
+def _rules(*pairs):
+    rules = RewriteSystem()
+    for pattern, replacement in pairs:
+        pattern = parse_tree_pattern(pattern)
+        rules.add(pattern, parse_rewrite_template(replacement, pattern))
+    return rules
+
+
+def test_rewrite_reaches_fixpoint():
+    rules = _rules(("log(?a * ?b)", "log(?a) + log(?b)"), ("?a^1", "?a"))
+    result = rules.rewrite(_parse("log(x^1 * (y * z^1))"))
+    assert result.to_string() == "(log(x) + (log(y) + log(z)))"
+    assert rules.rewrite(result) is result
+
+
+def test_rules_that_undo_each_other_terminate():
+    rules = _rules(("?a + ?b", "?b + ?a"), ("?a * ?b", "?b * ?a"))
+    assert rules.rewrite(_parse("x + y * z")).to_string() == "((z * y) + x)"
+
+
+def test_rewrite_stops_before_exceeding_node_budget():
+    rules = _rules(("sqrt(?a)", "sqrt(?a) + sqrt(?a)"))
+    ast = _parse("sqrt(x)")
+    result = rules.rewrite(ast, max_iterations=100, max_nodes=50)
+    # 16 copies take 47 nodes; the next pass would need 95
+    assert result.to_string().count("sqrt(x)") == 16
+    assert rules.rewrite(ast, max_iterations=3).to_string().count("sqrt(x)") == 8
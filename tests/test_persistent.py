@@ -0,0 +1,166 @@
+"""
+Tests for the persistent evaluation cache: the stored result format, warm starts, expiry and compaction.
+"""
+
+import time
+
+import pytest
+
+from FLN.cache import ExpressionCache
+from FLN.data_structures import ComputationStep, EvaluationResult, EvaluationType, FormulaDefinition, FormulaMatch
+from FLN.engine import MathEngine
+from FLN.persistent import SQLiteBackend, decode_result, encode_result
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "results.sqlite")
+
+
+@pytest.fixture
+def backends(path):
+    opened = []
+    
+    def open_backend(**options):
+        backend = SQLiteBackend(path, **options)
+        opened.append(backend)
+        return backend
+    
+    yield open_backend
+    for backend in opened:
+        backend.close()
+
+
+def _engine(backend):
+    engine = MathEngine()
+    engine.cache = engine.folex.cache = engine.lazy_evaluator.cache = ExpressionCache(backend=backend)
+    return engine
+
+
+def test_results_round_trip():
+    engine = MathEngine(enable_caching=False)
+    for expression in ("(x + y)^2 + sin(x)^2 + cos(x)^2", "x * z", "1 / 0"):
+        result = engine.evaluate(expression, {"x": 1.5, "y": 2})
+        assert decode_result(encode_result(result)) == result
+    match = FormulaMatch("Square", r"x\^2", "x^2", {"var_1": "x"}, 0.9)
+    step = ComputationStep(1, "x^2", "4", "power", [match], True, "Raised 2 to power 2")
+    result = EvaluationResult("x^2", "4", EvaluationType.NUMERIC, [match], [step], detection_stats={"detections": 1})
+    assert decode_result(encode_result(result)) == result
+    
+    with pytest.raises(TypeError):
+        encode_result("4")
+    with pytest.raises(TypeError, match="bindings"):
+        encode_result(EvaluationResult("x", "x", None, [FormulaMatch("F", "?a", "x", {}, bindings={"a": object()})]))
+    data = encode_result(result)
+    for damaged in (b"", b"\x00" + data[1:], data[:-5]):
+        with pytest.raises(ValueError):
+            decode_result(damaged)
+
+
+def test_results_survive_a_restart(backends):
+    expression, variables = "(x + 1) * sin(y)", {"x": 2, "y": 0.5}
+    first = _engine(backends()).evaluate(expression, variables)
+    
+    # A new process: nothing in memory, the same file
+    engine = _engine(backends())
+    assert engine.evaluate(expression, {"y": 0.5, "x": 2}) == first
+    stats = engine.get_cache_stats()
+    assert stats["evaluation_cache"]["misses"] == 1
+    assert (stats["backend"]["hits"], stats["backend"]["writes"]) == (1, 0)
+    # Promoted into memory, so the next lookup does not reach the file
+    engine.evaluate(expression, variables)
+    assert engine.get_cache_stats()["backend"]["hits"] == 1
+    # Other variable types and step levels are other results
+    assert engine.evaluate(expression, {"x": 2.0, "y": 0.5}).computation_steps != first.computation_steps
+    assert engine.evaluate(expression, variables, steps="none").computation_steps == []
+    assert engine.get_cache_stats()["backend"]["misses"] == 2
+
+
+def test_results_from_another_formula_set_are_misses(backends):
+    expression, variables = "(x + y)^2", {"x": 1, "y": 2}
+    first = _engine(backends()).evaluate(expression, variables)
+    assert first.applied_formulas
+    
+    # Restarted with other formulas: the stored detections no longer apply
+    engine = _engine(backends())
+    engine.folex.reload_formulas([FormulaDefinition("Square", r"\^2", "", 10)])
+    result = engine.evaluate(expression, variables)
+    assert [match.formula_name for match in result.applied_formulas] == ["Square"]
+    assert engine.get_cache_stats()["backend"]["hits"] == 0
+    # The same formulas again hit what was stored with them
+    assert _engine(backends()).evaluate(expression, variables) == first
+
+
+def test_lazy_results_are_stored_with_their_formula_set(backends):
+    engine = _engine(backends())
+    engine.add_to_lazy_queue("(x + y)^2", {"x": 1, "y": 2})
+    engine.evaluate_next_lazy()
+    # Once, by the engine, under the formula digest
+    assert engine.get_cache_stats()["backend"]["writes"] == 1
+    restarted = _engine(backends())
+    restarted.folex.reload_formulas([FormulaDefinition("Square", r"\^2", "", 10)])
+    restarted.evaluate("(x + y)^2", {"x": 1, "y": 2})
+    assert restarted.get_cache_stats()["backend"]["hits"] == 0
+
+
+def test_namespaces_and_damage_are_misses(backends):
+    cache = ExpressionCache(backend=backends())
+    result = MathEngine(enable_caching=False).evaluate("x + 1", {"x": 1})
+    cache.cache_evaluation("x + 1", {"x": 1}, result)
+    cache.cache_evaluation("x + 2", {"x": 1}, "not a result")
+    assert cache.get_stats()["backend"]["writes"] == 1
+    
+    assert ExpressionCache(backend=backends(namespace="next release")).get_cached_evaluation("x + 1", {"x": 1}) is None
+    backend = backends()
+    assert ExpressionCache(backend=backend).get_cached_evaluation("x + 1", {"x": 1}) == result
+    backend.put(repr(("x + 1", "full", [("x", int, 1)], "")), b"\x01damaged")
+    assert ExpressionCache(backend=backend).get_cached_evaluation("x + 1", {"x": 1}) is None
+
+
+def test_expired_results_are_not_read(backends, monkeypatch):
+    backend = backends(ttl=10)
+    backend.put("old", b"value")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    backend.put("new", b"value")
+    assert (backend.get("old"), backend.get("new")) == (None, b"value")
+    assert backend.get_stats()["expirations"] == 1
+    backend.compact()
+    assert backend.get_stats()["size"] == 1
+
+
+def test_compaction_keeps_recently_read_results_under_the_cap(backends, monkeypatch):
+    backend = backends(max_bytes=10_000, compact_interval=3600)
+    now = time.time()
+    for number in range(40):
+        monkeypatch.setattr(time, "time", lambda: now + number)
+        backend.put(f"key {number}", bytes(200))
+    # Reading the oldest saves them, once their read time is stale
+    monkeypatch.setattr(time, "time", lambda: now + 1000)
+    assert all(backend.get(f"key {number}") for number in range(5))
+    for number in range(40, 80):
+        monkeypatch.setattr(time, "time", lambda: now + 2000 + number)
+        backend.put(f"key {number}", bytes(200))
+    
+    backend.compact()
+    stats = backend.get_stats()
+    assert stats["bytes"] <= 9_000 and stats["evictions"] > 0
+    assert all(backend.get(f"key {number}") for number in list(range(5)) + list(range(70, 80)))
+    assert backend.get("key 5") is None
+    # Over the whole cap, a value is not stored at all
+    backend.put("big", bytes(20_000))
+    assert backend.get("big") is None and backend.get_stats()["rejections"] == 1
+
+
+def test_writes_past_the_cap_wake_compaction(backends):
+    backend = backends(max_bytes=5_000, compact_interval=3600)
+    for number in range(50):
+        backend.put(f"key {number}", bytes(200))
+    deadline = time.time() + 10
+    while backend.get_stats()["evictions"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert backend.get_stats()["compactions"] > 0
+    backend.compact()
+    assert backend.get_stats()["bytes"] <= 4_500
+    backend.clear()
+    assert backend.get_stats()["size"] == 0
@@ -0,0 +1,66 @@
+"""
+Tests for the full-text search index: ranking, prefixes, typos and updates.
+"""
+
+from FLN.search import SearchIndex, tokenize
+
+
+def _index(*documents):
+    index = SearchIndex()
+    for name, description in documents:
+        index.add([(name, 3.0), (description, 1.0)])
+    return index
+
+
+def _found(index, query, **options):
+    return [document for document, _ in index.search(query, **options)]
+
+
+DOCUMENTS = [
+    ("Power Rule", "Derivative of a power"),
+    ("Pythagorean Identity", "sin squared plus cos squared"),
+    ("Pythagorean Theorem", "Right triangles and the pythagorean relation"),
+    ("Chain Rule", "Derivative of a composition"),
+    ("Quotient Rule", "Derivative of a quotient"),
+]
+
+
+def test_tokenize():
+    assert tokenize("L'Hôpital's Rule (a+b)²") == ["l", "hôpital", "s", "rule", "a", "b", "²"]
+
+
+def test_ranking_weights_fields_and_rare_words():
+    index = _index(*DOCUMENTS)
+    # Both mention it, but only one has it in the name
+    assert _found(index, "power") == [0]
+    assert _found(index, "pythagorean identity")[0] == 1
+    # "derivative" is common, "composition" rare
+    assert _found(index, "derivative composition")[0] == 3
+    assert _found(index, "rule", limit=2) == [0, 3]
+    assert len(_found(index, "rule", limit=None)) == 3
+
+
+def test_last_word_completes_until_followed_by_space():
+    index = _index(*DOCUMENTS)
+    assert sorted(_found(index, "pyth")) == [1, 2]
+    assert _found(index, "pyth ") == []
+    assert _found(index, "pyth", prefix=False) == []
+    assert _found(index, "right tri") == [2]
+    assert index.complete("d") == ["derivative"]
+    # Most documents first, then alphabetical
+    assert index.complete("p") == ["pythagorean", "plus", "power"]
+
+
+def test_misspelt_words_match_nearby_terms():
+    index = _index(*DOCUMENTS)
+    assert sorted(_found(index, "pythagoran")) == [1, 2]
+    assert _found(index, "qoutient rule")[0] == 4
+    assert _found(index, "xyzzy") == []
+
+
+def test_documents_added_later_are_searchable():
+    index = _index(*DOCUMENTS)
+    assert index.add([("Product Rule", 3.0), ("Derivative of a product", 1.0)]) == 5
+    assert len(index) == 6
+    assert _found(index, "product") == [5]
+    assert _found(index, "prod") == [5]
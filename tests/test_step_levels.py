@@ -0,0 +1,70 @@
+"""
+Tests for step-recording levels: the result never depends on the level.
+"""
+
+import contextlib
+import io
+
+import pytest
+
+from FLN.cache import get_global_cache
+from FLN.data_structures import StepLevel
+from FLN.natix import Natix
+from FLN.parser import Parser
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from FLN.engine import MathEngine
+
+
+EXPRESSIONS = [
+    "sqrt(x^2 + y^2) * sin(x) / (1 + exp(-y))",
+    "(a + b) * c - d / 2",
+    "2^10 + factorial(5)",
+    "log(x - 1) + 1 / (y - 2)",
+    "-x^2",
+    "d/dx(x^2)",
+]
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_result_is_independent_of_level(expression):
+    ast = Parser().parse(expression)
+    variables = {"x": 1, "y": 2, "a": 1, "b": 2, "c": 3}
+    full_result, full_steps = Natix().evaluate(ast, variables)
+    summary_result, summary_steps = Natix().evaluate(ast, variables, "summary")
+    none_result, none_steps = Natix().evaluate(ast, variables, StepLevel.NONE)
+    assert summary_result == full_result
+    assert none_result == full_result
+    assert none_steps == []
+    assert 0 < len(summary_steps) <= len(full_steps)
+
+
+def test_summary_records_top_level_operations():
+    ast = Parser().parse("2^10 + factorial(5)")
+    _, steps = Natix().evaluate(ast, steps="summary")
+    assert [step.expression for step in steps] == ["2 ^ 10", "factorial(5)", "1024 + 120"]
+
+
+def test_engine_level_and_per_call_override():
+    engine = MathEngine(steps="none")
+    assert engine.evaluate("1 + 2 * 3").computation_steps == []
+    full = engine.evaluate("1 + 2 * 3", steps="full")
+    assert full.final_result == "7"
+    assert len(full.computation_steps) > 0
+    # the cached step-less result must not answer a full request
+    assert engine.evaluate_with_steps("1 + 2 * 3") == full.computation_steps
+
+
+def test_lazy_results_are_cached_at_their_step_level():
+    get_global_cache().clear_all()
+    lazy = MathEngine(steps="none")
+    lazy.add_to_lazy_queue("x*2+1", {"x": 3})
+    _, result = lazy.evaluate_next_lazy()
+    assert result.computation_steps == []
+    full = MathEngine(steps="full").evaluate("x*2+1", {"x": 3})
+    assert full.final_result == "7" and len(full.computation_steps) > 0
+
+
+def test_unknown_level_is_rejected():
+    with pytest.raises(ValueError):
+        MathEngine(steps="verbose")
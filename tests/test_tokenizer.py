@@ -0,0 +1,76 @@
+"""
+Tests for the single-regex tokenizer and the fallback scan for unknown function names.
+"""
+
+import pytest
+
+from FLN.tokenizer import FUNCTIONS, _FALLBACK_SCANNER, _SCANNER, Token, TokenType, Tokenizer
+
+N, V, O, F = TokenType.NUMBER, TokenType.VARIABLE, TokenType.OPERATOR, TokenType.FUNCTION
+L, R = TokenType.PARENTHESIS_LEFT, TokenType.PARENTHESIS_RIGHT
+
+
+def _stream(expression):
+    return [(token.token_type, token.value, token.position) for token in Tokenizer().tokenize(expression)]
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("3.14 * 2 + 10", [(N, "3.14", 0), (O, "*", 5), (N, "2", 7), (O, "+", 9), (N, "10", 11)]),
+    ("x=2.5", [(V, "x", 0), (O, "=", 1), (N, "2.5", 2)]),
+    ("  x  ", [(V, "x", 2)]),
+    ("a,b", [(V, "a", 0), (TokenType.COMMA, ",", 1), (V, "b", 2)]),
+    ("x_1 - _a2 / y", [(V, "x_1", 0), (O, "-", 4), (V, "_a2", 6), (O, "/", 10), (V, "y", 12)]),
+    ("dx + dy*d", [(TokenType.DIFFERENTIAL, "dx", 0), (O, "+", 3), (TokenType.DIFFERENTIAL, "dy", 5),
+                   (O, "*", 7), (V, "d", 8)]),
+    ("d/dx(sin(x))", [(TokenType.DERIVATIVE, "d/dx", 0), (L, "(", 4), (F, "sin", 5), (L, "(", 8),
+                      (V, "x", 9), (R, ")", 10), (R, ")", 11)]),
+    ("∫_0^1(x^2) dx", [(TokenType.INTEGRAL, "∫", 0), (V, "_0", 1), (O, "^", 3), (N, "1", 4), (L, "(", 5),
+                       (V, "x", 6), (O, "^", 7), (N, "2", 8), (R, ")", 9), (TokenType.DIFFERENTIAL, "dx", 11)]),
+])
+def test_token_streams(expression, expected):
+    assert _stream(expression) == expected
+
+
+@pytest.mark.parametrize("expression, expected", [
+    # Known names in front of '(' are functions, and the '(' is a token of its own
+    ("sqrt(2)", [(F, "sqrt", 0), (L, "(", 4), (N, "2", 5), (R, ")", 6)]),
+    # A name that only starts with a function's name is a variable
+    ("sinx", [(V, "sinx", 0)]),
+    ("sine(x)", [(V, "sine", 0), (L, "(", 4), (V, "x", 5), (R, ")", 6)]),
+    ("log10(x)", [(V, "log10", 0), (L, "(", 5), (V, "x", 6), (R, ")", 7)]),
+    ("foo (x)", [(V, "foo", 0), (L, "(", 4), (V, "x", 5), (R, ")", 6)]),
+    # Without '(' a function's name is a plain variable
+    ("sin + cos", [(V, "sin", 0), (O, "+", 4), (V, "cos", 6)]),
+    # d followed by a letter is a differential, even in front of '('
+    ("dx(x)", [(TokenType.DIFFERENTIAL, "dx", 0), (L, "(", 2), (V, "x", 3), (R, ")", 4)]),
+])
+def test_function_names_and_variables(expression, expected):
+    assert _stream(expression) == expected
+
+
+def test_every_function_is_recognised():
+    for name in FUNCTIONS:
+        assert _stream(f"{name}(x)")[:2] == [(F, name, 0), (L, "(", len(name))]
+
+
+def test_unknown_names_take_the_fallback_scanner():
+    # The master scanner takes any name in front of '(' as a function...
+    match = _SCANNER.match("  foo(x)", 0)
+    assert (match.lastgroup, match.group("FUNCTION")) == ("FUNCTION", "foo(")
+    # ...and an unknown one is rescanned from where it starts, without FUNCTION
+    match = _FALLBACK_SCANNER.match("  foo(x)", match.start("FUNCTION"))
+    assert (match.lastgroup, match.group("VARIABLE"), match.end()) == ("VARIABLE", "foo", 5)
+    assert "FUNCTION" not in _FALLBACK_SCANNER.groupindex
+    assert Tokenizer().tokenize("  foo(x)")[0] == Token(V, "foo", 2)
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("x % 3", "Unexpected character at position 2: %"),
+    ("sin(x) $", "Unexpected character at position 7: $"),
+    ("x + .5", "Unexpected character at position 4: ."),
+    ("2x", "Unexpected character at position 0: 2"),
+])
+def test_unexpected_characters(expression, message):
+    with pytest.raises(ValueError) as error:
+        Tokenizer().tokenize(expression)
+    assert str(error.value) == message
@@ -0,0 +1,63 @@
+"""
+Tests for vectorized evaluation: every element must agree with Natix.
+"""
+
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from FLN.natix import Natix
+from FLN.parser import Parser
+from FLN.vectorized import VectorizedExpression, VectorError
+
+from corpus import EXPRESSIONS, VARIABLES
+
+# The bindings as columns, one element per binding of both variables
+X = [variables["x"] for variables in VARIABLES if variables]
+Y = [variables["y"] for variables in VARIABLES if variables]
+
+
+def _natix(ast, variables):
+    try:
+        result, _ = Natix().evaluate(ast, variables)
+    except TypeError:
+        return None  # complex result
+    return result
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_matches_natix_per_element(expression):
+    ast = Parser().parse(expression)
+    result = VectorizedExpression(expression, ast)(x=np.array(X), y=np.array(Y))
+    assert result.values.shape == (len(X),)
+    for i, (x, y) in enumerate(zip(X, Y)):
+        expected = _natix(ast, {"x": x, "y": y})
+        if isinstance(expected, (int, float)):
+            assert result.error_codes[i] == VectorError.OK, (x, y, expected)
+            assert result.values[i] == pytest.approx(expected, rel=1e-12)
+        else:
+            assert result.error_codes[i] != VectorError.OK, (x, y, expected)
+            assert math.isnan(result.values[i])
+
+
+def test_error_codes():
+    ast = Parser().parse("sqrt(x) + 1 / y")
+    result = VectorizedExpression("sqrt(x) + 1 / y", ast)(x=np.array([-1.0, 4.0, -1.0]), y=np.array([2.0, 0.0, 0.0]))
+    # the left operand's error wins, like Natix evaluating left to right
+    assert list(result.error_codes) == [VectorError.SQRT_OF_NEGATIVE, VectorError.DIVISION_BY_ZERO, VectorError.SQRT_OF_NEGATIVE]
+    assert result.errors() == {VectorError.DIVISION_BY_ZERO: 1, VectorError.SQRT_OF_NEGATIVE: 2}
+    assert not result.valid.any()
+
+
+def test_unbound_variables_are_symbolic():
+    result = VectorizedExpression("x + z", Parser().parse("x + z"))(x=np.arange(3.0))
+    assert (result.error_codes == VectorError.SYMBOLIC).all()
+
+
+def test_scalars_and_broadcasting():
+    vectorized = VectorizedExpression("x * y + 1", Parser().parse("x * y + 1"))
+    assert vectorized(x=2, y=3).values == 7
+    result = vectorized(x=np.arange(4.0), y=2)
+    assert list(result.values) == [1, 3, 5, 7]